@@ -0,0 +1,234 @@
+"""
+การทำงานแบบ Archive: รวมไฟล์ที่เข้าเกณฑ์เป็นไฟล์บีบอัดหนึ่งไฟล์ต่อเดือน (ตามเวลาแก้ไขของไฟล์)
+
+ไฟล์ต้นทางถูกอ่านทีละก้อนและเขียนต่อเนื่องลงไฟล์ Archive ในปลายทาง (archive_YYYY-MM.zip, .tar.gz หรือ .tar.zst)
+แทนการเขียนไฟล์เล็กทีละไฟล์ผ่านเครือข่าย ไฟล์ถูกเขียนเป็นชื่อชั่วคราว (.partial) อ่านกลับมาตรวจสอบ Hash ของทุกไฟล์
+แล้วจึงเปลี่ยนเป็นชื่อจริง ไฟล์ต้นฉบับจะถูกลบหลังจากนั้นเท่านั้น
+tar.zst ต้องติดตั้งแพ็กเกจ zstandard เพิ่มเติม (pip install zstandard)
+"""
+import datetime
+import gzip
+import hashlib
+import os
+import tarfile
+import time
+import zipfile
+import zlib
+
+from engine import OperationCancelledError
+
+ARCHIVE_PREFIX = "archive_"
+PARTIAL_SUFFIX = ".partial"
+# ระดับการบีบอัด (ค่ากลางที่เร็วพอสำหรับการเขียนต่อเนื่อง)
+ZIP_COMPRESS_LEVEL = 6
+GZIP_COMPRESS_LEVEL = 6
+ZSTD_COMPRESS_LEVEL = 3
+
+
+def month_key(mtime):
+    """เดือนของเวลาแก้ไขไฟล์ในรูปแบบ YYYY-MM (เวลาท้องถิ่น)"""
+    return datetime.datetime.fromtimestamp(mtime).strftime("%Y-%m")
+
+
+def group_by_month(entries):
+    """จัดกลุ่ม FileEntry ตามเดือนของเวลาแก้ไข คืนค่า dict เดือน -> รายการ (เรียงจากเดือนเก่าที่สุด)"""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(month_key(entry.mtime), []).append(entry)
+    return dict(sorted(groups.items()))
+
+
+def archive_name(month, archive_format, existing=()):
+    """ชื่อไฟล์ Archive ของเดือน month ที่ไม่ซ้ำกับชื่อใน existing (เพิ่ม _copyN ก่อนนามสกุล เช่น archive_2025-01_copy1.tar.gz)"""
+    stem = f"{ARCHIVE_PREFIX}{month}"
+    name = f"{stem}.{archive_format}"
+    count = 1
+    while name in existing or name + PARTIAL_SUFFIX in existing:
+        name = f"{stem}_copy{count}.{archive_format}"
+        count += 1
+    return name
+
+
+def member_name(entry_name):
+    """ชื่อไฟล์ภายใน Archive (ใช้ / เป็นตัวคั่นโฟลเดอร์เสมอ)"""
+    return entry_name.replace(os.sep, "/")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("รูปแบบ tar.zst ต้องติดตั้งแพ็กเกจ zstandard (pip install zstandard)")
+    return zstandard
+
+
+def check_format(archive_format):
+    """ตรวจสอบว่าใช้รูปแบบนี้ได้ (ImportError หากขาดแพ็กเกจที่จำเป็น)"""
+    if archive_format == "tar.zst":
+        _zstandard()
+
+
+class _HashingReader:
+    """อ่านไฟล์ต้นทางให้ tarfile พร้อมคำนวณ Hash, แจ้งจำนวนไบต์ และตรวจสอบการยกเลิกระหว่างก้อน"""
+    def __init__(self, f, hasher, on_chunk, should_cancel):
+        self._f = f
+        self._hasher = hasher
+        self._on_chunk = on_chunk
+        self._should_cancel = should_cancel
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        if self._should_cancel is not None and self._should_cancel():
+            raise OperationCancelledError()
+        data = self._f.read(size)
+        if data:
+            self._hasher.update(data)
+            self.bytes_read += len(data)
+            if self._on_chunk is not None:
+                self._on_chunk(len(data))
+        return data
+
+
+class ArchiveWriter:
+    """
+    เขียนไฟล์ Archive หนึ่งไฟล์แบบต่อเนื่อง (ไม่ย้อนกลับไปแก้ไขส่วนที่เขียนแล้ว)
+    add() คืนค่า Hash (blake2b) ของเนื้อหาไฟล์ที่เขียน ข้อผิดพลาดของดิสก์ (OSError) ถูกส่งต่อให้ผู้เรียก
+    """
+    def __init__(self, path, archive_format, buffer_size):
+        self.path = path
+        self.archive_format = archive_format
+        self.buffer_size = buffer_size
+        self._raw = None
+        self._compressor = None
+        self._zip = None
+        self._tar = None
+        if archive_format == "zip":
+            self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESS_LEVEL, allowZip64=True)
+            return
+        if archive_format == "tar.gz":
+            compressor_factory = lambda raw: gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_COMPRESS_LEVEL)
+        elif archive_format == "tar.zst":
+            compressor_factory = _zstandard().ZstdCompressor(level=ZSTD_COMPRESS_LEVEL).stream_writer
+        else:
+            raise ValueError(f"ไม่รองรับรูปแบบ Archive '{archive_format}'")
+        # tar แบบ Stream (w|) ครอบตัวบีบอัด: เขียนต่อเนื่องตามลำดับโดยไม่ seek
+        self._raw = open(path, "wb")
+        self._compressor = compressor_factory(self._raw)
+        self._tar = tarfile.open(fileobj=self._compressor, mode="w|")
+
+    def add(self, source_path, arcname, size, mtime, on_chunk=None, should_cancel=None):
+        """
+        เพิ่มไฟล์ source_path ขนาด size (จากการสแกน) เป็น arcname
+        ValueError หากขนาดไฟล์เปลี่ยนไประหว่างการทำงาน (ไฟล์ถูกแก้ไขหลังการสแกน)
+        """
+        hasher = hashlib.blake2b()
+        with open(source_path, "rb") as f:
+            if self._zip is not None:
+                written = self._add_zip(f, arcname, size, mtime, hasher, on_chunk, should_cancel)
+                extra = b""
+            else:
+                info = tarfile.TarInfo(arcname)
+                info.size = size
+                info.mtime = int(mtime)
+                reader = _HashingReader(f, hasher, on_chunk, should_cancel)
+                self._tar.addfile(info, reader) # อ่านเท่ากับ size พอดี (OSError หากไฟล์สั้นลง)
+                written = reader.bytes_read
+                extra = f.read(1)
+        if written != size or extra:
+            raise ValueError(f"ขนาดของ '{source_path}' เปลี่ยนไประหว่างการทำงาน (ไฟล์ถูกแก้ไขหลังการสแกน)")
+        return hasher.hexdigest()
+
+    def _add_zip(self, f, arcname, size, mtime, hasher, on_chunk, should_cancel):
+        date_time = time.localtime(mtime)[:6]
+        if date_time[0] < 1980:
+            date_time = (1980, 1, 1, 0, 0, 0) # รูปแบบ zip เก็บวันที่ก่อนปี 1980 ไม่ได้
+        info = zipfile.ZipInfo(arcname, date_time=date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.file_size = size
+        written = 0
+        with self._zip.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as out:
+            while True:
+                if should_cancel is not None and should_cancel():
+                    raise OperationCancelledError()
+                data = f.read(self.buffer_size)
+                if not data:
+                    break
+                out.write(data)
+                hasher.update(data)
+                written += len(data)
+                if on_chunk is not None:
+                    on_chunk(len(data))
+        return written
+
+    def close(self):
+        """เขียนส่วนท้ายของ Archive และปิดไฟล์"""
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+            self._compressor.close()
+            self._raw.close()
+
+    def abort(self):
+        """ปิดไฟล์โดยไม่สนใจข้อผิดพลาด (ผู้เรียกลบไฟล์ที่ไม่สมบูรณ์เอง)"""
+        for closer in (self._zip, self._tar, self._compressor, self._raw):
+            if closer is not None:
+                try:
+                    closer.close()
+                except Exception:
+                    pass
+
+
+def verify_archive(path, archive_format, expected, buffer_size, on_read=None, should_cancel=None):
+    """
+    อ่านไฟล์ Archive ทั้งไฟล์และเปรียบเทียบขนาดและ Hash ของทุกไฟล์กับ expected (arcname -> (size, hash))
+    คืนค่ารายการปัญหาที่พบ (ว่าง = ผ่าน) ไฟล์ Archive ที่อ่านไม่ได้ถูกรายงานเป็นปัญหา ข้อผิดพลาดของดิสก์ (OSError) ถูกส่งต่อให้ผู้เรียก
+    """
+    found = {}
+    # ข้อผิดพลาดของรูปแบบไฟล์ (เนื้อหาเสียหาย) ต่างจากข้อผิดพลาดของดิสก์ (BadGzipFile เป็น OSError จึงต้องระบุแยก)
+    corrupt_errors = (zipfile.BadZipFile, tarfile.TarError, gzip.BadGzipFile, zlib.error, EOFError, ValueError)
+    if archive_format == "tar.zst":
+        corrupt_errors += (_zstandard().ZstdError,)
+
+    def check_member(name, f):
+        hasher = hashlib.blake2b()
+        size = 0
+        while True:
+            if should_cancel is not None and should_cancel():
+                raise OperationCancelledError()
+            data = f.read(buffer_size)
+            if not data:
+                break
+            hasher.update(data)
+            size += len(data)
+            if on_read is not None:
+                on_read(len(data))
+        found[name] = (size, hasher.hexdigest())
+
+    try:
+        if archive_format == "zip":
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    with zf.open(info) as f: # ตรวจสอบ CRC ของ zip ด้วย (BadZipFile หากไม่ตรง)
+                        check_member(info.filename, f)
+        else:
+            with open(path, "rb") as raw:
+                if archive_format == "tar.zst":
+                    tar = tarfile.open(fileobj=_zstandard().ZstdDecompressor().stream_reader(raw), mode="r|")
+                else:
+                    tar = tarfile.open(fileobj=raw, mode="r|gz")
+                with tar:
+                    for member in tar:
+                        if member.isfile():
+                            check_member(member.name, tar.extractfile(member))
+    except corrupt_errors as e:
+        return [f"อ่านไฟล์ Archive ไม่ได้: {e}"]
+
+    problems = []
+    for name, (size, digest) in expected.items():
+        actual = found.get(name)
+        if actual is None:
+            problems.append(f"ไม่พบ '{name}' ใน Archive")
+        elif actual != (size, digest):
+            problems.append(f"เนื้อหาของ '{name}' ใน Archive ไม่ตรงกับต้นทาง")
+    return problems
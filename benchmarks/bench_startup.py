@@ -0,0 +1,117 @@
+"""
+วัดเวลาเริ่มต้นโปรแกรม: เวลา import ของ engine/main และเวลาจนหน้าต่างแรกแสดงผล
+
+ตัวอย่าง:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --max-import-ms 80 --max-window-ms 1500
+
+แต่ละการวัดรันใน Process ใหม่ (เหมือนการเปิดโปรแกรมจริง) และรายงานค่ามัธยฐาน
+หากกำหนด --max-* และค่าที่วัดได้เกิน หรือโมดูลที่ควรถูก import แบบ lazy ถูกโหลดตั้งแต่เริ่ม จะออกด้วยรหัส 1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# ต้องตรงกับ STARTUP_PROBE_ENV ใน main.py
+STARTUP_PROBE_ENV = "AUTO_TRANSFER_STARTUP_PROBE"
+STARTUP_PROBE_MARKER = "STARTUP_PROBE first_window"
+# โมดูลที่ต้องไม่ถูก import ตอนเริ่มโปรแกรม (ใช้เฉพาะตอนตั้งเวลา/กรองอายุไฟล์/โหมดขนาน)
+LAZY_MODULES = ("dateutil", "concurrent.futures", "subprocess", "tkinter.filedialog", "tkinter.messagebox")
+
+
+def measure_import_ms(module):
+    """เวลา import แบบสะสมของโมดูล (มิลลิวินาที) จาก python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"ไม่พบเวลา import ของ {module}")
+
+
+def find_eager_lazy_modules():
+    """คืนรายชื่อโมดูลใน LAZY_MODULES ที่ถูกโหลดเมื่อ import main"""
+    code = ("import sys, json, main; "
+            f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_first_window_ms(timeout=30.0):
+    """
+    เวลาตั้งแต่เริ่ม Process จนหน้าต่างแรกแสดงผล (มิลลิวินาที)
+    รันในโฟลเดอร์ชั่วคราว เพื่อไม่ให้ไฟล์ตั้งค่า/Log ของผู้ใช้ถูกแก้ไข คืนค่า None หากเปิดหน้าต่างไม่ได้ (เช่น ไม่มีหน้าจอ)
+    """
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: "1"})
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "main.py")], cwd=work_dir, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        elapsed = None
+        try:
+            for line in proc.stdout:
+                if line.strip() == STARTUP_PROBE_MARKER:
+                    elapsed = (time.perf_counter() - start) * 1000.0
+                    break
+                if time.perf_counter() - start > timeout:
+                    break
+        finally:
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="วัดเวลาเริ่มต้นโปรแกรม Auto Data Transfer")
+    parser.add_argument("--repeat", type=int, default=5, help="จำนวนครั้งที่วัด (รายงานค่ามัธยฐาน)")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="เวลา import main สูงสุดที่ยอมรับได้")
+    parser.add_argument("--max-window-ms", type=float, default=None, help="เวลาจนหน้าต่างแรกแสดงผลสูงสุดที่ยอมรับได้")
+    parser.add_argument("--json", action="store_true", help="แสดงผลเป็น JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "import_engine_ms": statistics.median(measure_import_ms("engine") for _ in range(args.repeat)),
+        "import_main_ms": statistics.median(measure_import_ms("main") for _ in range(args.repeat)),
+        "eager_lazy_modules": find_eager_lazy_modules(),
+    }
+    window_samples = [measure_first_window_ms() for _ in range(args.repeat)]
+    results["first_window_ms"] = None if None in window_samples else statistics.median(window_samples)
+
+    failures = []
+    if results["eager_lazy_modules"]:
+        failures.append(f"โมดูลที่ควร import แบบ lazy ถูกโหลดตั้งแต่เริ่ม: {', '.join(results['eager_lazy_modules'])}")
+    if args.max_import_ms is not None and results["import_main_ms"] > args.max_import_ms:
+        failures.append(f"import main ใช้เวลา {results['import_main_ms']:.1f} ms เกิน {args.max_import_ms} ms")
+    if args.max_window_ms is not None and results["first_window_ms"] is not None and results["first_window_ms"] > args.max_window_ms:
+        failures.append(f"หน้าต่างแรกแสดงผลใน {results['first_window_ms']:.1f} ms เกิน {args.max_window_ms} ms")
+    results["failures"] = failures
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print(f"Python {results['python']} (มัธยฐานจาก {args.repeat} ครั้ง)")
+        print(f"  import engine      : {results['import_engine_ms']:8.1f} ms")
+        print(f"  import main        : {results['import_main_ms']:8.1f} ms")
+        if results["first_window_ms"] is None:
+            print("  หน้าต่างแรกแสดงผล : ข้าม (เปิดหน้าต่างไม่ได้ เช่น ไม่มีหน้าจอ)")
+        else:
+            print(f"  หน้าต่างแรกแสดงผล : {results['first_window_ms']:8.1f} ms")
+        for failure in failures:
+            print(f"❌ {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+วัดความเร็วการย้าย/คัดลอก/ลบไฟล์ของ Engine ด้วยชุดข้อมูลสังเคราะห์ที่สร้างซ้ำได้ (ไม่ใช้ GUI)
+
+ตัวอย่าง:
+    python benchmarks/bench_transfer.py --shape tiny --op copy --scale 0.01
+    python benchmarks/bench_transfer.py --shape all --op move copy delete --workdir D:\\bench --dest-dir E:\\bench
+    python benchmarks/bench_transfer.py --shape mixed_ages --op move --set transfer_workers=4 --repeat 3
+
+รูปแบบชุดข้อมูล (--scale คูณจำนวนไฟล์และขนาดไฟล์ใหญ่ เพื่อรันแบบย่อได้):
+    tiny        ไฟล์ CSV ขนาดเล็ก 100,000 ไฟล์ในโฟลเดอร์เดียว
+    large       ไฟล์ขนาด 10 GB จำนวน 3 ไฟล์
+    mixed_ages  ไฟล์ 20,000 ไฟล์ในโฟลเดอร์ย่อย อายุกระจาย 0-24 เดือน (รันด้วย filter_old และ months_old=6)
+    collisions  ไฟล์ 10,000 ไฟล์ ที่ครึ่งหนึ่งมีชื่อซ้ำกับไฟล์ในปลายทางอยู่แล้ว (บางไฟล์มี _copy1 ด้วย)
+
+ชุดข้อมูลถูกสร้างใหม่ก่อนทุกการวัด (การย้าย/ลบใช้ชุดข้อมูลหมด) ด้วย --seed เดียวกันจะได้ชื่อ ขนาด และอายุไฟล์เหมือนเดิม
+แต่ละการวัดรันใน Process ใหม่ และรายงาน files/s, MB/s, จำนวน syscall อ่าน/เขียนต่อไฟล์ (จาก /proc/self/io บน Linux)
+และหน่วยความจำสูงสุด (peak RSS) ผลลัพธ์ถูกต่อท้ายลงไฟล์ JSONL (--results) เพื่อเปรียบเทียบกับรอบก่อน ๆ
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS_FILE = os.path.join(REPO_DIR, "benchmarks", "bench_transfer_results.jsonl")
+OPERATIONS = ("move", "copy", "delete")
+MB = 1024 * 1024
+# ข้อมูลสุ่มที่ใช้เขียนซ้ำในไฟล์ใหญ่ (สร้างไฟล์ 10 GB ได้เร็วโดยเนื้อหายังบีบอัดไม่ได้)
+LARGE_BLOCK_BYTES = 8 * MB
+
+# จำนวนไฟล์และการตั้งค่าเพิ่มเติมของแต่ละรูปแบบชุดข้อมูล
+SHAPES = {
+    "tiny": {"files": 100000, "settings": {}},
+    "large": {"files": 3, "size_mb": 10240, "settings": {}},
+    "mixed_ages": {"files": 20000, "max_age_days": 730, "settings": {"recursive": True, "filter_old": True, "months_old": 6}},
+    "collisions": {"files": 10000, "settings": {}},
+}
+
+
+def _set_age(path, rng, max_age_days, now):
+    mtime = now - rng.uniform(0, max_age_days) * 86400
+    os.utime(path, (mtime, mtime))
+
+
+def generate_dataset(shape, src, dst, scale=1.0, seed=0):
+    """
+    สร้างชุดข้อมูลสังเคราะห์รูปแบบ shape ในโฟลเดอร์ src (และไฟล์ที่มีอยู่แล้วใน dst สำหรับ collisions)
+    คืนค่า dict สรุปจำนวนไฟล์และขนาดรวมที่สร้าง
+    """
+    spec = SHAPES[shape]
+    rng = random.Random(f"{shape}:{seed}")
+    count = max(1, int(spec["files"] * scale))
+    now = time.time()
+    total_bytes = 0
+
+    if shape == "large":
+        size = max(1, int(spec["size_mb"] * MB * scale))
+        block = rng.randbytes(LARGE_BLOCK_BYTES)
+        for i in range(count):
+            with open(os.path.join(src, f"large_{i:02d}.bin"), "wb") as f:
+                remaining = size
+                while remaining > 0:
+                    chunk = block[:remaining] if remaining < len(block) else block
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            total_bytes += size
+        return {"files": count, "bytes": total_bytes}
+
+    for i in range(count):
+        if shape == "mixed_ages":
+            folder = os.path.join(src, f"line{i % 8}", f"batch{i % 50:02d}")
+            os.makedirs(folder, exist_ok=True)
+            name = f"data_{i:06d}.csv"
+            size = min(MB, int(rng.lognormvariate(9, 1.5)))
+        else:
+            folder = src
+            name = f"data_{i:06d}.csv"
+            size = rng.randint(200, 2000)
+        path = os.path.join(folder, name)
+        row = f"{i},{rng.random():.6f},{rng.randint(0, 10**6)}\n"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write((row * (size // len(row) + 1))[:size])
+        if shape == "mixed_ages":
+            _set_age(path, rng, spec["max_age_days"], now)
+        total_bytes += size
+
+        if shape == "collisions" and i % 2 == 0:
+            # ไฟล์ชื่อเดียวกันที่มีอยู่แล้วในปลายทาง (เนื้อหาต่างกัน) และ _copy1 ทุก 10 ไฟล์ เพื่อทดสอบการหาชื่อใหม่
+            with open(os.path.join(dst, name), "w", encoding="utf-8") as f:
+                f.write(f"existing {i}\n")
+            if i % 10 == 0:
+                with open(os.path.join(dst, f"data_{i:06d}_copy1.csv"), "w", encoding="utf-8") as f:
+                    f.write(f"existing copy {i}\n")
+    return {"files": count, "bytes": total_bytes}
+
+
+def _read_proc_io():
+    """จำนวน syscall อ่าน/เขียนของ Process นี้ (Linux) หรือ None"""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["syscr"]) + int(fields["syscw"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _peak_rss_mb():
+    """หน่วยความจำสูงสุดของ Process นี้ (MB) หรือ None หากวัดไม่ได้ (เช่น Windows)"""
+    # Linux: VmHWM เริ่มนับใหม่เมื่อ exec ส่วน ru_maxrss อาจรวมหน่วยความจำของ Process แม่ตอน fork
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux รายงานเป็น KB, macOS เป็นไบต์
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario_child(config_file, operation):
+    """รันการทำงานหนึ่งรอบใน Process นี้ (เรียกผ่าน --child) และพิมพ์ผลเป็น JSON บรรทัดสุดท้าย"""
+    sys.path.insert(0, REPO_DIR)
+    from engine import TransferEngine
+    from run_metrics import metrics_path
+
+    engine = TransferEngine(config_file=config_file, console=False)
+    io_before = _read_proc_io()
+    start = time.perf_counter()
+    success = engine.run(operation)
+    elapsed = time.perf_counter() - start
+    io_after = _read_proc_io()
+    engine.flush_logs()
+
+    with open(metrics_path(config_file), "r", encoding="utf-8") as f:
+        metrics = json.load(f)
+    counters = metrics["counters"]
+    files = counters.get("files_processed", 0)
+    nbytes = counters.get("bytes_processed", 0)
+    result = {
+        "success": success,
+        "seconds": elapsed,
+        "files_processed": files,
+        "bytes_processed": nbytes,
+        "files_per_sec": files / elapsed if elapsed > 0 else None,
+        "mb_per_sec": nbytes / MB / elapsed if elapsed > 0 else None,
+        "io_syscalls_per_file": (io_after - io_before) / files if io_before is not None and io_after is not None and files else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "phases": {name: phase["seconds"] for name, phase in metrics["phases"].items()},
+    }
+    print(json.dumps(result))
+    return 0 if success else 1
+
+
+def measure(shape, operation, work_dir, dest_root, scale, seed, overrides):
+    """สร้างชุดข้อมูลใหม่ รันการทำงานหนึ่งครั้งใน Process ใหม่ และคืนค่าผลการวัด"""
+    run_dir = tempfile.mkdtemp(prefix=f"bench_{shape}_{operation}_", dir=work_dir)
+    dest_dir = tempfile.mkdtemp(prefix=f"bench_{shape}_{operation}_dst_", dir=dest_root) if dest_root else os.path.join(run_dir, "dst")
+    src = os.path.join(run_dir, "src")
+    try:
+        os.makedirs(src)
+        os.makedirs(dest_dir, exist_ok=True)
+        gen_start = time.perf_counter()
+        dataset = generate_dataset(shape, src, dest_dir, scale, seed)
+        gen_seconds = time.perf_counter() - gen_start
+
+        settings = {"source": src, "dest": dest_dir, "min_free_space_gb": 0, "use_journal": True}
+        settings.update(SHAPES[shape]["settings"])
+        settings.update(overrides)
+        config_file = os.path.join(run_dir, "move_config.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+
+        # cwd = run_dir เพื่อให้ไฟล์ Log ของ Engine ถูกเขียนในโฟลเดอร์ชั่วคราว
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", config_file, operation],
+                              cwd=run_dir, capture_output=True, text=True)
+        lines = proc.stdout.strip().splitlines()
+        if not lines:
+            raise RuntimeError(f"การวัด {shape}/{operation} ล้มเหลว: {proc.stderr.strip()}")
+        result = json.loads(lines[-1])
+        result.update(dataset_files=dataset["files"], dataset_bytes=dataset["bytes"], generate_seconds=gen_seconds)
+        return result
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        if dest_root:
+            shutil.rmtree(dest_dir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _load_previous(results_file, key):
+    """ผลล่าสุดในไฟล์ผลลัพธ์ที่มีรูปแบบการวัดเดียวกัน (หรือ None)"""
+    previous = None
+    try:
+        with open(results_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if all(record.get(name) == value for name, value in key.items()):
+                    previous = record
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def _parse_override(text):
+    """แปลง key=value ของ --set (ค่าเป็น JSON หากแปลงได้ เช่น 4, true, "abc")"""
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"'{text}' ต้องอยู่ในรูปแบบ key=value")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["--child"]:
+        return run_scenario_child(argv[1], argv[2])
+
+    parser = argparse.ArgumentParser(description="วัดความเร็วการโอนย้ายไฟล์ของ Auto Data Transfer ด้วยชุดข้อมูลสังเคราะห์")
+    parser.add_argument("--shape", nargs="+", choices=list(SHAPES) + ["all"], default=["tiny"], help="รูปแบบชุดข้อมูล")
+    parser.add_argument("--op", nargs="+", choices=OPERATIONS, default=["copy"], help="การทำงานที่วัด")
+    parser.add_argument("--scale", type=float, default=1.0, help="ตัวคูณจำนวนไฟล์และขนาดไฟล์ใหญ่ (เช่น 0.01 สำหรับรันแบบย่อ)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed ของชุดข้อมูล")
+    parser.add_argument("--repeat", type=int, default=1, help="จำนวนครั้งที่วัดต่อรูปแบบ (รายงานค่ามัธยฐาน)")
+    parser.add_argument("--workdir", default=None, help="โฟลเดอร์สำหรับสร้างต้นทาง (ค่าเริ่มต้น: โฟลเดอร์ชั่วคราวของระบบ)")
+    parser.add_argument("--dest-dir", default=None, help="โฟลเดอร์สำหรับปลายทาง เช่น อีกดิสก์หรือไดรฟ์เครือข่าย (ค่าเริ่มต้น: ภายใน --workdir)")
+    parser.add_argument("--set", dest="overrides", action="append", type=_parse_override, default=[],
+                        metavar="KEY=VALUE", help="ค่าตั้งค่าเพิ่มเติม เช่น transfer_workers=4 (ใช้ซ้ำได้)")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_FILE, help="ไฟล์ JSONL ที่ต่อท้ายผลลัพธ์")
+    parser.add_argument("--no-save", action="store_true", help="ไม่บันทึกผลลัพธ์")
+    parser.add_argument("--json", action="store_true", help="แสดงผลเป็น JSON")
+    args = parser.parse_args(argv)
+
+    shapes = list(SHAPES) if "all" in args.shape else args.shape
+    overrides = dict(args.overrides)
+    common = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+    records = []
+    for shape in shapes:
+        for operation in args.op:
+            samples = [measure(shape, operation, args.workdir, args.dest_dir, args.scale, args.seed, overrides)
+                       for _ in range(args.repeat)]
+            record = dict(common, shape=shape, operation=operation, scale=args.scale, seed=args.seed,
+                          settings=overrides, repeat=args.repeat)
+            for name in samples[0]:
+                values = [sample[name] for sample in samples]
+                if name == "phases":
+                    record[name] = {phase: statistics.median(v[phase] for v in values) for phase in values[0]}
+                elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                    record[name] = statistics.median(values)
+                else:
+                    record[name] = values[-1] if name != "success" else all(values)
+            key = {"shape": shape, "operation": operation, "scale": args.scale, "seed": args.seed, "settings": overrides}
+            previous = _load_previous(args.results, key)
+            record["previous_files_per_sec"] = previous.get("files_per_sec") if previous else None
+            records.append(record)
+            if not args.no_save:
+                with open(args.results, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    if args.json:
+        print(json.dumps(records, ensure_ascii=False, indent=2))
+    else:
+        def fmt(value, spec):
+            return "-" if value is None else format(value, spec)
+        for r in records:
+            change = ""
+            if r["previous_files_per_sec"] and r["files_per_sec"]:
+                change = f" ({(r['files_per_sec'] / r['previous_files_per_sec'] - 1) * 100:+.1f}% จากครั้งก่อน)"
+            status = "" if r["success"] else " ❌ การทำงานไม่สำเร็จ"
+            print(f"{r['shape']:<11} {r['operation']:<6} {r['files_processed']:>8,.0f} ไฟล์  {fmt(r['files_per_sec'], '10,.1f')} files/s{change}"
+                  f"  {fmt(r['mb_per_sec'], '8,.1f')} MB/s  syscall/ไฟล์ {fmt(r['io_syscalls_per_file'], '6.1f')}"
+                  f"  peak RSS {fmt(r['peak_rss_mb'], '6.1f')} MB{status}")
+    return 0 if all(r["success"] for r in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
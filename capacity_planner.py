@@ -0,0 +1,73 @@
+"""
+วางแผนการใช้พื้นที่ปลายทาง: เปรียบเทียบขนาดรวมที่จะโอนย้ายกับพื้นที่ว่าง (หักพื้นที่ขั้นต่ำที่ต้องเหลือไว้)
+และเฝ้าระวังพื้นที่ว่างระหว่างการทำงาน เพื่อหยุดที่ขอบไฟล์ก่อนพื้นที่ว่างจะต่ำกว่าเกณฑ์
+
+พื้นที่ว่างถูกวัดจริงเมื่อเริ่มการทำงาน และทุกครั้งที่เขียนข้อมูลครบ check_interval_bytes
+ระหว่างนั้นใช้ค่าประมาณ (พื้นที่ที่วัดได้ - ขนาดไฟล์ที่จองไปแล้ว) ซึ่งไม่ต่ำกว่าความจริง
+ยกเว้นมีโปรแกรมอื่นเขียนลงดิสก์เดียวกันพร้อมกัน ซึ่งจะถูกตรวจพบในการวัดครั้งถัดไป
+"""
+import shutil
+import threading
+
+
+def plan_oldest_fit(entries, budget_bytes):
+    """
+    เลือกไฟล์เก่าที่สุดต่อเนื่องกันที่ขนาดรวมไม่เกิน budget_bytes (entries ต้องเรียงจากเก่าที่สุดแล้ว)
+    หยุดที่ไฟล์แรกที่ใส่ไม่ได้ เพื่อไม่ให้ไฟล์ใหม่กว่าถูกโอนย้ายก่อนไฟล์ที่เก่ากว่า
+    คืนค่า (รายการที่เลือก, ขนาดรวมที่เลือก)
+    """
+    selected_bytes = 0
+    for count, entry in enumerate(entries):
+        if selected_bytes + entry.size > budget_bytes:
+            return entries[:count], selected_bytes
+        selected_bytes += entry.size
+    return entries, selected_bytes
+
+
+class SpaceGuard:
+    """
+    จองพื้นที่ปลายทางทีละไฟล์ก่อนคัดลอก ปลอดภัยเมื่อเรียกจากหลาย Worker Thread
+    reserve() คืนค่า False เมื่อการคัดลอกไฟล์นั้นจะทำให้พื้นที่ว่างต่ำกว่าเกณฑ์ (หลังวัดพื้นที่จริงซ้ำแล้ว)
+    หลังจากนั้นทุกการจองจะถูกปฏิเสธ เพื่อให้การทำงานหยุดที่ขอบไฟล์ ข้อผิดพลาดของดิสก์ (OSError) ถูกส่งต่อให้ผู้เรียก
+    """
+    def __init__(self, path, min_free_bytes, check_interval_bytes, disk_usage=shutil.disk_usage):
+        self.path = path
+        self.min_free_bytes = min_free_bytes
+        self.check_interval_bytes = max(1, check_interval_bytes)
+        self._disk_usage = disk_usage
+        self._lock = threading.Lock()
+        self._inflight = 0 # ขนาดของไฟล์ที่จองแล้วแต่ยังคัดลอกไม่เสร็จ
+        self._since_check = 0 # ขนาดที่จองตั้งแต่การวัดพื้นที่ครั้งล่าสุด
+        self.exhausted = False
+        self.checks = 0
+        self.free_bytes = self._measure()
+
+    def _measure(self):
+        self.checks += 1
+        return self._disk_usage(self.path).free
+
+    @property
+    def available_bytes(self):
+        """พื้นที่ที่ยังใช้ได้โดยไม่ต่ำกว่าเกณฑ์ (จากการวัดครั้งล่าสุด หักส่วนที่จองไปแล้ว)"""
+        return self.free_bytes - self._since_check - self.min_free_bytes
+
+    def reserve(self, nbytes):
+        """จองพื้นที่สำหรับไฟล์ขนาด nbytes คืนค่า False หากพื้นที่ไม่พอ"""
+        with self._lock:
+            if self.exhausted:
+                return False
+            if self._since_check + nbytes >= self.check_interval_bytes or self.available_bytes < nbytes:
+                # ครบรอบการตรวจ หรือค่าประมาณบอกว่าไม่พอ: วัดพื้นที่จริง (ไฟล์ที่กำลังคัดลอกอาจยังเขียนไม่ครบ จึงหักไว้ทั้งไฟล์)
+                self.free_bytes = self._measure() - self._inflight
+                self._since_check = 0
+            if self.available_bytes < nbytes:
+                self.exhausted = True
+                return False
+            self._since_check += nbytes
+            self._inflight += nbytes
+            return True
+
+    def release(self, nbytes):
+        """แจ้งว่าไฟล์ที่จองไว้คัดลอกเสร็จ (หรือล้มเหลว) แล้ว"""
+        with self._lock:
+            self._inflight -= nbytes
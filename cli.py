@@ -0,0 +1,262 @@
+"""
+Command Line สำหรับรัน Auto Data Transfer โดยไม่ต้องใช้ GUI (เช่น บนเซิร์ฟเวอร์ที่ไม่มีหน้าจอ หรือจาก cron)
+
+ตัวอย่าง:
+    python cli.py run --op move --config move_config.json
+    python cli.py run --op copy --progress json
+    python cli.py run --op archive
+    python cli.py run --op copy --job PE-Line1
+    python cli.py run-jobs --job PE-Line1 --job PE-Line2
+    python cli.py daemon
+    python cli.py next-run --progress json
+    python cli.py --profile run --op move
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from engine import CONFIG_FILE, TransferEngine
+
+# ระยะเวลาขั้นต่ำระหว่างการแสดงความคืบหน้าแต่ละครั้ง (วินาที) เพื่อไม่ให้พิมพ์ทุกไฟล์
+CLI_PROGRESS_INTERVAL_SEC = 1.0
+
+# รหัสการออกจากโปรแกรม
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CANCELLED = 130
+
+
+class ProgressPrinter:
+    """แสดง Log และความคืบหน้าจาก Engine เป็นข้อความ หรือเป็น JSON บรรทัดละหนึ่ง Event"""
+    def __init__(self, fmt="text", interval=CLI_PROGRESS_INTERVAL_SEC):
+        self.fmt = fmt
+        self.interval = interval
+        self._lock = threading.Lock() # Engine อาจเรียกจากหลาย Thread
+        self._last_progress = 0.0
+
+    def emit(self, event, **fields):
+        """พิมพ์ Event เป็น JSON หนึ่งบรรทัด"""
+        with self._lock:
+            print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+    def on_log(self, full_msg, message, show_popup):
+        # แสดงเฉพาะข้อความที่ GUI แสดงใน Log Box (รายละเอียดทีละไฟล์อยู่ใน action_log.txt)
+        if self.fmt == "json":
+            self.emit("log", message=message, line=full_msg, error=bool(show_popup or "❌" in message))
+        else:
+            with self._lock:
+                print(full_msg, flush=True)
+
+    def on_progress(self, value, text, mode, stats):
+        # ข้อความสถานะที่ไม่มี stats (เริ่ม/เสร็จสิ้น/ล้มเหลว) แสดงเสมอ ส่วนความคืบหน้าระหว่างทำงานแสดงไม่เกินทุก interval วินาที
+        now = time.monotonic()
+        with self._lock:
+            if stats is not None and now - self._last_progress < self.interval:
+                return
+            self._last_progress = now
+        if not text and stats is None:
+            return
+        if self.fmt == "json":
+            self.emit("progress", percent=value, text=text, stats=stats)
+        else:
+            percent = "--" if value is None else f"{value:3d}%"
+            with self._lock:
+                print(f"[{percent}] {text}", flush=True)
+
+
+def _build_engine(args, printer):
+    # ปิดการแสดง Log ทุกบรรทัดที่ Console ของ Engine เพื่อให้ Log และความคืบหน้าแสดงตามลำดับผ่าน printer
+    engine = TransferEngine(args.config, on_log=printer.on_log, on_progress=printer.on_progress, console=False)
+    engine.profile_runs = getattr(args, "profile", False)
+    job_name = getattr(args, "job", None)
+    return engine.for_job(job_name) if isinstance(job_name, str) else engine
+
+
+def _build_job_runner(engine):
+    """คืนค่า JobRunner เมื่อไฟล์ตั้งค่ามีรายการ jobs (None หากไม่มี) ValueError หากรายการ jobs ไม่ถูกต้อง"""
+    from jobs import JobRunner
+    runner = JobRunner(engine)
+    return runner if runner.job_names() else None
+
+
+def cmd_run(args):
+    """รันการทำงานหนึ่งครั้งจนเสร็จ กด Ctrl+C เพื่อยกเลิก (ไฟล์ที่คัดลอกไม่ครบจะถูกลบ)"""
+    printer = ProgressPrinter(args.progress)
+    engine = _build_engine(args, printer)
+    result = {}
+    done = threading.Event()
+
+    def worker():
+        try:
+            result["success"] = engine.run(args.op)
+        finally:
+            done.set()
+
+    # รันใน Thread แยก เพื่อให้ Thread หลักรับ Ctrl+C แล้วสั่งยกเลิกอย่างปลอดภัยได้
+    # (รอด้วย Event แทน Thread.join เนื่องจาก join ที่ถูกขัดจังหวะด้วย Ctrl+C อาจรายงานสถานะ Thread ผิด)
+    threading.Thread(target=worker, daemon=True).start()
+    cancelled = False
+    while not done.is_set():
+        try:
+            done.wait(0.5)
+        except KeyboardInterrupt:
+            if not cancelled:
+                cancelled = True
+                engine.cancel()
+    engine.flush_logs()
+
+    success = result.get("success", False)
+    if args.progress == "json":
+        printer.emit("result", operation=args.op, success=success, cancelled=cancelled)
+    if cancelled:
+        return EXIT_CANCELLED
+    return EXIT_OK if success else EXIT_FAILED
+
+
+def cmd_run_jobs(args):
+    """รันงานในรายการ jobs พร้อมกัน (ทุกงาน หรือเฉพาะ --job) ตามขีดจำกัดต่อดิสก์ กด Ctrl+C เพื่อยกเลิกทุกงาน"""
+    from jobs import JobRunner
+    printer = ProgressPrinter(args.progress)
+    engine = _build_engine(args, printer)
+    runner = JobRunner(engine)
+    try:
+        started = runner.run_jobs(args.job, args.op)
+    except ValueError as e:
+        engine.log(f"❌ การตั้งค่า jobs ไม่ถูกต้อง: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+        engine.flush_logs()
+        return EXIT_FAILED
+    if not started:
+        engine.log("⚠️ ไม่มีงานที่เริ่มได้ (ไม่มีรายการ jobs ในไฟล์ตั้งค่า)", to_app_log=True, to_gui_log=True, show_popup=False)
+
+    cancelled = False
+    while True:
+        try:
+            if runner.wait(0.5):
+                break
+        except KeyboardInterrupt:
+            if not cancelled:
+                cancelled = True
+                runner.cancel()
+    engine.flush_logs()
+
+    results = {name: runner.results.get(name, False) for name in started}
+    if args.progress == "json":
+        printer.emit("result", jobs=results, success=bool(started) and all(results.values()), cancelled=cancelled)
+    if cancelled:
+        return EXIT_CANCELLED
+    return EXIT_OK if started and all(results.values()) else EXIT_FAILED
+
+
+def cmd_daemon(args):
+    """ตรวจสอบกำหนดการอย่างต่อเนื่องและรันงานเมื่อถึงเวลา (แทนการเปิด GUI ทิ้งไว้) รันทุกงานพร้อมกันเมื่อมีรายการ jobs"""
+    printer = ProgressPrinter(args.progress)
+    engine = _build_engine(args, printer)
+    try:
+        runner = _build_job_runner(engine)
+    except ValueError as e:
+        engine.log(f"❌ การตั้งค่า jobs ไม่ถูกต้อง: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+        engine.flush_logs()
+        return EXIT_FAILED
+    if runner is not None:
+        runner.start_scheduler()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            runner.cancel()
+            runner.wait()
+            engine.flush_logs()
+        return EXIT_OK
+
+    engine.ensure_last_run_file()
+    idle = threading.Event()
+    idle.set()
+
+    def on_due(op):
+        idle.clear()
+        try:
+            engine.run(op)
+        finally:
+            idle.set()
+
+    engine.start_scheduler(on_due=on_due)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # รอให้งานที่กำลังทำหยุดที่ไฟล์/ก้อนข้อมูลถัดไปก่อนออก
+        if not idle.is_set():
+            engine.cancel()
+            idle.wait()
+        engine.flush_logs()
+    return EXIT_OK
+
+
+def cmd_next_run(args):
+    """แสดงเวลารันครั้งถัดไปตามการตั้งค่าปัจจุบัน"""
+    printer = ProgressPrinter(args.progress)
+    engine = _build_engine(args, printer)
+    try:
+        runner = _build_job_runner(engine)
+    except ValueError as e:
+        engine.log(f"❌ การตั้งค่า jobs ไม่ถูกต้อง: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+        engine.flush_logs()
+        return EXIT_FAILED
+    if runner is not None:
+        for name, run_now, next_run, message in runner.next_runs():
+            if args.progress == "json":
+                printer.emit("next_run", job=name, due=run_now, next_run=next_run.isoformat(timespec="minutes"), message=message)
+            else:
+                print(f"[{name}] {message}")
+        engine.flush_logs()
+        return EXIT_OK
+
+    run_now, next_run, message = engine.should_schedule_run()
+    engine.flush_logs()
+    if args.progress == "json":
+        printer.emit("next_run", due=run_now, next_run=next_run.isoformat(timespec="minutes"), message=message)
+    else:
+        print(message)
+    return EXIT_OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Auto Data Transfer (ไม่ใช้ GUI)")
+    parser.add_argument("--config", default=CONFIG_FILE, help=f"ไฟล์ตั้งค่า (ค่าเริ่มต้น: {CONFIG_FILE})")
+    parser.add_argument("--progress", choices=("text", "json"), default="text",
+                        help="รูปแบบการแสดงผล: text หรือ json (หนึ่ง Event ต่อบรรทัด)")
+    parser.add_argument("--profile", action="store_true",
+                        help="บันทึกโปรไฟล์ของทุกรอบการทำงานในโฟลเดอร์ profiles ข้างไฟล์ Log (เหมือน profile_runs ในไฟล์ตั้งค่า)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="รันการทำงานหนึ่งครั้ง")
+    run_parser.add_argument("--op", choices=("move", "copy", "delete", "archive"), required=True, help="การทำงานที่ต้องการ")
+    run_parser.add_argument("--job", help="ใช้การตั้งค่าของงานนี้ในรายการ jobs (ค่าเริ่มต้น: การตั้งค่าระดับบนสุด)")
+    run_parser.set_defaults(func=cmd_run)
+
+    run_jobs_parser = subparsers.add_parser("run-jobs", help="รันงานในรายการ jobs พร้อมกันหนึ่งครั้ง")
+    run_jobs_parser.add_argument("--job", action="append", help="ชื่องานที่ต้องการ (ระบุซ้ำได้ ค่าเริ่มต้น: ทุกงาน)")
+    run_jobs_parser.add_argument("--op", choices=("move", "copy", "delete", "archive"),
+                                 help="การทำงานของทุกงาน (ค่าเริ่มต้น: auto_operation ของแต่ละงาน)")
+    run_jobs_parser.set_defaults(func=cmd_run_jobs)
+
+    daemon_parser = subparsers.add_parser("daemon", help="รัน Scheduler ต่อเนื่องโดยไม่มี GUI")
+    daemon_parser.set_defaults(func=cmd_daemon)
+
+    next_run_parser = subparsers.add_parser("next-run", help="แสดงเวลารันครั้งถัดไป")
+    next_run_parser.set_defaults(func=cmd_next_run)
+
+    # อนุญาตให้ระบุ --config/--progress หลังคำสั่งย่อยได้ด้วย
+    for sub in (run_parser, run_jobs_parser, daemon_parser, next_run_parser):
+        sub.add_argument("--config", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+        sub.add_argument("--progress", choices=("text", "json"), default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+        sub.add_argument("--profile", action="store_true", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
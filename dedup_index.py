@@ -0,0 +1,73 @@
+"""
+ดัชนี Hash ของเนื้อหาไฟล์ในปลายทาง (SQLite) สำหรับตรวจหาไฟล์ซ้ำ (deduplication)
+
+เก็บ Hash ของไฟล์ปลายทางพร้อมขนาดและเวลาแก้ไข (ns) ขณะคำนวณ
+Hash ที่บันทึกไว้จะถูกใช้ซ้ำเฉพาะเมื่อขนาดและเวลาแก้ไขของไฟล์ยังตรงกัน แต่ละไฟล์ปลายทางจึงถูกอ่านเพื่อคำนวณ Hash เพียงครั้งเดียว
+จนกว่าไฟล์นั้นจะถูกแก้ไข ไฟล์ที่คัดลอกพร้อมคำนวณ Hash (hash_files) จะถูกบันทึกโดยไม่ต้องอ่านซ้ำ
+ดัชนี (size, digest) ใช้ค้นหาไฟล์ที่เนื้อหาเหมือนกันจากทุกโฟลเดอร์ในปลายทางที่เคยคำนวณ Hash ไว้ (โหมด hardlink)
+"""
+import os
+import sqlite3
+import threading
+
+DEDUP_INDEX_FILE = "dedup_index.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    algorithm TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hashes_digest ON hashes(size, digest);
+"""
+
+
+def dedup_index_path(config_file):
+    """ตำแหน่งไฟล์ดัชนี (อยู่ในโฟลเดอร์เดียวกับไฟล์ตั้งค่า)"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), DEDUP_INDEX_FILE)
+
+
+class DedupIndex:
+    """
+    ดัชนี Hash ของไฟล์ปลายทาง ปลอดภัยเมื่อเรียกจากหลาย Worker Thread (ใช้การเชื่อมต่อเดียวภายใต้ Lock)
+    ข้อผิดพลาดของฐานข้อมูล (sqlite3.Error) ถูกส่งต่อให้ผู้เรียกจัดการ
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, path, size, mtime_ns, algorithm):
+        """คืนค่า Hash ที่บันทึกไว้ของไฟล์ หรือ None หากไม่มี หรือไฟล์ถูกแก้ไขหลังการคำนวณ"""
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, algorithm, digest FROM hashes WHERE path = ?", (path,)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns or row[2] != algorithm:
+            return None
+        return row[3]
+
+    def put(self, path, size, mtime_ns, algorithm, digest):
+        """บันทึก Hash ของไฟล์ (แทนที่ค่าเดิม)"""
+        with self._lock:
+            self._conn.execute("INSERT INTO hashes (path, size, mtime_ns, algorithm, digest) VALUES (?, ?, ?, ?, ?) "
+                               "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                               "algorithm = excluded.algorithm, digest = excluded.digest",
+                               (path, size, mtime_ns, algorithm, digest))
+
+    def find(self, size, algorithm):
+        """
+        รายการ (path, mtime_ns, digest) ของไฟล์ที่บันทึกไว้ว่ามีขนาด size (ค้นหาผ่านดัชนี size, digest)
+        ผู้เรียกต้องตรวจสอบว่าไฟล์ยังไม่ถูกแก้ไข (ขนาดและ mtime_ns ยังตรงกัน) ก่อนใช้งาน
+        """
+        with self._lock:
+            return self._conn.execute("SELECT path, mtime_ns, digest FROM hashes WHERE size = ? AND algorithm = ?",
+                                      (size, algorithm)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
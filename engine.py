@@ -0,0 +1,2434 @@
+"""
+Engine สำหรับการสแกน/กรอง/ย้าย/คัดลอก/ลบไฟล์ และการตั้งเวลา โดยไม่ขึ้นกับ Tkinter
+ใช้ร่วมกันโดย GUI (main.py) และ Command Line (cli.py)
+"""
+import os
+import shutil
+import datetime
+import json
+import threading
+import queue
+import atexit
+import sys
+import errno
+import re
+import time
+from collections import namedtuple
+from operator import attrgetter
+# dateutil และ concurrent.futures ถูก import เมื่อใช้งานจริง (ภายในฟังก์ชัน) เพื่อให้โปรแกรมเริ่มทำงานได้เร็วขึ้น
+
+# --- Constants ---
+CONFIG_FILE = "move_config.json"
+# ไฟล์ Log หลักของแอปพลิเคชัน (ครอบคลุมเฉพาะ Log หลักของแอปพลิเคชัน)
+LOG_FILE = "app_log.txt"
+# ไฟล์ Log สำหรับบันทึกการกระทำกับไฟล์ (ย้าย, คัดลอก, ลบ) และขั้นตอนย่อย
+ACTION_LOG_FILE = "action_log.txt"
+# ไฟล์สำหรับบันทึกวันที่รัน Task ล่าสุด
+LAST_RUN_FILE = "last_run.json"
+# เพิ่มไฟล์ Log สำหรับเก็บข้อผิดพลาดโดยเฉพาะ
+ERROR_LOG_FILE = "error_log.txt"
+# การเขียน Log แบบ asynchronous: ขนาดคิวสูงสุด, จำนวนบรรทัดต่อชุด และระยะเวลาสูงสุดก่อนเขียนลงไฟล์
+LOG_QUEUE_MAX_LINES = 20000
+LOG_BATCH_MAX_LINES = 500
+LOG_FLUSH_INTERVAL_SEC = 1.0
+# โหมด Pipeline: จำนวนไฟล์ที่เข้าเกณฑ์สูงสุดที่ Thread สแกนส่งล่วงหน้าได้ก่อนรอให้การโอนย้ายตามทัน
+PIPELINE_QUEUE_MAX_FILES = 1000
+# Scheduler รอจนถึงเวลากำหนดการถัดไปแต่ไม่เกินช่วงเวลานี้ (วินาที) เพื่อรองรับการแก้ไขไฟล์ตั้งค่าด้วยมือ
+# และนาฬิกาของเครื่องที่ถูกปรับหรือเครื่องที่เข้าสู่โหมดพัก และรอเท่านี้ก่อนลองใหม่เมื่อเกิดข้อผิดพลาด
+SCHEDULER_MAX_SLEEP_SEC = 600
+SCHEDULER_ERROR_RETRY_SEC = 30
+
+# นามสกุลไฟล์ที่ถือว่าเป็นไฟล์ Excel สำหรับตัวกรองประเภทไฟล์ "Excel"
+EXCEL_EXTENSIONS = (".xls", ".xlsx", ".xlsm", ".csv")
+
+# อัลกอริทึม Hash สำหรับตรวจสอบเนื้อหาไฟล์ (xxh64/xxh3_64 ต้องติดตั้งแพ็กเกจ xxhash เพิ่มเติม)
+HASH_ALGORITHMS = ("blake2b", "xxh64", "xxh3_64")
+# การจัดการไฟล์ที่เนื้อหาซ้ำกับไฟล์ที่มีอยู่แล้วในปลายทาง: off, skip (ข้ามไฟล์ที่ซ้ำกับชื่อเดิม/_copyN), hardlink (ข้าม + สร้างฮาร์ดลิงก์แทนการคัดลอก)
+DEDUP_MODES = ("off", "skip", "hardlink")
+# รูปแบบไฟล์ของการทำงาน archive (tar.zst ต้องติดตั้งแพ็กเกจ zstandard เพิ่มเติม)
+ARCHIVE_FORMATS = ("zip", "tar.gz", "tar.zst")
+# ตัวโปรไฟล์เมื่อเปิด profile_runs: auto (pyinstrument หากติดตั้ง มิฉะนั้น cProfile), cprofile หรือ pyinstrument
+PROFILERS = ("auto", "cprofile", "pyinstrument")
+# ข้อผิดพลาดที่หมายถึงระบบไฟล์ปลายทางไม่รองรับฮาร์ดลิงก์ (เช่น FAT/exFAT หรือ SMB บางรุ่น)
+_HARDLINK_UNSUPPORTED_ERRNOS = (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP, errno.ENOSYS, errno.EACCES)
+# ชื่อไฟล์ที่ถูกเปลี่ยนเพราะชื่อซ้ำ: <ชื่อเดิม>_copy<N><นามสกุล>
+_COPY_NAME_PATTERN = re.compile(r"^(.*)_copy(\d+)(\.[^.]*)?$")
+# ป้องกันการอ่าน-แก้ไข-เขียน last_run.json พร้อมกันจากหลายงาน (แต่ละงานมี Engine ของตนเอง)
+_LAST_RUN_LOCK = threading.Lock()
+
+# --- Custom Exception for Critical Operations ---
+class OperationCriticalError(Exception):
+    """ข้อยกเว้นสำหรับข้อผิดพลาดที่ควรกระทบกับการทำงานทั้งหมด"""
+    pass
+
+class OperationCancelledError(Exception):
+    """ข้อยกเว้นเมื่อผู้ใช้ยกเลิกการทำงานระหว่างการคัดลอกไฟล์ (ไฟล์ปลายทางที่คัดลอกไม่ครบจะถูกลบแล้ว)"""
+    pass
+
+# --- Asynchronous Log Writer (ตัวเขียน Log เบื้องหลัง) ---
+class LogWriter:
+    """
+    เขียน Log ลงไฟล์ด้วย Thread เดียวเบื้องหลัง แทนการเปิด/เขียน/ปิดไฟล์ทุกบรรทัด
+    บรรทัดจะถูกรวมเป็นชุดและเขียนเมื่อครบ LOG_BATCH_MAX_LINES บรรทัด หรือทุก LOG_FLUSH_INTERVAL_SEC วินาที
+    คิวมีขนาดจำกัด หากเต็มผู้เรียกจะรอจนกว่าจะมีที่ว่าง (ไม่ทิ้ง Log)
+    path=None หมายถึงแสดงผลที่ Console
+    """
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, on_error=None, max_queue=LOG_QUEUE_MAX_LINES, batch_size=LOG_BATCH_MAX_LINES, flush_interval=LOG_FLUSH_INTERVAL_SEC):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._on_error = on_error # เรียกเมื่อเขียนไฟล์ไม่สำเร็จ: on_error(path, exception)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self.busy_seconds = 0.0 # เวลารวมที่ใช้เขียนลงไฟล์/Console (สำหรับตัวชี้วัดขั้นตอน logging)
+        self.batches = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path, line):
+        """เพิ่มบรรทัดเข้าคิวเพื่อเขียนลงไฟล์ path (หรือ Console หาก path เป็น None)"""
+        if not self._thread.is_alive():
+            # ตัวเขียนหยุดแล้ว (เช่น ระหว่างปิดโปรแกรม) เขียนตรงเพื่อไม่ให้ Log หาย
+            self._write_batch({path: [line]})
+            return
+        self._queue.put((path, line))
+
+    def flush(self, timeout=10.0):
+        """รอจนกว่าบรรทัดทั้งหมดที่อยู่ในคิวถูกเขียนลงไฟล์แล้ว"""
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """เขียนบรรทัดที่ค้างอยู่ทั้งหมดและหยุด Thread"""
+        if self._thread.is_alive():
+            self._queue.put((self._STOP, None))
+            self._thread.join(timeout)
+
+    def _run(self):
+        pending = {} # path -> รายการบรรทัดที่รอเขียน
+        pending_count = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self._flush_interval - (time.monotonic() - last_flush))
+            try:
+                target, item = self._queue.get(timeout=timeout if pending_count else None)
+            except queue.Empty:
+                target = None
+                item = None
+            else:
+                if target is not self._FLUSH and target is not self._STOP:
+                    pending.setdefault(target, []).append(item)
+                    pending_count += 1
+
+            if pending_count and (target is self._FLUSH or target is self._STOP
+                                  or pending_count >= self._batch_size
+                                  or time.monotonic() - last_flush >= self._flush_interval):
+                self._write_batch(pending)
+                pending = {}
+                pending_count = 0
+                last_flush = time.monotonic()
+            if target is self._FLUSH:
+                item.set()
+            elif target is self._STOP:
+                return
+
+    def _write_batch(self, pending):
+        """เขียนทุกบรรทัดของแต่ละไฟล์ในการเปิดไฟล์ครั้งเดียว"""
+        started = time.perf_counter()
+        try:
+            self._write_files(pending)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self.batches += 1
+
+    def _write_files(self, pending):
+        for path, lines in pending.items():
+            data = "\n".join(lines) + "\n"
+            if path is None:
+                # Console (อาจไม่มีเมื่อรันเป็น .exe แบบไม่มีหน้าต่าง Console)
+                if sys.stdout is not None:
+                    try:
+                        sys.stdout.write(data)
+                        sys.stdout.flush()
+                    except (OSError, ValueError):
+                        pass
+                continue
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(data)
+            except IOError as e:
+                if self._on_error:
+                    self._on_error(path, e)
+
+# --- File Scanning (การสแกนไฟล์ต้นทาง) ---
+# ข้อมูลไฟล์แบบกะทัดรัดที่ได้จากการ stat เพียงครั้งเดียว ใช้ร่วมกันทั้งการกรอง การจัดเรียง และลูปประมวลผล
+FileEntry = namedtuple("FileEntry", ["name", "path", "size", "mtime"])
+
+def _iter_source_files(src, recursive=False, metrics=None):
+    """
+    สแกนไฟล์ในโฟลเดอร์ต้นทางด้วย os.scandir แบบ Generator (ส่งคืนทีละไฟล์ทันทีที่พบ)
+    เก็บผล stat ของแต่ละไฟล์ไว้ใน FileEntry ไม่ต้องเรียก getmtime/getsize ซ้ำ
+    เมื่อ recursive=True จะไล่โฟลเดอร์ย่อยทั้งหมดแบบ Lazy โดยไม่สร้างรายการไฟล์ทั้งหมดไว้ในหน่วยความจำ
+    และ FileEntry.name จะเป็นเส้นทางสัมพัทธ์จาก src (เช่น 'Line1/2025-01/data.csv')
+    ข้อผิดพลาดของดิสก์ (OSError) จะถูกส่งต่อให้ผู้เรียกจัดการ
+    metrics (RunMetrics): รวมเวลาอ่านรายการไฟล์ (listing) และเวลา stat แยกกัน ไม่นับเวลาที่ผู้เรียกใช้ระหว่าง yield
+    """
+    clock = time.perf_counter
+    pending_dirs = [("", src)] # (เส้นทางสัมพัทธ์, เส้นทางเต็ม) ของโฟลเดอร์ที่รอสแกน
+    while pending_dirs:
+        rel_dir, dir_path = pending_dirs.pop()
+        sub_dirs = []
+        listing_sec = stat_sec = 0.0
+        stat_calls = 0
+        mark = clock()
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                rel_name = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                # is_file()/is_dir() ใช้ข้อมูลจาก directory listing ได้โดยไม่ต้อง stat เพิ่ม (บน Windows)
+                if entry.is_file():
+                    stat_start = clock()
+                    st = entry.stat()
+                    now = clock()
+                    listing_sec += stat_start - mark
+                    stat_sec += now - stat_start
+                    stat_calls += 1
+                    yield FileEntry(rel_name, entry.path, st.st_size, st.st_mtime)
+                    mark = clock()
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append((rel_name, entry.path))
+        listing_sec += clock() - mark
+        if metrics is not None:
+            metrics.add_time("listing", listing_sec)
+            metrics.add_time("stat", stat_sec, calls=stat_calls)
+        # ใส่กลับแบบย้อนลำดับเพื่อให้ประมวลผลโฟลเดอร์ย่อยตามลำดับที่พบ
+        pending_dirs.extend(reversed(sub_dirs))
+
+def _scan_source_files(src, recursive=False, metrics=None):
+    """สแกนไฟล์ในโฟลเดอร์ต้นทาง (ระดับบนสุด หรือรวมโฟลเดอร์ย่อยเมื่อ recursive=True) และคืนค่าเป็นรายการ FileEntry"""
+    return list(_iter_source_files(src, recursive, metrics))
+
+def _prune_empty_dirs(root, dir_paths):
+    """
+    ลบโฟลเดอร์ว่างในต้นทางที่มีการย้าย/ลบไฟล์ออก ไล่ขึ้นไปยังโฟลเดอร์แม่จนถึง root (ไม่ลบ root)
+    คืนค่าจำนวนโฟลเดอร์ที่ถูกลบ
+    """
+    root = os.path.abspath(root) # เส้นทางจากการสแกนอาจเป็นแบบสัมพัทธ์หรือแบบเต็ม (ดัชนีการสแกน) จึงเปรียบเทียบแบบเต็มเสมอ
+    removed = 0
+    # เรียงจากเส้นทางที่ลึกที่สุดก่อน เพื่อให้โฟลเดอร์ลูกถูกลบก่อนโฟลเดอร์แม่
+    for dir_path in sorted(dir_paths, key=len, reverse=True):
+        current = os.path.abspath(dir_path)
+        while current != root and current.startswith(root):
+            try:
+                os.rmdir(current) # จะล้มเหลวหากโฟลเดอร์ไม่ว่าง
+            except OSError:
+                break
+            removed += 1
+            current = os.path.dirname(current)
+    return removed
+
+def _get_size_or_none(path):
+    """คืนค่าขนาดไฟล์ หรือ None หากไม่พบไฟล์"""
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+def _new_hasher(algorithm):
+    """สร้างตัวคำนวณ Hash ตามชื่ออัลกอริทึม (xxhash ถูก import เมื่อใช้งานจริงเท่านั้น)"""
+    if algorithm == "blake2b":
+        import hashlib
+        return hashlib.blake2b(digest_size=32)
+    import xxhash # ImportError: ผู้เรียกต้องแจ้งให้ติดตั้งแพ็กเกจ xxhash
+    return getattr(xxhash, algorithm)()
+
+def _hash_file(path, algorithm, buffer_size, should_cancel=None, on_read=None):
+    """คำนวณ Hash ของไฟล์ (ใช้ในรอบตรวจสอบไฟล์ปลายทาง) คืนค่าเป็นเลขฐานสิบหก on_read(nbytes) ถูกเรียกหลังอ่านแต่ละก้อน"""
+    hasher = _new_hasher(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+            if on_read:
+                on_read(n)
+            if should_cancel and should_cancel():
+                raise OperationCancelledError(f"ยกเลิกระหว่างตรวจสอบ '{path}'")
+    return hasher.hexdigest()
+
+def _copy_file_chunked(source_path, target_path, buffer_size, on_progress=None, should_cancel=None, hasher=None):
+    """
+    คัดลอกไฟล์ทีละก้อนขนาด buffer_size พร้อมรายงานจำนวนไบต์ผ่าน on_progress(nbytes)
+    และตรวจสอบ should_cancel() ระหว่างก้อน ใช้ os.copy_file_range/os.sendfile เมื่อระบบรองรับ (คัดลอกใน Kernel)
+    หากระบุ hasher จะคำนวณ Hash จากข้อมูลที่อ่านระหว่างคัดลอก (ไม่อ่านต้นทางซ้ำ จึงใช้การคัดลอกผ่าน buffer เสมอ)
+    หากถูกยกเลิกหรือเกิดข้อผิดพลาด ไฟล์ปลายทางที่คัดลอกไม่ครบจะถูกลบ
+    คัดลอก metadata (เวลาแก้ไข ฯลฯ) เหมือน shutil.copy2 เมื่อเสร็จสมบูรณ์
+    """
+    try:
+        with open(source_path, "rb") as fsrc, open(target_path, "wb") as fdst:
+            copied_total = 0
+            use_buffer = True
+            # ลองใช้การคัดลอกใน Kernel ก่อน (Linux) หากไม่รองรับจะใช้การอ่าน/เขียนผ่าน buffer
+            kernel_copy = getattr(os, "copy_file_range", None)
+            use_sendfile = kernel_copy is None and hasattr(os, "sendfile") and sys.platform.startswith("linux")
+            if hasher is None and (kernel_copy is not None or use_sendfile):
+                use_buffer = False
+                src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+                while True:
+                    try:
+                        if kernel_copy is not None:
+                            copied = kernel_copy(src_fd, dst_fd, buffer_size)
+                        else:
+                            copied = os.sendfile(dst_fd, src_fd, copied_total, buffer_size)
+                    except OSError as e:
+                        # ระบบไฟล์ไม่รองรับ (เช่น ต่างอุปกรณ์/ระบบไฟล์เครือข่าย) ก่อนคัดลอกไบต์แรก: ใช้ buffer แทน
+                        if copied_total == 0 and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EBADF):
+                            use_buffer = True
+                            break
+                        raise
+                    if copied == 0:
+                        break
+                    copied_total += copied
+                    if on_progress:
+                        on_progress(copied)
+                    if should_cancel and should_cancel():
+                        raise OperationCancelledError(f"ยกเลิกระหว่างคัดลอก '{source_path}'")
+
+            if use_buffer:
+                # คัดลอกผ่าน buffer ขนาดใหญ่ที่ใช้ซ้ำ (readinto ไม่ต้องสร้าง bytes ใหม่ทุกก้อน)
+                buffer = bytearray(buffer_size)
+                view = memoryview(buffer)
+                while True:
+                    n = fsrc.readinto(buffer)
+                    if not n:
+                        break
+                    fdst.write(view[:n])
+                    if hasher is not None:
+                        hasher.update(view[:n])
+                    if on_progress:
+                        on_progress(n)
+                    if should_cancel and should_cancel():
+                        raise OperationCancelledError(f"ยกเลิกระหว่างคัดลอก '{source_path}'")
+        shutil.copystat(source_path, target_path)
+    except BaseException:
+        # ลบไฟล์ปลายทางที่คัดลอกไม่ครบ (หากดิสก์หลุด การลบอาจล้มเหลวด้วย ซึ่งไม่เป็นไร)
+        try:
+            os.remove(target_path)
+        except OSError:
+            pass
+        raise
+
+def _count_files_in_dir(path):
+    """นับจำนวนไฟล์ (ไม่รวมโฟลเดอร์) ในโฟลเดอร์ด้วย os.scandir"""
+    with os.scandir(path) as it:
+        return sum(1 for entry in it if entry.is_file())
+
+# --- Scheduling (การรอเวลากำหนดการ) ---
+def seconds_until(when):
+    """จำนวนวินาทีจากตอนนี้ถึง when (เผื่อ 1 วินาทีเพื่อให้ตื่นหลังถึงเวลาแล้ว) ไม่เกิน SCHEDULER_MAX_SLEEP_SEC"""
+    remaining = (when - datetime.datetime.now()).total_seconds() + 1
+    return min(max(remaining, 0.0), SCHEDULER_MAX_SLEEP_SEC)
+
+
+class ScheduleSignal:
+    """
+    ปลุก Scheduler ที่กำลังรอเวลากำหนดการถัดไปก่อนเวลา (การตั้งค่าเปลี่ยน หรืองานเริ่ม/จบ)
+    generation เพิ่มขึ้นทุกครั้งที่ปลุก ใช้ตรวจว่ากำหนดการที่คำนวณเก็บไว้ยังเป็นปัจจุบันหรือไม่
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.generation = 0
+
+    def wake(self):
+        with self._cond:
+            self.generation += 1
+            self._cond.notify_all()
+
+    def wait(self, generation, timeout):
+        """รอจนกว่าจะถูกปลุกหลังจาก generation ที่ระบุ หรือครบ timeout วินาที คืนค่า True หากถูกปลุก"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.generation != generation, timeout)
+
+# --- Transfer Engine (ตัวประมวลผลหลัก ไม่ขึ้นกับ GUI) ---
+class TransferEngine:
+    """
+    ประมวลผลการย้าย/คัดลอก/ลบไฟล์และตรวจสอบกำหนดการ โดยรายงานผลผ่าน Callback แทนการแตะต้อง GUI
+    on_log(full_msg, message, show_popup): ข้อความที่ควรแสดงต่อผู้ใช้ (ข้อความที่บันทึกด้วย to_gui_log=True)
+    on_progress(value, text, mode, stats): ความคืบหน้า value=None หมายถึงยังไม่ทราบเปอร์เซ็นต์ stats เป็น dict ของตัวนับ
+    Callback อาจถูกเรียกจาก Worker Thread ผู้ใช้งาน Engine ต้องส่งต่อไปยัง Thread ของตนเอง
+    job_name: ชื่องานในรายการ "jobs" ของไฟล์ตั้งค่า (None = การตั้งค่าระดับบนสุด) การตั้งค่าของงานจะทับค่าระดับบนสุด
+    schedule_signal: ScheduleSignal ที่ใช้ร่วมกับ Engine อื่น (Engine ของงานใช้ของ Engine ระดับบนสุด) None = สร้างใหม่
+    config_store: settings.ConfigStore ที่ใช้ร่วมกับ Engine อื่น (แคชไฟล์ตั้งค่าเดียวกัน) None = สร้างใหม่
+    log_writer: LogWriter ที่ใช้ร่วมกับ Engine อื่น (ไฟล์ Log ชุดเดียวกันต้องมีตัวเขียนเพียงตัวเดียว) None = สร้างใหม่
+    """
+    def __init__(self, config_file=CONFIG_FILE, on_log=None, on_progress=None, console=True, job_name=None, schedule_signal=None,
+                 config_store=None, log_writer=None):
+        from settings import ConfigStore
+        self.config_file = config_file
+        self.job_name = job_name
+        self.config_store = config_store or ConfigStore(config_file) # อ่านไฟล์ตั้งค่าใหม่เฉพาะเมื่อไฟล์เปลี่ยน
+        self.run_settings = None # Settings ที่ใช้ในรอบการทำงานล่าสุด (ค่าเดียวกันตลอดทั้งรอบ)
+        self.profile_runs = False # True = โปรไฟล์ทุกรอบแม้ profile_runs ในไฟล์ตั้งค่าปิดอยู่ (cli.py --profile)
+        # --- Scheduling state (สถานะกำหนดการ) ---
+        self.schedule_signal = schedule_signal or ScheduleSignal()
+        self._schedule_lock = threading.Lock()
+        self._schedule_cache = None # (generation, stamp ของไฟล์, ผล _calculate_schedule) ที่คำนวณล่าสุด
+        self._settings_error_stamp = None # stamp ของไฟล์ตั้งค่าที่แจ้ง Popup การตั้งค่าไม่ถูกต้องไปแล้ว (แจ้งครั้งเดียวต่อเวอร์ชันของไฟล์)
+        self._on_log = on_log
+        self._on_progress = on_progress
+        self._console = console # แสดง Log ทุกบรรทัดที่ Console หรือไม่ (ปิดเมื่อ Command Line แสดงผลเป็น JSON)
+
+        # ตัวเขียน Log เบื้องหลัง (Thread เดียว) และเขียนบรรทัดที่ค้างอยู่ก่อนปิดโปรแกรมหรือเมื่อโปรแกรมล่ม
+        # Engine ของงานใช้ตัวเขียนของ Engine ระดับบนสุด (ผู้สร้างตัวเขียนเป็นผู้ติดตั้ง Hook เพียงครั้งเดียว)
+        if log_writer is None:
+            log_writer = LogWriter(on_error=self._on_log_write_error)
+            atexit.register(log_writer.close)
+            self._install_crash_log_flush(log_writer)
+        self._log_writer = log_writer
+
+        # --- Variables for run status (ตัวแปรสำหรับสถานะการทำงาน) ---
+        self.operation_cancelled = False # สถานะการยกเลิกการทำงานของไฟล์
+        self.start_time = time.time()  # เวลาเริ่มต้นของการทำงาน
+        self.total_bytes_processed = 0 # จำนวนไบต์ที่ถูกประมวลผล (สำหรับคำนวณความเร็ว)
+        self.is_task_running = False # แฟล็กเพื่อควบคุมการทำงานซ้อนกัน
+        self._run_lock = threading.Lock() # ป้องกันการเริ่มงานซ้อนกันจากหลาย Thread (GUI/Scheduler)
+        self.consecutive_skip_errors = 0 # ตัวนับสำหรับการข้ามไฟล์ติดต่อกัน
+        # กำหนดจำนวนสูงสุดของการข้ามไฟล์ติดต่อกันก่อนจะถือว่าเป็นข้อผิดพลาดวิกฤติ
+        self.MAX_CONSECUTIVE_SKIP_ERRORS = 10 
+        # Lock สำหรับการทำงานแบบขนาน (หลาย Worker Thread)
+        self._target_lock = threading.Lock() # ป้องกันการเลือกชื่อไฟล์ปลายทางซ้ำกัน และป้องกันรายการไฟล์ปลายทาง
+        self._dest_listing = {} # โฟลเดอร์ปลายทาง -> {ชื่อไฟล์: ขนาด (None = จองชื่อแล้วแต่ยังเขียนไม่เสร็จ)} อ่านครั้งเดียวต่อโฟลเดอร์ต่อรอบ
+        self._copy_counters = {} # (โฟลเดอร์ปลายทาง, ชื่อ, นามสกุล) -> เลข _copyN ถัดไปที่ยังไม่ถูกใช้
+        self._abort_event = threading.Event() # แจ้ง Worker ที่ยังไม่เริ่มให้หยุดเมื่อพบข้อผิดพลาดวิกฤติ
+        self._progress_lock = threading.Lock() # ป้องกันตัวนับไบต์ที่ถูกอัปเดตจากหลาย Thread
+        self._inflight_bytes = 0 # จำนวนไบต์ที่คัดลอกแล้วของไฟล์ใหญ่ที่ยังคัดลอกไม่เสร็จ
+        self._last_byte_refresh = 0.0
+        self._refresh_progress = lambda: None
+        self._scan_index = None # ดัชนีการสแกน (SQLite) ของรอบปัจจุบัน เมื่อเปิดใช้ use_scan_index
+        self._scan_index_actions = [] # การกระทำที่รอบันทึกลงดัชนีเมื่อจบรอบ (path, action, ยังอยู่ในต้นทางหรือไม่)
+        self._space_guard = None # เฝ้าระวังพื้นที่ว่างปลายทางระหว่างการทำงาน (capacity_planner.SpaceGuard) หรือ None
+        self._rate_limiter = None # จำกัดความเร็วการโอนย้ายของรอบปัจจุบัน (rate_limiter.RateLimiter) หรือ None
+        self._scan_pipeline = None # (stop event, Thread สแกน) ของโหมด Pipeline ที่กำลังทำงาน
+        self._journal = None # Journal ของรอบปัจจุบัน (บันทึกสถานะแต่ละไฟล์เพื่อกู้คืนเมื่อโปรแกรมปิดตัวกลางทาง)
+        self._dedup_index = None # ดัชนี Hash ของไฟล์ปลายทาง เมื่อเปิดใช้ dedup_mode
+        self._metrics = None # ตัวชี้วัดของรอบปัจจุบัน (RunMetrics) เขียนลงไฟล์เมื่อจบรอบ
+        self._scan_counts = None
+        self._log_busy_start = (0.0, 0) # เวลาและจำนวนชุดของตัวเขียน Log เมื่อเริ่มรอบ
+        self._dedup_lock = threading.Lock() # ป้องกันตัวนับไฟล์ซ้ำที่ถูกแก้ไขจากหลาย Worker
+        self._dedup_stats = {"skipped": 0, "linked": 0, "saved_bytes": 0}
+
+    # --- Logging Functions (ฟังก์ชันการบันทึก Log) ---
+    def log(self, message, to_app_log=False, to_gui_log=True, show_popup=False):
+        """บันทึกข้อความ Log ไปยัง Console และไฟล์ และส่งข้อความที่ควรแสดงต่อผู้ใช้ไปยัง on_log"""
+        if self.job_name is not None:
+            message = f"[{self.job_name}] {message}" # แยกข้อความของแต่ละงานที่ทำงานพร้อมกัน
+        full_msg = f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}"
+        if self._console:
+            self._log_writer.write(None, full_msg) # แสดงใน Console
+
+        # เขียน Log ลงไฟล์ app_log.txt (ผ่านตัวเขียนเบื้องหลัง ข้อผิดพลาดจะถูกรายงานผ่าน _on_log_write_error)
+        if to_app_log:
+            self._log_writer.write(LOG_FILE, full_msg)
+
+        # เขียน Log ลงไฟล์ error_log.txt หากเป็นข้อความ Error
+        if show_popup or "❌" in message: # ตรวจสอบคำขอ popup อย่างชัดเจนหรือ emoji ข้อผิดพลาด
+            self._log_writer.write(ERROR_LOG_FILE, full_msg)
+
+        # ส่งต่อให้ผู้ใช้งาน Engine (เช่น Log Box ของ GUI)
+        if to_gui_log and self._on_log is not None:
+            self._on_log(full_msg, message, show_popup)
+
+    def flush_logs(self, timeout=10.0):
+        """รอจนกว่า Log ที่ค้างอยู่ทั้งหมดถูกเขียนลงไฟล์"""
+        self._log_writer.flush(timeout)
+
+    def _log_action(self, file_name, action_type, status, src=None, dst=None, current_skipped_count=None, total_initial_files=None):
+        """
+        บันทึกการกระทำกับไฟล์ลงในไฟล์ Action Log โดยเฉพาะ 
+        ข้อความเหล่านี้จะถูกบันทึกใน action_log.txt และ app_log.txt แต่จะไม่แสดงใน GUI Log Box
+        """
+        time_str = datetime.datetime.now().strftime('[%Y-%m-%d %H:%M:%S]')
+        base_file_name = os.path.basename(file_name) # ใช้เฉพาะชื่อไฟล์
+
+        # แมป action_type ภาษาอังกฤษเป็นภาษาไทยสำหรับข้อความ Log
+        action_type_thai_map = {
+            "MOVE": "ย้าย",
+            "COPY": "คัดลอก",
+            "DELETE": "ลบ",
+            "SKIP": "ข้าม"
+        }
+        action_type_display = action_type_thai_map.get(action_type.upper(), action_type.upper()) # แปลงเป็นไทย
+
+        msg = f"{time_str} {action_type_display} | {base_file_name} | {status}"
+
+        # เพิ่มข้อมูลเส้นทางสำหรับ Action ต่างๆ
+        if action_type.upper() == "DELETE" and src:
+            src_dir = os.path.dirname(src)
+            msg += f" | จาก: {src_dir}"
+        elif src and dst:
+            src_dir = os.path.dirname(src)
+            dst_dir = os.path.dirname(dst)
+            msg += f" | จาก: {src_dir} ไปยัง: {dst_dir}"
+        # สำหรับ SKIP, src คือไฟล์ที่ถูกข้าม
+        elif action_type.upper() == "SKIP" and src:
+            src_dir = os.path.dirname(src)
+            msg += f" | เส้นทางไฟล์: {src_dir}"
+            if current_skipped_count is not None and total_initial_files is not None:
+                msg += f" | ข้ามไป {current_skipped_count:,}/{total_initial_files:,} ไฟล์"
+
+        # บันทึกเข้าไฟล์ ACTION_LOG_FILE (ซึ่งตอนนี้เป็น .txt) เสมอ
+        self._log_writer.write(ACTION_LOG_FILE, msg)
+
+        # บันทึกเข้า app_log.txt (ไม่แสดงใน GUI Log Box)
+        # CHANGED: to_app_log=False เพื่อป้องกันการซ้ำกันใน app_log.txt เนื่องจากตอนนี้มีไว้สำหรับ ACTION_LOG_FILE โดยเฉพาะ
+        # ตรวจสอบให้แน่ใจว่า show_popup=False สำหรับ action logs เว้นแต่จำเป็นอย่างชัดเจน
+        self.log(msg, to_app_log=False, to_gui_log=False, show_popup=False) 
+
+    def _on_log_write_error(self, path, error):
+        """
+        ถูกเรียกจาก Thread ตัวเขียน Log เมื่อเขียนไฟล์ไม่สำเร็จ
+        แสดงเฉพาะที่ Console/on_log (ไม่เขียนลงไฟล์ซ้ำ เพื่อไม่ให้เกิดลูปข้อผิดพลาด)
+        """
+        message = f"❌ ข้อผิดพลาดในการเขียนไฟล์ Log {path}: {error}"
+        full_msg = f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}"
+        if self._console:
+            print(full_msg)
+        if self._on_log is not None:
+            self._on_log(full_msg, message, path != ERROR_LOG_FILE)
+
+    @staticmethod
+    def _install_crash_log_flush(log_writer):
+        """เขียน Log ที่ค้างอยู่ในคิวลงไฟล์ก่อน เมื่อเกิดข้อผิดพลาดที่ไม่ถูกดักจับ (ทั้ง Thread หลักและ Thread อื่น)"""
+        previous_excepthook = sys.excepthook
+        previous_thread_excepthook = threading.excepthook
+
+        def excepthook(exc_type, exc_value, exc_traceback):
+            log_writer.flush()
+            previous_excepthook(exc_type, exc_value, exc_traceback)
+
+        def thread_excepthook(args):
+            log_writer.flush()
+            previous_thread_excepthook(args)
+
+        sys.excepthook = excepthook
+        threading.excepthook = thread_excepthook
+
+    def _log_process_step(self, message):
+        """
+        บันทึกข้อความขั้นตอนการประมวลผล (Process Step)
+        ข้อความเหล่านี้จะถูกบันทึกใน action_log.txt และ app_log.txt แต่จะไม่แสดงใน GUI Log Box
+        """
+        full_msg = f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - [PROCESS_STEP] - {message}"
+        
+        # บันทึกเข้า action_log.txt
+        self._log_writer.write(ACTION_LOG_FILE, full_msg)
+
+        # บันทึกเข้า app_log.txt (ไม่แสดงใน GUI Log Box)
+        # ตรวจสอบให้แน่ใจว่า show_popup=False สำหรับ process step logs
+        self.log(message, to_app_log=False, to_gui_log=False, show_popup=False)
+
+
+    # --- Settings Management Functions (ฟังก์ชันจัดการการตั้งค่า) ---
+    def for_job(self, job_name):
+        """สร้าง Engine ของงาน job_name ที่ใช้ไฟล์ตั้งค่า, ตัวเขียน Log และ Callback เดียวกัน (สถานะการทำงานแยกจากกัน)"""
+        engine = TransferEngine(self.config_file, on_log=self._on_log, on_progress=self._on_progress,
+                                console=self._console, job_name=job_name, schedule_signal=self.schedule_signal,
+                                config_store=self.config_store, log_writer=self._log_writer)
+        engine.profile_runs = self.profile_runs
+        return engine
+
+    def load_settings(self):
+        """
+        โหลดการตั้งค่าจากไฟล์ JSON เป็น dict ตามที่อยู่ในไฟล์ (จากแคช อ่านใหม่เฉพาะเมื่อไฟล์เปลี่ยน)
+        สำหรับ Engine ของงาน: คืนค่าระดับบนสุดที่ถูกทับด้วยการตั้งค่าของงานนั้น (คืนค่าว่างหากไม่พบงาน)
+        """
+        from settings import SettingsError, merge_job
+        try:
+            config = self.config_store.raw()
+            if self.job_name is not None and config:
+                config = merge_job(config, self.job_name)
+            return dict(config)
+        except SettingsError as e:
+            self.log(f"❌ {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+            return {}
+
+    def get_settings(self):
+        """
+        คืนค่า Settings (ชนิดข้อมูลถูกต้องและตรวจสอบแล้ว) ของ Engine นี้ จากแคชของไฟล์ตั้งค่า
+        ค่าที่ไม่ถูกต้องหรือไฟล์ที่อ่านไม่ได้ทำให้เกิด settings.SettingsError
+        """
+        return self.config_store.settings(self.job_name)
+
+    def save_settings(self, settings):
+        """
+        บันทึกการตั้งค่าลงในไฟล์ JSON โดยคงค่าที่ตั้งได้เฉพาะในไฟล์ (เช่น gui_log_max_lines, copy_buffer_mb, jobs) ไว้
+        ค่าที่บันทึกเป็นค่าระดับบนสุดเสมอ (การตั้งค่าของแต่ละงานแก้ไขในไฟล์โดยตรง)
+        คืนค่า False (และไม่บันทึก) หากค่าที่จะบันทึกไม่ถูกต้อง
+        """
+        from settings import SettingsError, parse_settings
+        try:
+            existing = self.config_store.raw()
+        except SettingsError as e:
+            # ไฟล์เดิมเสียหาย: บันทึกทับด้วยค่าจาก GUI เพื่อให้ใช้งานต่อได้
+            self.log(f"⚠️ {e} จะบันทึกทับด้วยการตั้งค่าปัจจุบัน", to_app_log=True, to_gui_log=True, show_popup=False)
+            existing = {}
+        config = {**existing, **settings}
+        try:
+            parse_settings(config)
+        except SettingsError as e:
+            self.log(f"❌ การตั้งค่าไม่ถูกต้อง ยังไม่ได้บันทึก: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+            return False
+        try:
+            with open(self.config_file, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=4) # ใช้ indent=4 เพื่อให้อ่านง่าย
+            self.config_store.invalidate()
+            self.log("✅ บันทึกการตั้งค่าสำเร็จ", to_app_log=True, to_gui_log=True, show_popup=False) 
+            self.wake_scheduler() # กำหนดการอาจเปลี่ยน
+            return True
+        except IOError as e:
+            self.log(f"❌ ข้อผิดพลาดในการบันทึกไฟล์ตั้งค่า {self.config_file}: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+            return False 
+
+
+    # --- File/Directory Operations Functions (ฟังก์ชันเกี่ยวกับการทำงานกับไฟล์/โฟลเดอร์) ---
+    def _job_state_path(self, path):
+        """
+        ไฟล์สถานะข้างไฟล์ตั้งค่า (Journal/ดัชนี) ของ Engine นี้: แต่ละงานใช้ไฟล์ของตนเอง
+        เพื่อให้งานที่ทำงานพร้อมกันไม่แย่ง Lock ของ SQLite หรือเขียน Journal ทับกัน
+        """
+        if self.job_name is None:
+            return path
+        base, ext = os.path.splitext(path)
+        return f"{base}.{self.job_name}{ext}"
+
+    def _check_free_space_gb(self, path):
+        """ตรวจสอบพื้นที่ว่างของดิสก์ในหน่วย GB"""
+        try:
+            total, used, free = shutil.disk_usage(path)
+            free_gb = free / (1024 ** 3)
+            total_gb = total / (1024 ** 3)
+            return free_gb, total_gb
+        except (IOError, OSError) as e:
+            # Re-raise เป็นข้อผิดพลาดวิกฤติเพื่อหยุดการทำงานทั้งหมด
+            raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อตรวจสอบพื้นที่ว่างสำหรับ {path}: {e}")
+        except Exception as e:
+            # ดักจับข้อผิดพลาดที่ไม่คาดคิดอื่น ๆ
+            raise OperationCriticalError(f"ข้อผิดพลาดที่ไม่คาดคิดเมื่อตรวจสอบพื้นที่ว่างสำหรับ {path}: {e}")
+
+    def cancel(self):
+        """
+        ตั้งค่าสถานะการยกเลิกการทำงาน (Worker จะหยุดที่ไฟล์หรือก้อนข้อมูลถัดไป)
+        is_task_running ยังคงเป็น True จนกว่า execute() จะปิด Journal/ดัชนีของรอบนี้เสร็จ
+        รอบใหม่จึงเริ่มได้หลังรอบเดิมหยุดแล้วเท่านั้น (สถานะของรอบถูกเก็บไว้ใน Engine)
+        """
+        self.operation_cancelled = True
+        self.log("⛔ ผู้ใช้ยกเลิกการทำงาน กำลังหยุดที่ไฟล์ถัดไป", to_app_log=True, to_gui_log=True, show_popup=False) 
+
+    def try_begin_run(self):
+        """จองสถานะการทำงาน คืนค่า False หากมี Task กำลังทำงานอยู่แล้ว (ป้องกันการทำงานซ้อนกัน)"""
+        with self._run_lock:
+            if self.is_task_running:
+                return False
+            self.is_task_running = True # ตั้งค่าแฟล็กว่ามีงานกำลังรัน
+            self.operation_cancelled = False # รีเซ็ตสถานะการยกเลิก
+        # อัปเดตวันที่รันล่าสุดทันทีที่งานเริ่ม
+        self._set_last_run_date(datetime.datetime.now().strftime("%Y-%m-%d"))
+        return True
+
+    def run(self, op, settings=None):
+        """
+        รันการทำงาน (Move/Copy/Delete) จนเสร็จใน Thread ปัจจุบัน คืนค่า True เมื่อสำเร็จและไม่ถูกยกเลิก
+        settings: Settings ที่ใช้ตลอดรอบนี้ (None = อ่านจากไฟล์ตั้งค่า) การตั้งค่าที่ไม่ถูกต้องจะหยุดก่อนเริ่มงาน
+        """
+        if settings is None:
+            from settings import SettingsError
+            try:
+                settings = self.get_settings()
+            except SettingsError as e:
+                self.log(f"❌ การตั้งค่าไม่ถูกต้อง ไม่เริ่มการทำงาน: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+                self._report_progress(0, "❌ ข้อผิดพลาด: การตั้งค่าไม่ถูกต้อง")
+                return False
+        if not self.try_begin_run():
+            self.log("⚠️ Task กำลังทำงานอยู่ ไม่รับคำขอใหม่", to_app_log=True, to_gui_log=True, show_popup=False)
+            return False
+        self.log(f" 🔁 กำลังเริ่มการทำงาน {op}...", to_app_log=True, to_gui_log=True, show_popup=False) 
+        self._report_progress(0, "")
+        return self.execute(op, settings)
+
+    def _fail_operation(self, error_msg="การทำงานล้มเหลวอย่างไม่คาดคิด"):
+        """รายงานการทำงานที่ล้มเหลวและรีเซ็ตสถานะ"""
+        self._report_progress(0, f"❌ ข้อผิดพลาด: {error_msg}")
+        # รีเซ็ตข้อผิดพลาดการข้ามไฟล์ติดต่อกันเมื่อการทำงานล้มเหลวหรือถูกยกเลิก
+        self.consecutive_skip_errors = 0 
+
+    def execute(self, op, settings=None):
+        """
+        เรียกใช้ฟังก์ชันการทำงานหลักและจัดการกับข้อผิดพลาด/สถานะการทำงาน (ต้องเรียก try_begin_run สำเร็จก่อน)
+        settings: Settings ที่ผู้เรียก (เช่น GUI) ตรวจสอบแล้ว ใช้ค่าเดียวกันตลอดรอบ (None = อ่านจากไฟล์ตั้งค่า)
+        คืนค่า True เมื่อสำเร็จและไม่ถูกยกเลิก
+        """
+        self._metrics = None
+        run_status = "failed"
+        profiler = self._start_profiler(op, settings)
+        try:
+            self._move_or_copy_files(op, settings)
+            # หาก _move_or_copy_files เสร็จสิ้นโดยไม่เกิด OperationCriticalError
+            # และ operation_cancelled ไม่ได้ถูกตั้งค่า (เช่น โดยผู้ใช้ยกเลิก)
+            # ข้อความแสดงความสำเร็จโดยละเอียดจะถูกบันทึกภายใน _move_or_copy_files
+            run_status = "cancelled" if self.operation_cancelled else "success"
+            return not self.operation_cancelled # ไม่มี Log เพิ่มเติมที่นี่สำหรับกรณีสำเร็จ
+        except OperationCriticalError as e:
+            # สิ่งนี้ดักจับข้อผิดพลาดวิกฤติที่เกิดจาก _move_or_copy_files หรือ _check_free_space_gb
+            error_msg = str(e) # รับข้อความจากข้อยกเว้นที่กำหนดเอง
+            self.log(f"❌ ข้อผิดพลาด: {error_msg}", to_app_log=True, to_gui_log=True, show_popup=True) # แสดง popup สำหรับข้อผิดพลาดวิกฤติ
+            self._fail_operation(error_msg)
+            return False
+        except Exception as e:
+            # ดักจับข้อผิดพลาดอื่น ๆ ที่ไม่ได้จัดการ
+            error_msg = f"ข้อผิดพลาดที่ไม่คาดคิดเกิดขึ้นระหว่างการทำงาน: {e}"
+            self.log(f"❌ ข้อผิดพลาดในการประมวลผล: {error_msg}", to_app_log=True, to_gui_log=True, show_popup=True) # แสดง popup สำหรับข้อผิดพลาดที่ไม่คาดคิด
+            self._fail_operation(error_msg)
+            return False
+        finally:
+            self._stop_profiler(profiler)
+            self.consecutive_skip_errors = 0 # ตรวจสอบให้แน่ใจว่ามีการรีเซ็ตเมื่อเสร็จสมบูรณ์ตามปกติ
+            self._close_scan_index() # บันทึกการกระทำลงดัชนีการสแกน แม้การทำงานจะล้มเหลวกลางทาง
+            self._close_journal() # ลบ Journal หากทุกไฟล์เสร็จสิ้น มิฉะนั้นเก็บไว้ให้รอบถัดไปกู้คืน
+            self._close_dedup_index()
+            self._close_scan_pipeline()
+            self._log_writer.flush() # เขียน Log ของรอบนี้ลงไฟล์ให้ครบเมื่อจบการทำงาน
+            self._export_metrics(run_status)
+            # ปล่อยสถานะการทำงานหลังปิดทรัพยากรของรอบนี้ครบแล้วเท่านั้น (รวมถึงเมื่อถูกยกเลิก)
+            self.is_task_running = False
+            self.wake_scheduler() # Scheduler ที่ข้ามการตรวจสอบระหว่างงานนี้ทำงานอยู่จะตรวจสอบใหม่
+
+    def _move_or_copy_files(self, operation="move", settings=None):
+        """
+        ดำเนินการย้าย, คัดลอก, หรือลบไฟล์ตามการตั้งค่า
+        ตอนนี้ใช้ shutil เท่านั้น
+        """
+        self.operation_cancelled = False # รีเซ็ตสถานะการยกเลิกสำหรับ Task ใหม่
+        self.consecutive_skip_errors = 0 # รีเซ็ตตัวนับการข้ามเมื่อเริ่มการทำงานใหม่
+        if settings is None:
+            from settings import SettingsError
+            try:
+                settings = self.get_settings()
+            except SettingsError as e:
+                raise OperationCriticalError(f"การตั้งค่าไม่ถูกต้อง: {e}")
+        self.run_settings = settings # ค่าทั้งหมดของรอบนี้มาจาก Snapshot เดียว (แก้ไขไฟล์ระหว่างทำงานไม่มีผลกับรอบนี้)
+        from run_metrics import RunMetrics
+        self._metrics = RunMetrics(operation, self.job_name)
+        self._scan_counts = None
+        self._log_busy_start = (self._log_writer.busy_seconds, self._log_writer.batches)
+        src = settings.source
+        dst = settings.dest
+        file_type = settings.file_type
+        min_free_space = settings.min_free_space_gb
+        filter_old = settings.filter_old
+        months_old = settings.months_old
+        recursive = settings.recursive
+        prune_empty_dirs = settings.prune_empty_dirs
+        transfer_workers = settings.transfer_workers
+        # ไฟล์ที่ใหญ่กว่าเกณฑ์จะคัดลอกทีละก้อน เพื่อแสดงความคืบหน้าระดับไบต์และยกเลิกกลางไฟล์ได้
+        chunked_copy_threshold_bytes = int(settings.chunked_copy_threshold_mb * 1024 * 1024)
+        copy_buffer_bytes = max(64 * 1024, int(settings.copy_buffer_mb * 1024 * 1024))
+        # ดัชนีการสแกน (SQLite ข้างไฟล์ตั้งค่า): อ่านรายการไฟล์ใหม่เฉพาะโฟลเดอร์ที่เปลี่ยน และกรองอายุไฟล์ด้วยการค้นหาในดัชนี
+        use_scan_index = settings.use_scan_index
+        # Journal ของแต่ละรอบ (ข้างไฟล์ตั้งค่า): กู้คืนการย้ายที่ค้างจากรอบก่อนโดยไม่คัดลอกซ้ำ
+        use_journal = settings.use_journal
+        # ตรวจสอบเนื้อหาด้วย Hash: hash_files คำนวณ Hash ระหว่างคัดลอกและบันทึกลง Action Log
+        # verify_hash อ่านไฟล์ปลายทางอีกครั้งและเปรียบเทียบ Hash ก่อนถือว่าสำเร็จ/ลบต้นฉบับ (เปิด hash_files ให้อัตโนมัติ)
+        verify_hash = settings.verify_hash
+        hash_algorithm = settings.hash_algorithm if verify_hash or settings.hash_files else None
+        # ตรวจหาไฟล์ซ้ำในปลายทางด้วย Hash ของเนื้อหา (ดู DEDUP_MODES) เปรียบเทียบเฉพาะไฟล์ที่ขนาดเท่ากัน (hardlink ค้นหาจากดัชนี Hash ของทั้งปลายทางด้วย)
+        dedup_mode = settings.dedup_mode
+        # pipeline_scan: สแกน/กรองต้นทางใน Thread แยก และเริ่มโอนย้ายทันทีที่พบไฟล์แรกที่เข้าเกณฑ์ (ไม่เรียงลำดับ)
+        # strict_oldest_first: สแกนทั้งหมดแล้วเรียงจากเก่าที่สุดก่อนเริ่มเสมอ (ปิดการประมวลผลระหว่างสแกนทั้งสองแบบ)
+        pipeline_scan = settings.pipeline_scan
+        strict_oldest_first = settings.strict_oldest_first
+        # archive ต้องทราบไฟล์ทั้งหมดของแต่ละเดือนก่อนเขียน Archive จึงสแกนทั้งหมดก่อนเริ่มเสมอ
+        stream_scan = (recursive or pipeline_scan) and not strict_oldest_first and operation != "archive"
+        # จำกัดความเร็วการโอนย้ายรวม (MB/s) และโปรไฟล์ตามช่วงเวลาของวัน (ดู rate_limiter.py)
+        rate_limit_mbps = settings.rate_limit_mbps
+        rate_limit_windows = settings.rate_limit_windows
+        # วางแผนพื้นที่ปลายทาง: fit_to_free_space เลือกเฉพาะไฟล์เก่าที่สุดที่พอดีกับพื้นที่ว่าง (มิฉะนั้นหยุดก่อนเริ่มหากไม่พอ)
+        # และวัดพื้นที่ว่างซ้ำทุก free_space_check_mb ระหว่างการทำงาน เพื่อหยุดที่ขอบไฟล์ก่อนพื้นที่ต่ำกว่า min_free_space_gb
+        fit_to_free_space = settings.fit_to_free_space
+        free_space_check_bytes = int(settings.free_space_check_mb * 1024 * 1024)
+        # archive: รวมไฟล์เป็นไฟล์บีบอัดหนึ่งไฟล์ต่อเดือนในปลายทาง ตรวจสอบแล้วจึงลบต้นฉบับ (ดู archiver.py)
+        archive_format = settings.archive_format
+
+        self.log(f"กำลังเริ่มการทำงานไฟล์ {operation.capitalize()} จาก '{src}' ไปยัง '{dst}' (ประเภทไฟล์: {file_type})", to_app_log=True, to_gui_log=True, show_popup=False) 
+        if recursive and stream_scan:
+            self.log("📂 โหมดโฟลเดอร์ย่อย: ประมวลผลไฟล์ทันทีที่สแกนพบ และสร้างโครงสร้างโฟลเดอร์เดิมในปลายทาง", to_app_log=True, to_gui_log=True, show_popup=False)
+        elif recursive:
+            self.log("📂 โหมดโฟลเดอร์ย่อย: สแกนทั้งหมดและเรียงจากไฟล์เก่าที่สุดก่อนเริ่ม และสร้างโครงสร้างโฟลเดอร์เดิมในปลายทาง", to_app_log=True, to_gui_log=True, show_popup=False)
+
+        # คำนวณวันที่ตัดยอดเพียงครั้งเดียวต่อการทำงาน (แทนการสร้าง relativedelta ใหม่ทุกไฟล์)
+        cutoff_timestamp = None
+        if filter_old:
+            from dateutil.relativedelta import relativedelta
+            cutoff_time = datetime.datetime.now() - relativedelta(months=months_old)
+            cutoff_timestamp = cutoff_time.timestamp()
+            self.log(f"📅 กำลังโอนย้ายไฟล์ที่เก่ากว่า {months_old} เดือน วันที่ตัดยอด: {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')}", to_app_log=True, to_gui_log=True, show_popup=False)
+
+        # --- Initial path validation and file gathering (จุดสำคัญสำหรับการตัดการเชื่อมต่อ SSD) ---
+        all_files_in_src = []
+        total_files_in_src_initial_count = 0
+        total_size_to_process_bytes = 0
+        # ตัวนับที่ถูกอัปเดตโดย _filter_entries (ในโหมดโฟลเดอร์ย่อยค่าจะเพิ่มขึ้นเรื่อย ๆ ระหว่างการทำงาน)
+        scan_counts = {"seen": 0, "skipped": 0, "eligible": 0, "eligible_bytes": 0, "complete": False}
+        self._scan_counts = scan_counts
+        total_files_to_process = None # None = ยังไม่ทราบจำนวนทั้งหมด (โหมดโฟลเดอร์ย่อย)
+        same_device = False # ต้นทางและปลายทางอยู่บนระบบไฟล์เดียวกันหรือไม่ (สำหรับการย้ายแบบเปลี่ยนชื่อ)
+
+        try:
+            if not os.path.exists(src):
+                raise OperationCriticalError(f"ไม่พบโฟลเดอร์ต้นทาง: {src}")
+
+            if operation != "delete" and not os.path.exists(dst):
+                raise OperationCriticalError(f"ไม่พบโฟลเดอร์ปลายทาง: {dst}")
+
+            # ตรวจสอบพื้นที่ว่างบนปลายทางสำหรับการย้าย/คัดลอก
+            if operation != "delete":
+                free_space, total_space = self._check_free_space_gb(dst) # สิ่งนี้อาจทำให้เกิด OperationCriticalError
+                if free_space < min_free_space:
+                    raise OperationCriticalError(f"พื้นที่ว่างบนปลายทาง ({free_space:.2f} GB) ต่ำกว่าที่กำหนดขั้นต่ำ ({min_free_space} GB) หยุดการทำงาน")
+
+            if hash_algorithm is not None and operation != "delete":
+                try:
+                    _new_hasher(hash_algorithm)
+                except ImportError:
+                    raise OperationCriticalError(f"อัลกอริทึม Hash '{hash_algorithm}' ต้องติดตั้งแพ็กเกจ xxhash (pip install xxhash) หรือเปลี่ยนเป็น blake2b")
+                verify_text = " และตรวจสอบไฟล์ปลายทางซ้ำหลังคัดลอก" if verify_hash else ""
+                self.log(f"🔐 คำนวณ Hash ({hash_algorithm}) ระหว่างคัดลอก{verify_text}", to_app_log=True, to_gui_log=True, show_popup=False)
+
+            if operation == "archive":
+                from archiver import check_format
+                try:
+                    check_format(archive_format)
+                except ImportError as e:
+                    raise OperationCriticalError(f"{e} หรือเปลี่ยน archive_format เป็น zip หรือ tar.gz")
+                self.log(f"🗜️ รวมไฟล์เป็น Archive รายเดือน ({archive_format}) ตรวจสอบทุก Archive ก่อนลบต้นฉบับ", to_app_log=True, to_gui_log=True, show_popup=False)
+
+            self._rate_limiter = None
+            if operation != "delete" and (rate_limit_mbps or rate_limit_windows):
+                from rate_limiter import RateLimiter
+                rate_limiter = RateLimiter(rate_limit_mbps, rate_limit_windows) # ค่าถูกตรวจสอบแล้วใน Settings
+                if rate_limiter.enabled:
+                    self._rate_limiter = rate_limiter
+                    self.log(f"🚦 จำกัดความเร็วการโอนย้าย: {rate_limiter.describe()}", to_app_log=True, to_gui_log=True, show_popup=False)
+
+            self._dedup_stats = {"skipped": 0, "linked": 0, "saved_bytes": 0}
+            if dedup_mode != "off" and operation in ("move", "copy"):
+                self._dedup_index = self._open_dedup_index()
+                self.log(f"♻️ ตรวจหาไฟล์ซ้ำในปลายทาง (โหมด: {dedup_mode})", to_app_log=True, to_gui_log=True, show_popup=False)
+
+            # ตรวจสอบว่าต้นทางและปลายทางอยู่บนอุปกรณ์เดียวกันหรือไม่ (เปรียบเทียบ st_dev ครั้งเดียวต่อการทำงาน)
+            if operation == "move":
+                same_device = os.stat(src).st_dev == os.stat(dst).st_dev
+                if same_device:
+                    self.log("⚡ ต้นทางและปลายทางอยู่บนไดรฟ์เดียวกัน ใช้การย้ายแบบเปลี่ยนชื่อ (ไม่คัดลอกข้อมูล)", to_app_log=True, to_gui_log=True, show_popup=False)
+
+            # เฝ้าระวังพื้นที่เฉพาะการทำงานที่เขียนข้อมูลลงปลายทาง (การย้ายในไดรฟ์เดียวกันเป็นการเปลี่ยนชื่อ ไม่ใช้พื้นที่เพิ่ม)
+            self._space_guard = None
+            if operation in ("copy", "archive") or (operation == "move" and not same_device):
+                from capacity_planner import SpaceGuard
+                try:
+                    self._space_guard = SpaceGuard(dst, int(min_free_space * (1024 ** 3)), free_space_check_bytes)
+                except (IOError, OSError) as e:
+                    raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อตรวจสอบพื้นที่ว่างสำหรับ {dst}: {e}")
+
+            # กู้คืนงานที่ค้างจากรอบก่อนหน้าก่อนสแกน (ไฟล์ต้นฉบับที่ย้ายเสร็จแล้วจะไม่ถูกสแกนพบอีก)
+            if use_journal:
+                self._resume_from_journal(copy_buffer_bytes)
+                if operation in ("move", "copy", "archive"):
+                    self._journal = self._open_journal(operation)
+
+            if use_scan_index:
+                self._scan_index = self._open_scan_index()
+
+            if stream_scan and self._scan_index is None:
+                # โหมดโฟลเดอร์ย่อย/Pipeline: ไม่สร้างรายการไฟล์ทั้งหมดก่อน แต่ส่งต่อไฟล์ที่เข้าเกณฑ์ให้ลูปประมวลผลทันทีที่สแกนพบ
+                eligible_files = self._filter_entries(self._stream_source_entries(src, recursive), file_type, cutoff_timestamp, scan_counts)
+                if pipeline_scan:
+                    # สแกนใน Thread แยก การโอนย้ายจึงไม่ต้องรอการอ่านรายการไฟล์ของแต่ละโฟลเดอร์
+                    self.log("🚰 โหมด Pipeline: สแกนต้นทางพร้อมกับการโอนย้าย (ไม่เรียงตามอายุไฟล์)", to_app_log=True, to_gui_log=True, show_popup=False)
+                    eligible_files = self._pipeline_entries(eligible_files)
+            else:
+                eligible_files = None
+                if self._scan_index is not None:
+                    # ใช้ดัชนีการสแกน: ได้รายการไฟล์ที่เข้าเกณฑ์ (เรียงจากเก่าที่สุด) โดยไม่ต้อง stat ทุกไฟล์ (None = ใช้ดัชนีไม่ได้)
+                    with self._metrics.phase("listing"):
+                        eligible_files = self._query_scan_index(src, recursive, file_type, cutoff_timestamp, scan_counts)
+                if eligible_files is not None:
+                    total_files_in_src_initial_count = scan_counts["seen"]
+                else:
+                    # เติม all_files_in_src ด้วยการสแกนครั้งเดียว (stat หนึ่งครั้งต่อไฟล์) - ครอบคลุมด้วย try-except สำหรับข้อผิดพลาดของดิสก์
+                    try:
+                        # นี่ควรเป็นการตรวจสอบการเข้าถึงแหล่งที่มาที่แข็งแกร่งเป็นอันดับแรก
+                        all_files_in_src = _scan_source_files(src, recursive, self._metrics)
+                    except (IOError, OSError) as e:
+                        # สิ่งนี้ดักจับข้อผิดพลาดการเข้าถึงดิสก์หลักเมื่อแสดงรายการไฟล์ครั้งแรก
+                        raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อแสดงรายการไฟล์ในโฟลเดอร์ต้นทาง '{src}': {e} หยุดการทำงาน")
+
+                    total_files_in_src_initial_count = len(all_files_in_src)
+
+                if total_files_in_src_initial_count == 0:
+                    self.log("ℹ️ ไม่พบไฟล์ในโฟลเดอร์ต้นทาง สิ้นสุดการทำงานแล้ว", to_app_log=True, to_gui_log=True, show_popup=False)
+                    self._report_progress(100, "✅ เสร็จสิ้น ไม่พบไฟล์")
+                    return # ออกจากลูปก่อนหากไม่มีไฟล์ให้ประมวลผล
+
+                if eligible_files is None:
+                    # การกรองเริ่มต้นโดยใช้ข้อมูล stat จากการสแกน (ไม่เข้าถึงดิสก์ซ้ำ)
+                    eligible_files = list(self._filter_entries(all_files_in_src, file_type, cutoff_timestamp, scan_counts))
+                # นี่จะนับไฟล์ที่ถูกข้ามโดยตัวกรองหรือข้อผิดพลาดเริ่มต้นระหว่าง *การสแกนเริ่มต้น*
+                skipped_initial_shutil = scan_counts["skipped"]
+                total_size_to_process_bytes = scan_counts["eligible_bytes"]
+
+                total_files_to_process = len(eligible_files)
+                if total_files_to_process == 0 and skipped_initial_shutil == total_files_in_src_initial_count:
+                    self.log(f"ℹ️ ไฟล์ทั้งหมด {total_files_in_src_initial_count:,} ไฟล์ถูกข้ามด้วยตัวกรอง หรือพบข้อผิดพลาดระหว่างการสแกนเริ่มต้น ไม่พบไฟล์ที่เข้าเกณฑ์สำหรับการ {operation}", to_app_log=True, to_gui_log=True, show_popup=False)
+                    self._report_progress(100, "✅ เสร็จสิ้น ไฟล์ที่เข้าเกณฑ์ทั้งหมดถูกข้าม")
+                    return
+                elif total_files_to_process == 0: # กรณีนี้ครอบคลุมเมื่อไฟล์ทั้งหมดถูกข้าม แต่ skipped_initial_shutil อาจเป็น 0 ด้วย (เช่น ไม่มีไฟล์ในโฟลเดอร์)
+                     self.log("ℹ️ ไม่พบไฟล์ที่เข้าเกณฑ์หลังจากใช้ตัวกรอง สิ้นสุดการทำงานแล้ว", to_app_log=True, to_gui_log=True, show_popup=False)
+                     self._report_progress(100, "✅ เสร็จสิ้น ไม่มีไฟล์ให้ประมวลผล")
+                     return
+
+                # จัดเรียงไฟล์ที่มีสิทธิ์ตามเวลาการแก้ไข (เก่าที่สุดก่อน) โดยใช้ mtime ที่เก็บไว้แล้ว
+                eligible_files.sort(key=attrgetter("mtime"))
+
+                # เปรียบเทียบขนาดรวมกับพื้นที่ว่างที่ใช้ได้ก่อนเริ่ม แทนการพบว่าดิสก์เต็มกลางทาง
+                if self._space_guard is not None and total_size_to_process_bytes > self._space_guard.available_bytes:
+                    eligible_files, total_size_to_process_bytes = self._plan_capacity(eligible_files, total_size_to_process_bytes, fit_to_free_space, scan_counts)
+                    total_files_to_process = len(eligible_files)
+
+                # บันทึกสรุปไฟล์ที่มีสิทธิ์และรายละเอียดของไฟล์แรกที่มีสิทธิ์
+                self.log(f"📄 พบ {total_files_to_process:,} ไฟล์ที่เข้าเกณฑ์สำหรับการประมวลผลหลังจากใช้ตัวกรอง", to_app_log=True, to_gui_log=True, show_popup=False)
+                if filter_old and eligible_files:
+                    first_entry = eligible_files[0]
+                    first_file_mod_time = datetime.datetime.fromtimestamp(first_entry.mtime)
+                    self.log(f"เริ่มย้ายจากไฟล์: {first_entry.name} (แก้ไขล่าสุด: {first_file_mod_time.strftime('%Y-%m-%d %H:%M:%S')})", to_app_log=True, to_gui_log=True, show_popup=False)
+
+
+        except OperationCriticalError as e:
+            # Re-raise เพื่อให้ _safe_run ดักจับและหยุดทุกอย่าง
+            raise e
+        except Exception as e:
+            # ดักจับข้อผิดพลาดอื่น ๆ ที่ไม่คาดคิดระหว่างการตั้งค่าเริ่มต้น
+            raise OperationCriticalError(f"ข้อผิดพลาดที่ไม่คาดคิดเกิดขึ้นระหว่างการตั้งค่าการประมวลผลไฟล์เริ่มต้น: {e}")
+
+        # --- สิ้นสุดการตรวจสอบเส้นทางเริ่มต้นและการรวบรวมไฟล์ ---
+
+        # เปลี่ยน: total_size_to_process_bytes / (1024**3) และ "GB"
+        if total_files_to_process is not None:
+            self.log(f"กำลังประมวลผล {total_files_to_process:,} ไฟล์ที่เข้าเกณฑ์ ขนาดรวม {total_size_to_process_bytes / (1024**3):.2f} GB โดยใช้ shutil...", to_app_log=True, to_gui_log=True, show_popup=False)
+        processed_count = 0
+        self.total_bytes_processed = 0
+        self.start_time = time.time()
+        created_dest_dirs = set() # โฟลเดอร์ปลายทางที่สร้าง/ตรวจสอบแล้ว (โหมดโฟลเดอร์ย่อย)
+        # ค่าที่ใช้ร่วมกันสำหรับการประมวลผลแต่ละไฟล์ในรอบนี้
+        run_options = {
+            "operation": operation,
+            "dst": dst,
+            "recursive": recursive,
+            "created_dest_dirs": created_dest_dirs,
+            "same_device": same_device,
+            "chunked_copy_threshold_bytes": chunked_copy_threshold_bytes,
+            "copy_buffer_bytes": copy_buffer_bytes,
+            "hash_algorithm": hash_algorithm,
+            "verify_hash": verify_hash,
+            "dedup_mode": dedup_mode,
+            "dedup_algorithm": hash_algorithm or "blake2b",
+            "hardlink_supported": dedup_mode == "hardlink",
+            "archive_format": archive_format,
+        }
+        self._inflight_bytes = 0
+        self._last_byte_refresh = 0.0
+        touched_source_dirs = set() # โฟลเดอร์ต้นทางที่มีไฟล์ถูกย้าย/ลบออก (สำหรับลบโฟลเดอร์ว่าง)
+        # รายการชื่อไฟล์ปลายทางของรอบนี้ (อ่านจากดิสก์เมื่อใช้โฟลเดอร์นั้นครั้งแรก และเพิ่มชื่อเมื่อจองชื่อปลายทาง)
+        self._dest_listing = {}
+        self._copy_counters = {}
+        self._abort_event.clear()
+        if total_files_to_process is None:
+            # ยังไม่ทราบจำนวนไฟล์ทั้งหมด ใช้แถบความคืบหน้าแบบเคลื่อนไหวแทนเปอร์เซ็นต์
+            self._report_progress(None, "", mode="indeterminate")
+
+        # --- ลูปการประมวลผลไฟล์ (สำหรับ shutil) ---
+        def refresh_progress(idx=None, elapsed_file=0, file_size=0):
+            """อัปเดตความคืบหน้าด้วยตัวนับปัจจุบัน (ถูกเรียกหลังจบแต่ละไฟล์ และระหว่างคัดลอกไฟล์ใหญ่)"""
+            total_elapsed_time = time.time() - self.start_time
+            # ใช้ตัวนับจาก scan_counts ซึ่งในโหมดโฟลเดอร์ย่อยจะเพิ่มขึ้นตามความคืบหน้าของการสแกน
+            # เมื่อการสแกนระหว่างทำงานเสร็จแล้ว จำนวนที่เข้าเกณฑ์คือจำนวนทั้งหมด จึงแสดงเปอร์เซ็นต์และเวลาที่เหลือได้
+            total_files = total_files_to_process
+            if total_files is None and scan_counts["complete"]:
+                total_files = scan_counts["eligible"]
+            self._update_progress(idx, total_files, operation, elapsed_file, total_elapsed_time,
+                                      file_size, processed_count, scan_counts["skipped"], scan_counts["seen"], scan_counts["eligible_bytes"])
+
+        self._refresh_progress = refresh_progress
+
+        def record_result(idx, entry, success, file_size, elapsed_file):
+            """รวมผลลัพธ์ของแต่ละไฟล์และอัปเดตความคืบหน้า (เรียกจาก Thread ที่ควบคุมการทำงานเท่านั้น)"""
+            nonlocal processed_count
+            if success:
+                processed_count += 1
+                self.total_bytes_processed += file_size
+                self._metrics.count("files_processed")
+                self._metrics.count("bytes_processed", file_size)
+                self.consecutive_skip_errors = 0 # รีเซ็ตข้อผิดพลาดการข้ามไฟล์ติดต่อกันเมื่อประมวลผลสำเร็จ
+                if operation in ("move", "delete", "archive"):
+                    touched_source_dirs.add(os.path.dirname(entry.path))
+                if self._scan_index is not None:
+                    self._scan_index_actions.append((entry.path, operation, operation == "copy"))
+
+            refresh_progress(idx, elapsed_file, file_size)
+
+        if operation == "archive":
+            self._archive_files(eligible_files, run_options, record_result)
+        elif transfer_workers <= 1:
+            for idx, entry in enumerate(eligible_files, start=1):
+                if self.operation_cancelled:
+                    self.log("⚠️ ผู้ใช้ยกเลิกการทำงาน กำลังหยุดการประมวลผลไฟล์", to_app_log=True, to_gui_log=True, show_popup=False)
+                    break # ออกจากลูปทันที
+                if self._space_guard is not None and self._space_guard.exhausted:
+                    break # พื้นที่ปลายทางใกล้ถึงเกณฑ์ขั้นต่ำ หยุดที่ขอบไฟล์
+
+                success, file_size, elapsed_file = self._process_file(entry, run_options)
+                record_result(idx, entry, success, file_size, elapsed_file)
+        else:
+            # โหมดขนาน: ส่งงานให้ Worker ทีละไม่เกิน 2 เท่าของจำนวน Worker เพื่อไม่ต้องดึงรายการไฟล์ทั้งหมดล่วงหน้า
+            # ผลลัพธ์ทั้งหมดถูกรวมใน Thread นี้ ตัวนับและการอัปเดต GUI จึงไม่ถูกแก้ไขพร้อมกันจากหลาย Thread
+            self.log(f"🧵 ประมวลผลแบบขนานด้วย {transfer_workers} Worker", to_app_log=True, to_gui_log=True, show_popup=False)
+            from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+            max_in_flight = transfer_workers * 2
+            entries_iter = iter(eligible_files)
+            in_flight = {}
+            first_error = None
+            completed_idx = 0
+            scan_exhausted = False
+
+            with ThreadPoolExecutor(max_workers=transfer_workers, thread_name_prefix="transfer") as executor:
+                while True:
+                    # เติมงานเข้าคิวจนเต็ม เว้นแต่ถูกยกเลิกหรือพบข้อผิดพลาดวิกฤติแล้ว
+                    while (not scan_exhausted and first_error is None and not self.operation_cancelled and len(in_flight) < max_in_flight
+                           and not (self._space_guard is not None and self._space_guard.exhausted)):
+                        try:
+                            entry = next(entries_iter)
+                        except StopIteration:
+                            scan_exhausted = True
+                            break
+                        except OperationCriticalError as e:
+                            # ข้อผิดพลาดจากการสแกนโฟลเดอร์ย่อย
+                            first_error = e
+                            self._abort_event.set()
+                            break
+                        future = executor.submit(self._process_file, entry, run_options)
+                        in_flight[future] = entry
+
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        entry = in_flight.pop(future)
+                        try:
+                            success, file_size, elapsed_file = future.result()
+                        except OperationCriticalError as e:
+                            # เก็บข้อผิดพลาดแรกไว้ หยุดส่งงานใหม่ และรอให้ไฟล์ที่กำลังทำงานอยู่เสร็จก่อนหยุด
+                            if first_error is None:
+                                first_error = e
+                                self._abort_event.set()
+                            continue
+                        completed_idx += 1
+                        record_result(completed_idx, entry, success, file_size, elapsed_file)
+
+            if first_error is not None:
+                raise first_error
+            if self.operation_cancelled:
+                self.log("⚠️ ผู้ใช้ยกเลิกการทำงาน กำลังหยุดการประมวลผลไฟล์", to_app_log=True, to_gui_log=True, show_popup=False)
+
+        # --- ข้อความสถานะสุดท้ายหลังจากลูปเสร็จสมบูรณ์หรือหยุดชะงัก ---
+        # หากการทำงานถูกยกเลิกเนื่องจากข้อผิดพลาดที่สำคัญ _safe_run จะจัดการข้อความสุดท้ายและการอัปเดต UI
+        # มิฉะนั้น หากมาถึงที่นี่ แสดงว่าเสร็จสมบูรณ์ตามปกติหรือถูกผู้ใช้ยกเลิก
+        if self._space_guard is not None and self._space_guard.exhausted and not self.operation_cancelled:
+            self.log(f"⚠️ หยุดการทำงานก่อนพื้นที่ว่างบนปลายทางจะต่ำกว่า {min_free_space} GB (ประมวลผลแล้ว {processed_count:,} ไฟล์) "
+                     f"ไฟล์ที่เหลือยังอยู่ในต้นทาง และจะถูกประมวลผลเมื่อมีพื้นที่เพียงพอ", to_app_log=True, to_gui_log=True, show_popup=True)
+
+        # ลบโฟลเดอร์ย่อยที่ว่างแล้วในต้นทาง (เฉพาะโฟลเดอร์ที่มีไฟล์ถูกย้าย/ลบออกในรอบนี้)
+        if recursive and prune_empty_dirs and touched_source_dirs:
+            removed_dirs = _prune_empty_dirs(src, touched_source_dirs)
+            if removed_dirs:
+                self.log(f"🧹 ลบโฟลเดอร์ว่างในต้นทางแล้ว {removed_dirs:,} โฟลเดอร์", to_app_log=True, to_gui_log=True, show_popup=False)
+
+        if not self.operation_cancelled:
+            if total_files_to_process is None and scan_counts["eligible"] == 0:
+                # โหมดที่ประมวลผลระหว่างสแกนทราบผลการสแกนเมื่อสิ้นสุดลูปเท่านั้น
+                if scan_counts["seen"] == 0:
+                    self.log("ℹ️ ไม่พบไฟล์ในโฟลเดอร์ต้นทาง สิ้นสุดการทำงานแล้ว", to_app_log=True, to_gui_log=True, show_popup=False)
+                else:
+                    self.log(f"ℹ️ ไฟล์ทั้งหมด {scan_counts['seen']:,} ไฟล์ถูกข้ามด้วยตัวกรอง ไม่พบไฟล์ที่เข้าเกณฑ์สำหรับการ {operation}", to_app_log=True, to_gui_log=True, show_popup=False)
+                self._report_progress(100, "✅ เสร็จสิ้น ไม่มีไฟล์ให้ประมวลผล")
+                return
+
+            # ตรวจสอบให้แน่ใจว่า src ยังสามารถเข้าถึงได้ก่อนที่จะพยายามแสดงไฟล์ที่เหลือ
+            remaining_files_in_source_folder = "ไม่พร้อมใช้งาน (ไม่สามารถเข้าถึงต้นทางได้)"
+            try:
+                if recursive:
+                    # ไม่สแกนทั้งทรีซ้ำ คำนวณจากจำนวนไฟล์ที่พบระหว่างการสแกนแทน
+                    removed_from_source = processed_count if operation in ("move", "delete", "archive") else 0
+                    remaining_files_in_source_folder = f"{scan_counts['seen'] - removed_from_source:,}"
+                elif os.path.exists(src):
+                    remaining_files_in_source_folder = _count_files_in_dir(src)
+            except (IOError, OSError) as e:
+                self.log(f"⚠️ คำเตือน: ไม่สามารถระบุไฟล์ที่เหลือในต้นทาง '{src}' ได้ เนื่องจากข้อผิดพลาดในการเข้าถึงดิสก์: {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+            except Exception as e:
+                 self.log(f"⚠️ คำเตือน: ข้อผิดพลาดที่ไม่คาดคิดในการระบุไฟล์ที่เหลือในต้นทาง '{src}' ได้: {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+
+            final_msg_detail = (f"ประมวลผล {processed_count:,} ไฟล์ "
+                                f"ข้ามไป {scan_counts['skipped']:,} ไฟล์ (จากทั้งหมด {scan_counts['seen']:,} ไฟล์เริ่มต้น) "
+                                f"เหลือในต้นทาง: {remaining_files_in_source_folder} ไฟล์")
+            self.log(f"✅ การทำงานเสร็จสิ้น {final_msg_detail}", to_app_log=True, to_gui_log=True, show_popup=False) # ไม่มี popup สำหรับข้อความสำเร็จสุดท้าย
+            dedup_stats = self._dedup_stats
+            if dedup_stats["skipped"] or dedup_stats["linked"]:
+                self.log(f"♻️ ไฟล์ซ้ำในปลายทาง: ข้าม {dedup_stats['skipped']:,} ไฟล์ ฮาร์ดลิงก์ {dedup_stats['linked']:,} ไฟล์ "
+                         f"ประหยัดพื้นที่ {dedup_stats['saved_bytes'] / (1024**3):.2f} GB", to_app_log=True, to_gui_log=True, show_popup=False)
+            self._report_progress(100, "✅ เสร็จสิ้น") # ตั้งค่าเป็น 100% เมื่อเสร็จสิ้น
+
+    def _process_file(self, entry, run_options):
+        """
+        ประมวลผลไฟล์เดียว (ย้าย/คัดลอก/ลบ) ใช้ได้ทั้งในลูปปกติและใน Worker Thread ของโหมดขนาน
+        คืนค่า (success, file_size, elapsed_file) ข้อผิดพลาดของดิสก์จะถูกส่งต่อเป็น OperationCriticalError
+        """
+        operation = run_options["operation"]
+        dst = run_options["dst"]
+        recursive = run_options["recursive"]
+        created_dest_dirs = run_options["created_dest_dirs"]
+        f = entry.name
+        source_path = entry.path
+        target_path = os.path.join(dst, f) if operation != "delete" else None
+        success = False
+        # ใช้ขนาดจากการสแกน ไม่ต้อง stat ไฟล์ต้นทางซ้ำก่อนประมวลผล
+        # ไฟล์ที่หายไประหว่างการทำงานจะถูกตรวจพบจาก FileNotFoundError ด้านล่าง
+        file_size = entry.size
+
+        # งานที่อยู่ในคิวของโหมดขนานจะไม่เริ่ม หากถูกยกเลิกหรือ Worker อื่นพบข้อผิดพลาดวิกฤติแล้ว
+        if self.operation_cancelled or self._abort_event.is_set():
+            return False, file_size, 0.0
+
+        reserved_bytes = 0 # พื้นที่ปลายทางที่จองไว้สำหรับไฟล์นี้ (คืนเมื่อจบไฟล์)
+        try:
+            file_start_time = time.time()
+
+            # สร้างโครงสร้างโฟลเดอร์ย่อยในปลายทางให้ตรงกับต้นทาง (ครั้งเดียวต่อโฟลเดอร์)
+            if recursive and target_path is not None:
+                target_dir = os.path.dirname(target_path)
+                if target_dir not in created_dest_dirs:
+                    os.makedirs(target_dir, exist_ok=True)
+                    created_dest_dirs.add(target_dir)
+
+            duplicate_path = None
+            if operation in ("move", "copy") and run_options["dedup_mode"] != "off":
+                duplicate_path, same_name = self._find_duplicate(entry, target_path, run_options)
+                if duplicate_path is not None and same_name:
+                    # ปลายทางมีไฟล์นี้ (ชื่อเดิมหรือ _copyN) ที่เนื้อหาเหมือนกันอยู่แล้ว: ไม่สร้างสำเนาเพิ่ม
+                    success = self._skip_duplicate(entry, duplicate_path, run_options)
+                    return success, file_size, time.time() - file_start_time
+
+            if operation in ("move", "copy"):
+                target_path = self._reserve_target_path(target_path, f, dst)
+
+            linked = False
+            if duplicate_path is not None:
+                linked = self._link_duplicate(entry, duplicate_path, target_path, run_options)
+
+            moved_by_rename = False
+            if not linked and operation == "move" and run_options["same_device"]:
+                # ไดรฟ์เดียวกัน: เปลี่ยนชื่อแบบ atomic แทนการคัดลอกข้อมูลทั้งไฟล์แล้วลบ
+                try:
+                    with self._metrics.phase("rename"):
+                        os.replace(source_path, target_path)
+                    moved_by_rename = True
+                except OSError as rename_e:
+                    if rename_e.errno != errno.EXDEV:
+                        raise
+                    # เช่น โฟลเดอร์ย่อยเป็น mount point ของอีกดิสก์ ใช้การคัดลอก+ตรวจสอบ+ลบแทน
+                    self._log_process_step(f"ไม่สามารถย้ายแบบเปลี่ยนชื่อสำหรับ '{f}' (ต่างอุปกรณ์) กำลังใช้การคัดลอกแล้วลบแทน")
+
+            # จองพื้นที่ปลายทางก่อนคัดลอก หากไฟล์นี้จะทำให้พื้นที่ว่างต่ำกว่าเกณฑ์ จะไม่เริ่มคัดลอก (หยุดที่ขอบไฟล์)
+            if not linked and not moved_by_rename and operation in ("move", "copy") and self._space_guard is not None:
+                try:
+                    space_reserved = self._space_guard.reserve(file_size)
+                except (IOError, OSError) as e:
+                    raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อตรวจสอบพื้นที่ว่างสำหรับ {dst}: {e}")
+                if not space_reserved:
+                    self._log_action(f, "skip", "พื้นที่ปลายทางไม่พอ", src=source_path) # สถานะแปลแล้ว
+                    return False, file_size, time.time() - file_start_time
+                reserved_bytes = file_size
+
+            if linked:
+                success = True
+
+            elif moved_by_rename:
+                self._remember_dest_file(target_path, file_size)
+                self._log_action(f, "ย้าย", "สำเร็จ|วิธี:เปลี่ยนชื่อ", src=source_path, dst=target_path) # สถานะแปลแล้ว
+                self._log_process_step(f"[การย้ายเสร็จสมบูรณ์] '{f}' ย้ายสำเร็จแล้วด้วยการเปลี่ยนชื่อ")
+                success = True
+
+            elif operation == "move":
+                self._journal_record("planned", entry, target_path)
+                self._log_process_step(f"[ขั้นตอนการย้าย 1/2] กำลังพยายามคัดลอก '{f}' ไปยัง '{target_path}'")
+                digest = self._timed_copy(source_path, target_path, file_size, run_options)
+                self._journal_record("copied", entry, target_path)
+
+                # เปรียบเทียบขนาดปลายทางกับขนาดต้นทางจากการสแกน (หากต้นทางถูกแก้ไขระหว่างนั้น ขนาดจะไม่ตรงและจะไม่ลบต้นฉบับ)
+                with self._metrics.phase("stat"):
+                    copied_size = _get_size_or_none(target_path)
+                if copied_size != file_size:
+                    self._journal_record("failed", entry, target_path)
+                    self._log_action(f, "ย้าย", "ขนาดไม่ตรงกัน", src=source_path, dst=target_path) # สถานะแปลแล้ว
+                    self.log(f"❌ ข้อผิดพลาด: [ย้ายไม่สำเร็จ] ขนาดไฟล์ไม่ตรงกัน หรือไม่พบปลายทางหลังการคัดลอก ข้ามการลบ: {source_path}", to_app_log=True, to_gui_log=True, show_popup=True) # นี่คือข้อผิดพลาดในการดำเนินงาน ควรแสดง popup
+                    success = False
+                elif not self._verify_copy(entry, target_path, digest, run_options):
+                    # เนื้อหาไม่ตรงกันแม้ขนาดเท่ากัน: ไม่ลบต้นฉบับ (ไฟล์ปลายทางที่เสียหายถูกลบแล้ว)
+                    success = False
+                else:
+                    self._journal_record("verified", entry, target_path)
+                    self._remember_dest_file(target_path, file_size, digest, run_options)
+                    self._log_process_step(f"[ขั้นตอนการย้าย 1/2] คัดลอก '{f}' สำเร็จ กำลังตรวจสอบความถูกต้อง")
+                    if not self.operation_cancelled:
+                        try:
+                            self._log_process_step(f"[ขั้นตอนการย้าย 2/2] กำลังพยายามลบไฟล์ต้นฉบับ '{source_path}'")
+                            with self._metrics.phase("delete"):
+                                os.remove(source_path)
+                            self._journal_record("removed", entry, target_path)
+                            self._log_action(f, "ลบ", "สำเร็จ", src=source_path) # สถานะแปลแล้ว
+                            success = True
+                            self._log_action(f, "ย้าย", "สำเร็จ|วิธี:คัดลอก+ลบ" + self._hash_status(digest, run_options), src=source_path, dst=target_path) # สถานะแปลแล้ว
+                            self._log_process_step(f"[การย้ายเสร็จสมบูรณ์] '{f}' ย้ายสำเร็จแล้ว")
+                        except (IOError, OSError) as delete_e:
+                            # นี่คือข้อผิดพลาดที่สำคัญในขั้นตอนการลบของการดำเนินการย้าย
+                            raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์ระหว่างการลบไฟล์ต้นฉบับ '{source_path}': {delete_e} หยุดการทำงาน")
+                        except Exception as delete_e:
+                            # ข้อผิดพลาดอื่น ๆ ที่ไม่คาดคิดในขั้นตอนการลบของการดำเนินการย้าย
+                            raise OperationCriticalError(f"ข้อผิดพลาดที่ไม่คาดคิดระหว่างการลบไฟล์ต้นฉบับ '{source_path}': {delete_e} หยุดการทำงาน")
+                    else:
+                        self._journal_record("cancelled", entry, target_path) # ผู้ใช้ยกเลิก: รอบถัดไปต้องไม่ลบต้นฉบับแทน
+                        self._log_action(f, "ย้าย", "ยกเลิกหลังคัดลอก", src=source_path, dst=target_path) # สถานะแปลแล้ว
+                        self.log(f"⚠️ [ยกเลิกการย้าย] คัดลอกสำเร็จ แต่ข้ามการลบต้นฉบับเนื่องจากถูกยกเลิก: {source_path}", to_app_log=True, to_gui_log=True, show_popup=False)
+                        success = False
+
+            elif operation == "copy":
+                self._journal_record("planned", entry, target_path)
+                digest = self._timed_copy(source_path, target_path, file_size, run_options)
+                if self._verify_copy(entry, target_path, digest, run_options):
+                    self._journal_record("done", entry, target_path)
+                    self._remember_dest_file(target_path, file_size, digest, run_options)
+                    self._log_action(f, "คัดลอก", "สำเร็จ" + self._hash_status(digest, run_options), src=source_path, dst=target_path) # สถานะแปลแล้ว
+                    success = True
+
+            elif operation == "delete":
+                with self._metrics.phase("delete"):
+                    os.remove(source_path)
+                self._log_action(f, "ลบ", "สำเร็จ", src=source_path) # สถานะแปลแล้ว
+                success = True
+
+            return success, file_size, time.time() - file_start_time
+
+        except OperationCancelledError:
+            # ผู้ใช้ยกเลิกระหว่างคัดลอกไฟล์ใหญ่ ไฟล์ปลายทางที่ไม่ครบถูกลบแล้ว และไม่แตะต้องไฟล์ต้นฉบับ
+            self._journal_record("cancelled", entry, target_path)
+            self._log_action(f, operation, "ยกเลิกระหว่างคัดลอก", src=source_path, dst=target_path) # สถานะแปลแล้ว
+            self.log(f"⚠️ [ยกเลิก] หยุดการคัดลอกกลางไฟล์และลบไฟล์ปลายทางที่ไม่สมบูรณ์แล้ว: {target_path}", to_app_log=True, to_gui_log=True, show_popup=False)
+            return False, file_size, time.time() - file_start_time
+        except FileNotFoundError as e:
+            # ตรวจสอบเฉพาะเมื่อเกิดข้อผิดพลาดว่าไฟล์ต้นทางหายไปหรือไม่ (แทนการ stat ล่วงหน้าทุกไฟล์)
+            if not os.path.exists(source_path):
+                raise OperationCriticalError(f"ไฟล์ '{f}' หายไปจากต้นทางระหว่างการทำงาน หยุดการทำงาน")
+            raise OperationCriticalError(f"ดิสก์หลุดหรือข้อผิดพลาดของระบบไฟล์เกิดขึ้นขณะประมวลผล {source_path}: {e} กำลังหยุดการทำงาน")
+        except (IOError, OSError) as e:
+            # บล็อกนี้จัดการข้อผิดพลาดที่เกี่ยวข้องกับดิสก์โดยเฉพาะ (เช่น ไดรฟ์ถูกถอดออก)
+            # Re-raise เป็นข้อผิดพลาดที่สำคัญเพื่อหยุดการทำงานทั้งหมดทันที
+            raise OperationCriticalError(f"ดิสก์หลุดหรือข้อผิดพลาดของระบบไฟล์เกิดขึ้นขณะประมวลผล {source_path}: {e} กำลังหยุดการทำงาน")
+        except Exception as e:
+            # บล็อกนี้จัดการข้อผิดพลาดอื่น ๆ ที่ไม่คาดคิดระหว่างการประมวลผลไฟล์เดียว
+            self.log(f"❌ ข้อผิดพลาดในการประมวลผล {source_path}: {e}", to_app_log=True, to_gui_log=True, show_popup=True) # นี่คือข้อผิดพลาดในการดำเนินงาน ควรแสดง popup
+            self._log_action(f, operation, f"ข้อผิดพลาด: {e}", src=source_path, dst=target_path) # สถานะแปลแล้ว
+            # เนื่องจากเราต้องการให้หยุดสำหรับข้อผิดพลาดประเภทนี้ เราจะ re-raise เป็น critical
+            raise OperationCriticalError(f"ข้อผิดพลาดที่ไม่คาดคิดในการประมวลผล {source_path}: {e} กำลังหยุดการทำงาน")
+        finally:
+            if reserved_bytes:
+                self._space_guard.release(reserved_bytes)
+
+    # --- Archive (รวมไฟล์เป็น Archive รายเดือน) ---
+    def _archive_files(self, eligible_files, run_options, record_result):
+        """
+        เขียนไฟล์ที่เข้าเกณฑ์ลง Archive หนึ่งไฟล์ต่อเดือน ทีละเดือนจากเดือนเก่าที่สุด (ไม่ใช้ transfer_workers)
+        ผลของแต่ละไฟล์ถูกส่งให้ record_result หลังจาก Archive ของเดือนนั้นเสร็จ
+        """
+        from archiver import ARCHIVE_PREFIX, PARTIAL_SUFFIX, group_by_month
+        dst = run_options["dst"]
+        # Archive ที่เขียนไม่ครบจากรอบก่อน (โปรแกรมปิดตัวกลางทาง) ต้นฉบับยังอยู่ครบ จึงลบทิ้งได้
+        try:
+            for name in os.listdir(dst):
+                if name.startswith(ARCHIVE_PREFIX) and name.endswith(PARTIAL_SUFFIX):
+                    os.remove(os.path.join(dst, name))
+                    self.log(f"🧹 ลบ Archive ที่เขียนไม่ครบจากรอบก่อน: {name}", to_app_log=True, to_gui_log=True, show_popup=False)
+        except (IOError, OSError) as e:
+            raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อตรวจสอบโฟลเดอร์ปลายทาง '{dst}': {e} หยุดการทำงาน")
+
+        idx = 0
+        for month, entries in group_by_month(eligible_files).items():
+            if self.operation_cancelled:
+                self.log("⚠️ ผู้ใช้ยกเลิกการทำงาน กำลังหยุดการประมวลผลไฟล์", to_app_log=True, to_gui_log=True, show_popup=False)
+                break
+            if self._space_guard is not None and self._space_guard.exhausted:
+                break # พื้นที่ปลายทางใกล้ถึงเกณฑ์ขั้นต่ำ หยุดที่ขอบ Archive
+            for entry, success in self._archive_month(month, entries, run_options):
+                idx += 1
+                record_result(idx, entry, success, entry.size, 0.0)
+
+    def _archive_month(self, month, entries, run_options):
+        """
+        เขียนไฟล์ของเดือน month ลง Archive ใหม่ในปลายทาง ตรวจสอบ แล้วลบต้นฉบับ คืนค่ารายการ (entry, success)
+        Archive ที่ตรวจสอบไม่ผ่านหรือถูกยกเลิกระหว่างเขียนจะถูกลบโดยไม่แตะต้องต้นฉบับ
+        เมื่อ Archive ถูกเปลี่ยนเป็นชื่อจริงแล้ว ต้นฉบับของ Archive นั้นจะถูกลบจนครบแม้ผู้ใช้กดยกเลิก
+        """
+        from archiver import ArchiveWriter, PARTIAL_SUFFIX, archive_name, member_name, verify_archive
+        dst = run_options["dst"]
+        archive_format = run_options["archive_format"]
+        buffer_size = run_options["copy_buffer_bytes"]
+        with self._target_lock:
+            listing = self._dest_dir_listing(dst)
+            name = archive_name(month, archive_format, listing)
+            listing[name] = None # จองชื่อไว้ตลอดรอบ
+        target_path = os.path.join(dst, name)
+        partial_path = target_path + PARTIAL_SUFFIX
+        total_bytes = sum(entry.size for entry in entries)
+        failed = [(entry, False) for entry in entries]
+
+        def remove_partial():
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+
+        # จองพื้นที่เท่าขนาดก่อนบีบอัด (Archive ไม่ใหญ่กว่านี้ในทางปฏิบัติ)
+        if self._space_guard is not None:
+            try:
+                space_reserved = self._space_guard.reserve(total_bytes)
+            except (IOError, OSError) as e:
+                raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อตรวจสอบพื้นที่ว่างสำหรับ {dst}: {e}")
+            if not space_reserved:
+                for entry in entries:
+                    self._log_action(entry.name, "skip", f"พื้นที่ปลายทางไม่พอ|{name}", src=entry.path) # สถานะแปลแล้ว
+                return failed
+
+        rate_limiter = self._rate_limiter
+        copied_bytes = 0
+        def on_chunk(nbytes):
+            nonlocal copied_bytes
+            copied_bytes += nbytes
+            self._report_copy_bytes(nbytes)
+            if rate_limiter is not None:
+                rate_limiter.acquire(nbytes, should_cancel=self._should_stop_copy)
+
+        self._log_process_step(f"[Archive {month}] กำลังเขียน {len(entries):,} ไฟล์ลง '{partial_path}'")
+        try:
+            expected = {}
+            started = time.perf_counter()
+            try:
+                writer = ArchiveWriter(partial_path, archive_format, buffer_size)
+                try:
+                    for entry in entries:
+                        arcname = member_name(entry.name)
+                        digest = writer.add(entry.path, arcname, entry.size, entry.mtime, on_chunk=on_chunk, should_cancel=self._should_stop_copy)
+                        expected[arcname] = (entry.size, digest)
+                    writer.close()
+                except BaseException:
+                    writer.abort()
+                    raise
+                archive_size = os.path.getsize(partial_path)
+                self._metrics.record_copy(time.perf_counter() - started, archive_size)
+                self._log_process_step(f"[Archive {month}] กำลังอ่าน '{partial_path}' เพื่อตรวจสอบกับต้นทาง")
+                with self._metrics.phase("verify"):
+                    problems = verify_archive(partial_path, archive_format, expected, buffer_size,
+                                              on_read=self._throttle_read, should_cancel=self._should_stop_copy)
+            finally:
+                # ไบต์ของไฟล์จะถูกนับใน total_bytes_processed เมื่อบันทึกผลแต่ละไฟล์ จึงนำออกจากตัวนับระหว่างเขียน
+                self._report_copy_bytes(-copied_bytes, refresh=False)
+            if problems:
+                remove_partial()
+                for entry in entries:
+                    self._log_action(entry.name, "Archive", f"ตรวจสอบไม่ผ่าน|{name}", src=entry.path, dst=target_path) # สถานะแปลแล้ว
+                self.log(f"❌ ข้อผิดพลาด: [ตรวจสอบ Archive ไม่ผ่าน] {name} ({'; '.join(problems[:3])}) ลบ Archive แล้ว ไม่แตะต้องต้นฉบับ", to_app_log=True, to_gui_log=True, show_popup=True)
+                return failed
+            # บันทึกสมาชิกของ Archive ลง Journal (fsync) ก่อนเปลี่ยนชื่อ: หากโปรแกรมปิดตัวก่อนลบต้นฉบับครบ
+            # รอบถัดไปจะลบต้นฉบับที่เหลือแทนการเขียนลง Archive ใหม่ซ้ำ
+            for entry in entries:
+                self._journal_record("verified", entry, target_path)
+            if self._journal is not None:
+                self._journal.sync()
+            os.replace(partial_path, target_path)
+        except OperationCancelledError:
+            remove_partial()
+            self.log(f"⚠️ [ยกเลิก] หยุดการเขียน Archive {name} และลบไฟล์ที่ไม่สมบูรณ์แล้ว ไม่แตะต้องต้นฉบับ", to_app_log=True, to_gui_log=True, show_popup=False)
+            return failed
+        except ValueError as e:
+            # ไฟล์ต้นทางถูกแก้ไขหลังการสแกน: ข้ามเดือนนี้ รอบถัดไปจะสแกนใหม่
+            remove_partial()
+            self.log(f"❌ ข้อผิดพลาด: [Archive ไม่สำเร็จ] {name}: {e} ไม่แตะต้องต้นฉบับ", to_app_log=True, to_gui_log=True, show_popup=True)
+            return failed
+        except FileNotFoundError as e:
+            remove_partial()
+            raise OperationCriticalError(f"ไฟล์หายไปจากต้นทางหรือปลายทางระหว่างการเขียน Archive {name}: {e} หยุดการทำงาน")
+        except (IOError, OSError) as e:
+            remove_partial()
+            raise OperationCriticalError(f"ดิสก์หลุดหรือข้อผิดพลาดของระบบไฟล์เกิดขึ้นขณะเขียน Archive {target_path}: {e} กำลังหยุดการทำงาน")
+        finally:
+            if self._space_guard is not None:
+                self._space_guard.release(total_bytes)
+
+        results = []
+        for entry in entries:
+            try:
+                # ตรวจสอบต้นฉบับอีกครั้งก่อนลบ: ไฟล์ที่ถูกแก้ไขหลังเขียน Archive มีเนื้อหาใหม่ที่ยังไม่ได้เก็บ
+                with self._metrics.phase("stat"):
+                    st = os.stat(entry.path)
+                if st.st_size != entry.size or st.st_mtime != entry.mtime:
+                    self._journal_record("failed", entry, target_path)
+                    self._log_action(entry.name, "Archive", f"ต้นฉบับถูกแก้ไขหลังเขียน Archive|ไม่ลบต้นฉบับ|{name}", src=entry.path, dst=target_path) # สถานะแปลแล้ว
+                    results.append((entry, False))
+                    continue
+                with self._metrics.phase("delete"):
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass # ต้นฉบับถูกลบไปแล้ว เนื้อหาถูกเก็บใน Archive แล้ว
+            except (IOError, OSError) as e:
+                raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์ระหว่างการลบไฟล์ต้นฉบับ '{entry.path}': {e} หยุดการทำงาน")
+            self._journal_record("removed", entry, target_path)
+            self._log_action(entry.name, "Archive", f"สำเร็จ|{name}", src=entry.path, dst=target_path) # สถานะแปลแล้ว
+            results.append((entry, True))
+        kept = sum(1 for _, success in results if not success)
+        kept_text = f" (เก็บต้นฉบับที่ถูกแก้ไขระหว่างทำงานไว้ {kept:,} ไฟล์)" if kept else ""
+        self.log(f"🗜️ {name}: รวม {len(entries):,} ไฟล์ ({total_bytes / (1024 ** 2):,.1f} MB) เป็น {archive_size / (1024 ** 2):,.1f} MB และลบต้นฉบับแล้ว{kept_text}",
+                 to_app_log=True, to_gui_log=True, show_popup=False)
+        return results
+
+    def _plan_capacity(self, eligible_files, total_bytes, fit_to_free_space, scan_counts):
+        """
+        ขนาดรวมเกินพื้นที่ว่างที่ใช้ได้: เลือกเฉพาะไฟล์เก่าที่สุดที่พอดี (fit_to_free_space) หรือหยุดก่อนเริ่มการทำงาน
+        ไฟล์ที่ถูกเลื่อนไปจะถูกนับเป็นไฟล์ที่ข้าม และจะถูกประมวลผลในรอบถัดไปเมื่อมีพื้นที่
+        คืนค่า (รายการไฟล์ที่จะประมวลผล, ขนาดรวม)
+        """
+        from capacity_planner import plan_oldest_fit
+        available = max(0, self._space_guard.available_bytes)
+        gb = 1024 ** 3
+        if not fit_to_free_space:
+            raise OperationCriticalError(f"ขนาดรวมของไฟล์ที่เข้าเกณฑ์ ({total_bytes / gb:.2f} GB) เกินพื้นที่ว่างที่ใช้ได้บนปลายทาง "
+                                         f"({available / gb:.2f} GB หลังหักพื้นที่ขั้นต่ำ) หยุดการทำงาน "
+                                         f"(เปิด fit_to_free_space เพื่อโอนย้ายเฉพาะไฟล์เก่าที่สุดที่พอดีกับพื้นที่)")
+        selected, selected_bytes = plan_oldest_fit(eligible_files, available)
+        if not selected:
+            raise OperationCriticalError(f"พื้นที่ว่างที่ใช้ได้บนปลายทาง ({available / gb:.2f} GB หลังหักพื้นที่ขั้นต่ำ) ไม่พอสำหรับไฟล์ที่เก่าที่สุด "
+                                         f"'{eligible_files[0].name}' ({eligible_files[0].size / gb:.2f} GB) หยุดการทำงาน")
+        deferred = eligible_files[len(selected):]
+        for entry in deferred:
+            self._log_action(entry.name, "skip", "พื้นที่ปลายทางไม่พอ|เลื่อนไปรอบถัดไป", src=entry.path) # สถานะแปลแล้ว
+        scan_counts["skipped"] += len(deferred)
+        self.log(f"📐 พื้นที่ปลายทางไม่พอสำหรับทั้งหมด ({total_bytes / gb:.2f} GB > {available / gb:.2f} GB): "
+                 f"โอนย้ายไฟล์เก่าที่สุด {len(selected):,} ไฟล์ ({selected_bytes / gb:.2f} GB) เลื่อน {len(deferred):,} ไฟล์ไปรอบถัดไป",
+                 to_app_log=True, to_gui_log=True, show_popup=False)
+        return selected, selected_bytes
+
+    def _timed_copy(self, source_path, target_path, file_size, run_options):
+        """คัดลอกไฟล์ด้วย _copy_file และบันทึกเวลาคัดลอก (รวมเวลารอการจำกัดความเร็ว) ลงตัวชี้วัดของรอบ"""
+        started = time.perf_counter()
+        digest = self._copy_file(source_path, target_path, file_size, run_options)
+        self._metrics.record_copy(time.perf_counter() - started, file_size)
+        return digest
+
+    def _copy_file(self, source_path, target_path, file_size, run_options):
+        """
+        คัดลอกไฟล์ไปยังปลายทาง: ไฟล์เล็กใช้ shutil.copy2 ส่วนไฟล์ใหญ่คัดลอกทีละก้อน
+        พร้อมรายงานความคืบหน้าระดับไบต์และตรวจสอบการยกเลิกระหว่างก้อน
+        เมื่อเปิดใช้ Hash ทุกไฟล์จะคัดลอกทีละก้อนเพื่อคำนวณ Hash จากข้อมูลที่อ่าน คืนค่า Hash ของต้นทาง (หรือ None)
+        เมื่อกำลังจำกัดความเร็ว ทุกไฟล์จะคัดลอกทีละก้อน (ก้อนเล็กลงตามอัตรา) และรอ Token หลังเขียนแต่ละก้อน
+        """
+        hash_algorithm = run_options["hash_algorithm"]
+        large_file = file_size >= run_options["chunked_copy_threshold_bytes"]
+        rate_limiter = self._rate_limiter
+        buffer_size = run_options["copy_buffer_bytes"]
+        if rate_limiter is not None:
+            buffer_size = rate_limiter.chunk_size(buffer_size)
+            if rate_limiter.current_limit() is None:
+                rate_limiter = None # ช่วงเวลานี้ไม่จำกัดความเร็ว
+        if not large_file and hash_algorithm is None and rate_limiter is None:
+            shutil.copy2(source_path, target_path)
+            return None
+
+        copied_bytes = 0
+        def on_progress(nbytes):
+            nonlocal copied_bytes
+            copied_bytes += nbytes
+            self._report_copy_bytes(nbytes)
+            if rate_limiter is not None:
+                rate_limiter.acquire(nbytes, should_cancel=self._should_stop_copy)
+
+        hasher = _new_hasher(hash_algorithm) if hash_algorithm is not None else None
+        try:
+            _copy_file_chunked(source_path, target_path, buffer_size, on_progress=on_progress,
+                               should_cancel=self._should_stop_copy, hasher=hasher)
+        finally:
+            # ไบต์ของไฟล์นี้จะถูกนับใน total_bytes_processed เมื่อไฟล์เสร็จสมบูรณ์ จึงนำออกจากตัวนับระหว่างคัดลอก
+            self._report_copy_bytes(-copied_bytes, refresh=False)
+        return hasher.hexdigest() if hasher is not None else None
+
+    def _throttle_read(self, nbytes):
+        """นับการอ่านไฟล์ปลายทาง (ตรวจสอบ Hash/ไฟล์ซ้ำ) รวมในการจำกัดความเร็ว เนื่องจากใช้เครือข่ายเส้นเดียวกัน"""
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(nbytes, should_cancel=self._should_stop_copy)
+
+    def _should_stop_copy(self):
+        """ใช้ระหว่างคัดลอก/ตรวจสอบทีละก้อน: หยุดเมื่อผู้ใช้ยกเลิก หรือ Worker อื่นพบข้อผิดพลาดวิกฤติ"""
+        return self.operation_cancelled or self._abort_event.is_set()
+
+    def _verify_copy(self, entry, target_path, digest, run_options):
+        """
+        รอบตรวจสอบ (verify_hash): อ่านไฟล์ปลายทางอีกครั้งและเปรียบเทียบกับ Hash ที่คำนวณระหว่างคัดลอก
+        หากไม่ตรงกัน จะลบไฟล์ปลายทางที่เสียหายและบันทึกข้อผิดพลาด คืนค่า True เมื่อผ่าน (หรือไม่ได้เปิดใช้)
+        """
+        if not run_options["verify_hash"] or digest is None:
+            return True
+        f = entry.name
+        self._log_process_step(f"[ตรวจสอบ Hash] กำลังอ่าน '{target_path}' เพื่อเปรียบเทียบกับต้นทาง")
+        with self._metrics.phase("verify"):
+            target_digest = _hash_file(target_path, run_options["hash_algorithm"], run_options["copy_buffer_bytes"],
+                                       should_cancel=self._should_stop_copy, on_read=self._throttle_read)
+        if target_digest == digest:
+            return True
+        self._journal_record("failed", entry, target_path)
+        try:
+            os.remove(target_path)
+        except FileNotFoundError:
+            pass
+        self._log_action(f, run_options["operation"], f"Hash ไม่ตรงกัน|{run_options['hash_algorithm']}:{digest}|ปลายทาง:{target_digest}", src=entry.path, dst=target_path) # สถานะแปลแล้ว
+        self.log(f"❌ ข้อผิดพลาด: [ตรวจสอบไม่ผ่าน] เนื้อหาไฟล์ปลายทางไม่ตรงกับต้นทาง (ลบไฟล์ปลายทางที่เสียหายแล้ว ไม่แตะต้องต้นฉบับ): {entry.path}", to_app_log=True, to_gui_log=True, show_popup=True) # นี่คือข้อผิดพลาดในการดำเนินงาน ควรแสดง popup
+        return False
+
+    @staticmethod
+    def _hash_status(digest, run_options):
+        """ส่วนต่อท้ายสถานะใน Action Log สำหรับ Hash ของไฟล์ (ว่างหากไม่ได้คำนวณ)"""
+        if digest is None:
+            return ""
+        verified = "|ตรวจสอบ:ผ่าน" if run_options["verify_hash"] else ""
+        return f"|{run_options['hash_algorithm']}:{digest}{verified}"
+
+    def _report_copy_bytes(self, nbytes, refresh=True):
+        """สะสมจำนวนไบต์ที่คัดลอกไปแล้วของไฟล์ที่กำลังทำงาน และอัปเดตความคืบหน้าไม่เกินทุก 0.5 วินาที"""
+        with self._progress_lock:
+            self._inflight_bytes += nbytes
+            now = time.time()
+            if not refresh or now - self._last_byte_refresh < 0.5:
+                return
+            self._last_byte_refresh = now
+        self._refresh_progress()
+
+    def _reserve_target_path(self, target_path, f, dst):
+        """
+        หาชื่อปลายทางที่ไม่ซ้ำ (เพิ่ม _copyN หากชื่อซ้ำ) และจองชื่อไว้
+        ใช้รายการชื่อไฟล์ของโฟลเดอร์ปลายทางที่อ่านไว้ในรอบนี้แทนการ os.path.exists ทีละชื่อ
+        (ถือว่าระหว่างการทำงานไม่มีโปรแกรมอื่นเขียนไฟล์ชื่อเดียวกันลงโฟลเดอร์ปลายทาง)
+        ชื่อที่จองแล้วจะอยู่ในรายการตลอดรอบ Worker หลายตัวในโหมดขนานจึงไม่เลือกชื่อเดียวกัน
+        """
+        target_dir, name = os.path.split(target_path)
+        with self._target_lock:
+            listing = self._dest_dir_listing(target_dir)
+            if name in listing:
+                base, ext = os.path.splitext(name)
+                key = (target_dir, base, ext)
+                count = self._copy_counters.get(key, 1)
+                while f"{base}_copy{count}{ext}" in listing:
+                    count += 1
+                name = f"{base}_copy{count}{ext}"
+                self._copy_counters[key] = count + 1
+                target_path = os.path.join(target_dir, name)
+                self._log_process_step(f"ไฟล์ '{f}' มีอยู่แล้วในปลายทาง กำลังเปลี่ยนชื่อเป็น '{name}'")
+            listing[name] = None
+        return target_path
+
+    def _open_dedup_index(self):
+        """เปิดดัชนี Hash ของไฟล์ปลายทางข้างไฟล์ตั้งค่า คืนค่า None (คำนวณ Hash ใหม่ทุกครั้งโดยไม่บันทึก) หากเปิดไม่ได้"""
+        import sqlite3
+        from dedup_index import DedupIndex, dedup_index_path
+        index_path = self._job_state_path(dedup_index_path(self.config_file))
+        try:
+            return DedupIndex(index_path)
+        except sqlite3.Error as e:
+            self.log(f"⚠️ คำเตือน: ไม่สามารถเปิดดัชนี Hash ของปลายทาง '{index_path}': {e} จะคำนวณ Hash ใหม่ทุกครั้ง", to_app_log=True, to_gui_log=True, show_popup=False)
+            return None
+
+    def _close_dedup_index(self):
+        """บันทึกและปิดดัชนี Hash ของไฟล์ปลายทาง"""
+        dedup_index = self._dedup_index
+        if dedup_index is None:
+            return
+        self._dedup_index = None
+        import sqlite3
+        try:
+            dedup_index.close()
+        except sqlite3.Error as e:
+            self.log(f"⚠️ คำเตือน: ไม่สามารถบันทึกดัชนี Hash ของปลายทาง: {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+
+    # --- Run profiling (โปรไฟล์ของรอบการทำงาน) ---
+    def _start_profiler(self, op, settings):
+        """เริ่มโปรไฟล์รอบนี้เมื่อเปิด profile_runs (ไฟล์ตั้งค่าหรือ cli.py --profile) คืนค่า RunProfiler หรือ None"""
+        if settings is None:
+            from settings import SettingsError
+            try:
+                settings = self.get_settings()
+            except SettingsError:
+                return None # การทำงานจะหยุดพร้อมแจ้งข้อผิดพลาดของการตั้งค่าเอง
+        if not (self.profile_runs or settings.profile_runs):
+            return None
+        from run_profiler import RunProfiler, profile_dir
+        label = op if self.job_name is None else f"{op}_{self.job_name}"
+        profiler = RunProfiler(profile_dir(LOG_FILE), label, settings.profiler, settings.profile_keep, settings.profile_top_n)
+        if profiler.fallback:
+            self.log("⚠️ คำเตือน: ไม่ได้ติดตั้ง pyinstrument ใช้ cProfile แทน", to_app_log=True, to_gui_log=False, show_popup=False)
+        try:
+            profiler.start()
+        except ValueError as e:
+            # เช่น Python 3.12+ ที่ cProfile เปิดได้ครั้งละหนึ่งตัว ขณะที่อีกงานกำลังถูกโปรไฟล์อยู่
+            self.log(f"⚠️ คำเตือน: ไม่สามารถเริ่มโปรไฟล์รอบนี้: {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+            return None
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        """หยุดโปรไฟล์และเขียนไฟล์ผลลัพธ์ (ข้อผิดพลาดในการเขียนเป็นเพียงคำเตือน)"""
+        if profiler is None:
+            return
+        try:
+            paths = profiler.stop()
+        except (IOError, OSError) as e:
+            self.log(f"⚠️ คำเตือน: ไม่สามารถบันทึกโปรไฟล์ของรอบนี้: {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+            return
+        self.log(f"🔬 บันทึกโปรไฟล์ของรอบนี้ ({profiler.kind}): {paths[-1]}", to_app_log=True, to_gui_log=False, show_popup=False)
+
+    # --- Run metrics (ตัวชี้วัดของรอบการทำงาน) ---
+    def _export_metrics(self, status):
+        """
+        ปิดตัวชี้วัดของรอบ (status: success, cancelled หรือ failed) และเขียนเป็น JSON ข้างไฟล์ตั้งค่า
+        และไฟล์ .prom ใน metrics_textfile_dir (หากกำหนด) ข้อผิดพลาดในการเขียนเป็นเพียงคำเตือน
+        """
+        metrics = self._metrics
+        if metrics is None:
+            return # การทำงานไม่ได้เริ่ม (เช่น การตั้งค่าไม่ถูกต้อง)
+        busy_start, batches_start = self._log_busy_start
+        metrics.add_time("logging", self._log_writer.busy_seconds - busy_start, calls=self._log_writer.batches - batches_start)
+        scan_counts = self._scan_counts
+        if scan_counts is not None:
+            metrics.set_counter("files_seen", scan_counts["seen"])
+            metrics.set_counter("files_skipped", scan_counts["skipped"])
+            metrics.set_counter("files_eligible", scan_counts["eligible"])
+        metrics.finish(status)
+
+        settings = self.run_settings
+        if not settings.export_metrics:
+            return
+        from run_metrics import PROMETHEUS_FILE, metrics_path
+        targets = [(metrics.write_json, self._job_state_path(metrics_path(self.config_file)))]
+        if settings.metrics_textfile_dir:
+            targets.append((metrics.write_prometheus, self._job_state_path(os.path.join(settings.metrics_textfile_dir, PROMETHEUS_FILE))))
+        for write, path in targets:
+            try:
+                write(path)
+            except (IOError, OSError) as e:
+                self.log(f"⚠️ คำเตือน: ไม่สามารถเขียนตัวชี้วัดของรอบการทำงาน '{path}': {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+
+    def _dest_dir_listing(self, target_dir):
+        """
+        รายการ {ชื่อ: ขนาด} ของโฟลเดอร์ปลายทาง อ่านจากดิสก์ครั้งแรกที่ใช้ในรอบนี้ (เรียกขณะถือ _target_lock)
+        พร้อมตั้งตัวนับ _copyN ของแต่ละชื่อให้ต่อจากเลขสูงสุดที่มีอยู่แล้ว การหาชื่อใหม่จึงไม่ต้องไล่ตรวจทีละเลข
+        """
+        listing = self._dest_listing.get(target_dir)
+        if listing is None:
+            listing = {}
+            try:
+                with os.scandir(target_dir) as it:
+                    for dir_entry in it:
+                        # ชื่อของโฟลเดอร์ย่อยก็ใช้ไม่ได้เช่นกัน (ขนาด None: ไม่ใช่ไฟล์ที่เปรียบเทียบเนื้อหาได้)
+                        listing[dir_entry.name] = dir_entry.stat(follow_symlinks=False).st_size if dir_entry.is_file(follow_symlinks=False) else None
+            except FileNotFoundError:
+                pass # โฟลเดอร์ปลายทางยังไม่ถูกสร้าง
+            for name in listing:
+                match = _COPY_NAME_PATTERN.match(name)
+                if match:
+                    key = (target_dir, match.group(1), match.group(3) or "")
+                    self._copy_counters[key] = max(self._copy_counters.get(key, 1), int(match.group(2)) + 1)
+            self._dest_listing[target_dir] = listing
+        return listing
+
+    def _remember_dest_file(self, target_path, file_size, digest=None, run_options=None):
+        """เพิ่มไฟล์ที่เพิ่งเขียนลงรายการไฟล์ปลายทาง (และบันทึก Hash ที่คำนวณระหว่างคัดลอก ไม่ต้องอ่านไฟล์ซ้ำ)"""
+        with self._target_lock:
+            listing = self._dest_listing.get(os.path.dirname(target_path))
+            if listing is not None:
+                listing[os.path.basename(target_path)] = file_size
+        if digest is not None and self._dedup_index is not None and run_options["dedup_algorithm"] == run_options["hash_algorithm"]:
+            st = os.stat(target_path)
+            self._dedup_index.put(os.path.abspath(target_path), st.st_size, st.st_mtime_ns, run_options["dedup_algorithm"], digest)
+
+    def _dest_digest(self, path, run_options):
+        """Hash ของไฟล์ปลายทาง: ใช้ค่าจากดัชนีหากไฟล์ไม่ถูกแก้ไขตั้งแต่คำนวณครั้งก่อน มิฉะนั้นอ่านไฟล์และบันทึกลงดัชนี"""
+        algorithm = run_options["dedup_algorithm"]
+        st = os.stat(path)
+        abs_path = os.path.abspath(path)
+        if self._dedup_index is not None:
+            digest = self._dedup_index.get(abs_path, st.st_size, st.st_mtime_ns, algorithm)
+            if digest is not None:
+                return digest
+        digest = _hash_file(path, algorithm, run_options["copy_buffer_bytes"], should_cancel=self._should_stop_copy, on_read=self._throttle_read)
+        if self._dedup_index is not None:
+            self._dedup_index.put(abs_path, st.st_size, st.st_mtime_ns, algorithm, digest)
+        return digest
+
+    def _find_duplicate(self, entry, target_path, run_options):
+        """
+        ค้นหาไฟล์ในปลายทางที่เนื้อหาเหมือนกับต้นทาง (คำนวณ Hash ของต้นทางเฉพาะเมื่อมีไฟล์ขนาดเท่ากัน)
+        คืนค่า (เส้นทางไฟล์ที่ซ้ำ, เป็นชื่อเดิมหรือ _copyN ของไฟล์นี้หรือไม่) หรือ (None, False)
+        โหมด skip พิจารณาเฉพาะชื่อเดิม/_copyN ในโฟลเดอร์ปลายทาง ส่วนโหมด hardlink พิจารณาทุกไฟล์ในโฟลเดอร์
+        แล้วจึงค้นหาจากดัชนี Hash ของทั้งปลายทาง (ไฟล์ในโฟลเดอร์อื่นที่เคยคำนวณ Hash ไว้)
+        """
+        target_dir, target_name = os.path.split(target_path)
+        base, ext = os.path.splitext(target_name)
+        same_name_pattern = re.compile(re.escape(base) + r"_copy\d+" + re.escape(ext) + "$")
+        with self._target_lock:
+            listing = self._dest_dir_listing(target_dir)
+            candidates = [(name != target_name and not same_name_pattern.match(name), name)
+                          for name, size in listing.items() if size == entry.size]
+        hardlink = run_options["dedup_mode"] == "hardlink"
+        if not hardlink:
+            candidates = [c for c in candidates if not c[0]]
+        algorithm = run_options["dedup_algorithm"]
+        # โหมด hardlink: ไฟล์ขนาดเท่ากันในโฟลเดอร์อื่นของปลายทางที่อยู่ในดัชนี (ไม่รวมโฟลเดอร์นี้ซึ่งตรวจจากรายการไฟล์แล้ว)
+        dest_root = os.path.join(os.path.abspath(run_options["dst"]), "")
+        abs_target_dir = os.path.abspath(target_dir)
+        indexed = []
+        if hardlink and self._dedup_index is not None:
+            indexed = [row for row in self._dedup_index.find(entry.size, algorithm)
+                       if row[0].startswith(dest_root) and os.path.dirname(row[0]) != abs_target_dir]
+        if not candidates and not indexed:
+            return None, False
+
+        source_digest = _hash_file(entry.path, algorithm, run_options["copy_buffer_bytes"], should_cancel=self._should_stop_copy)
+        candidates.sort() # ตรวจชื่อเดิม/_copyN ก่อนไฟล์อื่น
+        for other_name, name in candidates:
+            candidate_path = os.path.join(target_dir, name)
+            try:
+                if self._dest_digest(candidate_path, run_options) == source_digest:
+                    return candidate_path, not other_name
+            except FileNotFoundError:
+                continue # ไฟล์ปลายทางถูกลบไประหว่างการทำงาน
+        for path, mtime_ns, digest in indexed:
+            if digest != source_digest:
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue # ไฟล์ถูกลบหลังบันทึกลงดัชนี
+            if st.st_size == entry.size and st.st_mtime_ns == mtime_ns: # ไม่ถูกแก้ไขหลังคำนวณ Hash
+                return path, False
+        return None, False
+
+    def _skip_duplicate(self, entry, duplicate_path, run_options):
+        """ไม่คัดลอกไฟล์ที่ปลายทางมีอยู่แล้ว (การย้ายจะลบต้นฉบับ เพราะเนื้อหาถูกเก็บในปลายทางแล้ว)"""
+        f = entry.name
+        operation = run_options["operation"]
+        if operation == "move":
+            if self.operation_cancelled:
+                return False
+            os.remove(entry.path)
+        with self._dedup_lock:
+            self._dedup_stats["skipped"] += 1
+            self._dedup_stats["saved_bytes"] += entry.size
+        self._log_action(f, operation, f"สำเร็จ|วิธี:ข้ามไฟล์ซ้ำ|ซ้ำกับ:{os.path.basename(duplicate_path)}", src=entry.path, dst=duplicate_path) # สถานะแปลแล้ว
+        self._log_process_step(f"[ไฟล์ซ้ำ] '{f}' มีเนื้อหาเหมือนกับ '{duplicate_path}' ในปลายทางแล้ว ไม่คัดลอกซ้ำ")
+        return True
+
+    def _link_duplicate(self, entry, duplicate_path, target_path, run_options):
+        """
+        สร้างฮาร์ดลิงก์ไปยังไฟล์ปลายทางที่เนื้อหาเหมือนกันแทนการคัดลอก คืนค่า False (ให้คัดลอกตามปกติ)
+        หากระบบไฟล์ไม่รองรับฮาร์ดลิงก์ ซึ่งจะปิดการใช้ฮาร์ดลิงก์สำหรับรอบนี้
+        """
+        if not run_options["hardlink_supported"] or self.operation_cancelled:
+            return False
+        f = entry.name
+        try:
+            os.link(duplicate_path, target_path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            if e.errno in _HARDLINK_UNSUPPORTED_ERRNOS:
+                run_options["hardlink_supported"] = False
+                self.log(f"⚠️ ปลายทางไม่รองรับฮาร์ดลิงก์ ({e}) จะคัดลอกไฟล์ตามปกติในรอบนี้", to_app_log=True, to_gui_log=True, show_popup=False)
+                return False
+            raise
+        self._remember_dest_file(target_path, entry.size)
+        if run_options["operation"] == "move":
+            os.remove(entry.path)
+        with self._dedup_lock:
+            self._dedup_stats["linked"] += 1
+            self._dedup_stats["saved_bytes"] += entry.size
+        self._log_action(f, run_options["operation"], f"สำเร็จ|วิธี:ฮาร์ดลิงก์|ซ้ำกับ:{os.path.basename(duplicate_path)}", src=entry.path, dst=target_path) # สถานะแปลแล้ว
+        return True
+
+    def _open_journal(self, operation):
+        """เริ่ม Journal ใหม่สำหรับรอบนี้ (ข้างไฟล์ตั้งค่า)"""
+        from transfer_journal import TransferJournal, journal_path
+        run_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        return TransferJournal(self._job_state_path(journal_path(self.config_file)), run_id, operation)
+
+    def _journal_record(self, state, entry, target_path):
+        """
+        บันทึกสถานะของไฟล์ลง Journal ของรอบนี้ (หากเปิดใช้) ใช้เส้นทางแบบเต็มเพื่อให้กู้คืนได้แม้รันจากโฟลเดอร์อื่น
+        สถานะ planned ถูกเขียนลงดิสก์ (fsync) ทันที ก่อนเริ่มเขียนไฟล์ปลายทางที่ชื่อที่จองไว้
+        ไฟล์ที่คัดลอกไม่ครบเมื่อโปรแกรมปิดตัวจึงมีรายการใน Journal ให้รอบถัดไปลบเสมอ
+        """
+        if self._journal is not None:
+            self._journal.record(state, os.path.abspath(entry.path), os.path.abspath(target_path), entry.size, entry.mtime)
+            if state == "planned":
+                self._journal.sync()
+
+    def _close_journal(self):
+        """ปิด Journal ของรอบนี้ และแจ้งหากยังมีไฟล์ที่ค้างอยู่ให้รอบถัดไปกู้คืน"""
+        journal = self._journal
+        if journal is None:
+            return
+        self._journal = None
+        try:
+            unfinished = journal.close()
+        except (IOError, OSError) as e:
+            self.log(f"⚠️ คำเตือน: ไม่สามารถปิด Journal '{journal.path}': {e}", to_app_log=True, to_gui_log=True, show_popup=False)
+            return
+        if unfinished:
+            self.log(f"⚠️ มี {unfinished:,} ไฟล์ที่ทำงานไม่เสร็จ ถูกบันทึกใน Journal แล้ว และจะถูกกู้คืนเมื่อเริ่มการทำงานครั้งถัดไป", to_app_log=True, to_gui_log=True, show_popup=False)
+
+    def _resume_from_journal(self, buffer_size):
+        """
+        กู้คืนงานที่ค้างจาก Journal ของรอบก่อนหน้า (โปรแกรมปิดตัวหรือดิสก์หลุดกลางทาง) โดยตรวจสอบไฟล์จริงบนดิสก์
+        - การย้ายที่ตรวจสอบปลายทางแล้ว (verified) และขนาด/เวลาแก้ไขตรงกับต้นฉบับ: ลบต้นฉบับให้เสร็จ โดยไม่คัดลอกซ้ำ
+        - การย้ายที่ยังไม่ได้ตรวจสอบ (planned/copied): เปรียบเทียบ Hash (blake2b) ของต้นฉบับและปลายทางก่อนลบต้นฉบับ
+          เสมอ (ปลายทางที่ขนาดเท่ากันอาจเขียนไม่สมบูรณ์)
+        - ไฟล์ปลายทางที่คัดลอกไม่ครบหรือเนื้อหาไม่ตรงกัน: ลบทิ้ง ต้นฉบับจะถูกสแกนพบและคัดลอกใหม่ตามปกติ
+        - Archive ที่ตรวจสอบและเปลี่ยนเป็นชื่อจริงแล้ว: ลบต้นฉบับที่เหลือ (ที่ไม่ถูกแก้ไข) แทนการเขียนลง Archive ใหม่ซ้ำ
+        """
+        from transfer_journal import journal_path, mark_resolved, read_unfinished
+        path = self._job_state_path(journal_path(self.config_file))
+        unfinished = read_unfinished(path)
+        if not unfinished:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        self.log(f"🩹 พบงานค้างจากการทำงานครั้งก่อน {len(unfinished):,} ไฟล์ กำลังกู้คืนจาก Journal", to_app_log=True, to_gui_log=True, show_popup=False)
+        finished_moves = 0
+        removed_partials = 0
+        for record in unfinished:
+            src = record.get("src")
+            dst = record.get("dst")
+            size = record.get("size")
+            mtime = record.get("mtime")
+            if not src or not dst:
+                continue
+            try:
+                if record.get("op") == "archive":
+                    finished_moves += self._resume_archive_member(record)
+                    mark_resolved(path, src)
+                    continue
+                try:
+                    dst_stat = os.stat(dst)
+                except FileNotFoundError:
+                    continue # ยังไม่ได้เริ่มคัดลอก ต้นฉบับจะถูกประมวลผลตามปกติ
+                # copy2/copystat คัดลอกเวลาแก้ไขมาด้วย (เผื่อความละเอียด 2 วินาทีของ FAT/exFAT)
+                target_complete = dst_stat.st_size == size and abs(dst_stat.st_mtime - mtime) <= 2
+                if not target_complete:
+                    os.remove(dst)
+                    removed_partials += 1
+                    self._log_process_step(f"[กู้คืน] ลบไฟล์ปลายทางที่คัดลอกไม่ครบจากการทำงานครั้งก่อน: '{dst}'")
+                    continue
+                if record.get("op") != "move":
+                    continue
+                try:
+                    src_stat = os.stat(src)
+                except FileNotFoundError:
+                    continue # ต้นฉบับถูกลบไปแล้ว การย้ายเสร็จสมบูรณ์
+                if src_stat.st_size != size or src_stat.st_mtime != mtime:
+                    self._log_process_step(f"[กู้คืน] ต้นฉบับ '{src}' ถูกแก้ไขหลังการคัดลอก ไม่ลบต้นฉบับ")
+                elif record.get("state") == "verified":
+                    os.remove(src)
+                    finished_moves += 1
+                    self._log_action(os.path.basename(src), "ย้าย", "สำเร็จ|วิธี:กู้คืนจาก Journal", src=src, dst=dst) # สถานะแปลแล้ว
+                else:
+                    # เปรียบเทียบเนื้อหาจริงทั้งสองไฟล์ (ใช้ blake2b เสมอ ไม่ต้องพึ่งแพ็กเกจเพิ่มเติม)
+                    with self._metrics.phase("verify"):
+                        same_content = _hash_file(src, "blake2b", buffer_size) == _hash_file(dst, "blake2b", buffer_size)
+                    if same_content:
+                        os.remove(src)
+                        finished_moves += 1
+                        self._log_action(os.path.basename(src), "ย้าย", "สำเร็จ|วิธี:กู้คืนจาก Journal|ตรวจสอบ:ผ่าน", src=src, dst=dst) # สถานะแปลแล้ว
+                    else:
+                        os.remove(dst)
+                        removed_partials += 1
+                        self._log_action(os.path.basename(src), "ย้าย", "กู้คืน|Hash ไม่ตรงกัน", src=src, dst=dst) # สถานะแปลแล้ว
+                        self._log_process_step(f"[กู้คืน] เนื้อหาไฟล์ปลายทาง '{dst}' ไม่ตรงกับต้นฉบับ ลบไฟล์ปลายทางแล้ว ต้นฉบับจะถูกคัดลอกใหม่")
+                mark_resolved(path, src)
+            except (IOError, OSError) as e:
+                # เก็บ Journal ไว้ เพื่อกู้คืนอีกครั้งเมื่อดิสก์พร้อม
+                raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์ระหว่างกู้คืนงานค้างจาก Journal ('{src}'): {e} หยุดการทำงาน")
+
+        os.remove(path)
+        self.log(f"🩹 กู้คืนเสร็จสิ้น: ย้ายต่อจนเสร็จ {finished_moves:,} ไฟล์ (ไม่คัดลอกซ้ำ) ลบไฟล์ปลายทางที่คัดลอกไม่ครบ {removed_partials:,} ไฟล์", to_app_log=True, to_gui_log=True, show_popup=False)
+
+    def _resume_archive_member(self, record):
+        """
+        กู้คืนต้นฉบับหนึ่งไฟล์ของ Archive จาก Journal คืนค่า 1 หากลบต้นฉบับ มิฉะนั้น 0
+        สถานะ verified ถูกบันทึกหลังตรวจสอบ Archive ก่อนเปลี่ยนชื่อ จึงลบต้นฉบับเฉพาะเมื่อ Archive มีชื่อจริงแล้ว
+        (ยังไม่เปลี่ยนชื่อ = ไฟล์ .partial ถูกลบเมื่อเริ่ม Archive และต้นฉบับจะถูกเขียนลง Archive ใหม่ตามปกติ)
+        """
+        src = record["src"]
+        dst = record["dst"]
+        if record.get("state") != "verified" or not os.path.exists(dst):
+            return 0
+        try:
+            src_stat = os.stat(src)
+        except FileNotFoundError:
+            return 0 # ต้นฉบับถูกลบไปแล้ว
+        if src_stat.st_size != record.get("size") or src_stat.st_mtime != record.get("mtime"):
+            self._log_process_step(f"[กู้คืน] ต้นฉบับ '{src}' ถูกแก้ไขหลังเขียน Archive '{dst}' ไม่ลบต้นฉบับ")
+            return 0
+        os.remove(src)
+        self._log_action(os.path.basename(src), "Archive", f"สำเร็จ|วิธี:กู้คืนจาก Journal|{os.path.basename(dst)}", src=src, dst=dst) # สถานะแปลแล้ว
+        return 1
+
+    def _open_scan_index(self):
+        """เปิดดัชนีการสแกนข้างไฟล์ตั้งค่า คืนค่า None (และใช้การสแกนแบบเต็ม) หากเปิดไม่ได้"""
+        import sqlite3
+        from scan_index import ScanIndex, scan_index_path
+        index_path = self._job_state_path(scan_index_path(self.config_file))
+        self._scan_index_actions = []
+        try:
+            return ScanIndex(index_path)
+        except sqlite3.Error as e:
+            self.log(f"⚠️ คำเตือน: ไม่สามารถเปิดดัชนีการสแกน '{index_path}': {e} ใช้การสแกนแบบเต็มแทน", to_app_log=True, to_gui_log=True, show_popup=False)
+            return None
+
+    def _close_scan_index(self):
+        """บันทึกการกระทำของรอบนี้ลงดัชนีการสแกนและปิดการเชื่อมต่อ"""
+        scan_index = self._scan_index
+        if scan_index is None:
+            return
+        self._scan_index = None
+        import sqlite3
+        try:
+            if self._scan_index_actions:
+                scan_index.record_actions(self._scan_index_actions)
+            scan_index.close()
+        except sqlite3.Error as e:
+            self.log(f"⚠️ คำเตือน: ไม่สามารถบันทึกดัชนีการสแกน: {e}", to_app_log=True, to_gui_log=False, show_popup=False)
+        self._scan_index_actions = []
+
+    def _query_scan_index(self, src, recursive, file_type, cutoff_timestamp, scan_counts):
+        """
+        ปรับดัชนีให้ตรงกับต้นทาง (อ่านรายการไฟล์ใหม่เฉพาะโฟลเดอร์ที่เปลี่ยน) แล้วค้นหาไฟล์ที่เก่ากว่าวันที่ตัดยอดจากดัชนี
+        stat เฉพาะไฟล์ที่เข้าเกณฑ์เพื่อยืนยัน (การแก้ไขเนื้อหาไฟล์ไม่ทำให้ mtime ของโฟลเดอร์เปลี่ยน)
+        คืนค่ารายการ FileEntry เรียงจากเก่าที่สุด หรือ None หากฐานข้อมูลมีปัญหา (ผู้เรียกจะสแกนแบบเต็มแทน)
+        """
+        import sqlite3
+        scan_index = self._scan_index
+        try:
+            try:
+                scanned_dirs, unchanged_dirs = scan_index.refresh(src, recursive)
+            except (IOError, OSError) as e:
+                raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อแสดงรายการไฟล์ในโฟลเดอร์ต้นทาง '{src}': {e} หยุดการทำงาน")
+            self.log(f"🗂️ ดัชนีการสแกน: อ่านรายการไฟล์ใหม่ {scanned_dirs:,} โฟลเดอร์ ข้ามโฟลเดอร์ที่ไม่เปลี่ยนแปลง {unchanged_dirs:,} โฟลเดอร์", to_app_log=True, to_gui_log=True, show_popup=False)
+
+            seen_count = scan_index.count(src, recursive)
+            eligible_files = []
+            for entry in scan_index.query(src, recursive, cutoff_timestamp):
+                if file_type == "Excel" and not entry.name.lower().endswith(EXCEL_EXTENSIONS):
+                    continue
+                try:
+                    st = os.stat(entry.path)
+                except FileNotFoundError:
+                    scan_index.mark_missing(entry.path)
+                    seen_count -= 1
+                    continue
+                except (IOError, OSError) as e:
+                    raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อตรวจสอบไฟล์ '{entry.path}': {e} หยุดการทำงาน")
+                if st.st_size != entry.size or st.st_mtime != entry.mtime:
+                    scan_index.update_file(entry.path, st.st_size, st.st_mtime)
+                    if cutoff_timestamp is not None and st.st_mtime > cutoff_timestamp:
+                        continue # ไฟล์ถูกแก้ไขหลังการสแกนครั้งก่อน จึงยังไม่เก่าพอ
+                    entry = entry._replace(size=st.st_size, mtime=st.st_mtime)
+                eligible_files.append(entry)
+            scan_index.commit()
+        except sqlite3.Error as e:
+            self.log(f"⚠️ คำเตือน: ดัชนีการสแกนมีข้อผิดพลาด: {e} ใช้การสแกนแบบเต็มแทน", to_app_log=True, to_gui_log=True, show_popup=False)
+            self._close_scan_index()
+            return None
+
+        eligible_files.sort(key=attrgetter("mtime"))
+        # ไฟล์ที่ไม่เข้าเกณฑ์ไม่ถูกบันทึกทีละไฟล์ใน Action Log (ไม่ได้ถูกอ่านจากดิสก์) จึงนับรวมเป็นจำนวนที่ข้าม
+        scan_counts["seen"] = seen_count
+        scan_counts["eligible"] = len(eligible_files)
+        scan_counts["eligible_bytes"] = sum(entry.size for entry in eligible_files)
+        scan_counts["skipped"] = seen_count - len(eligible_files)
+        return eligible_files
+
+    def _stream_source_entries(self, src, recursive=True):
+        """สแกนต้นทาง (รวมโฟลเดอร์ย่อยเมื่อ recursive=True) แบบ Generator โดยแปลงข้อผิดพลาดของดิสก์เป็น OperationCriticalError"""
+        try:
+            yield from _iter_source_files(src, recursive=recursive, metrics=self._metrics)
+        except (IOError, OSError) as e:
+            raise OperationCriticalError(f"ข้อผิดพลาดในการเข้าถึงดิสก์เมื่อแสดงรายการไฟล์ในโฟลเดอร์ต้นทาง '{src}': {e} หยุดการทำงาน")
+
+    def _filter_entries(self, entries, file_type, cutoff_timestamp, scan_counts):
+        """
+        กรองไฟล์ตามประเภทและอายุแบบ Generator โดยใช้ข้อมูล stat ที่ได้จากการสแกน
+        พร้อมอัปเดตจำนวนไฟล์ที่พบ/ข้าม/เข้าเกณฑ์ใน scan_counts
+        """
+        for entry in entries:
+            scan_counts["seen"] += 1
+
+            # กรองตามประเภทไฟล์
+            if file_type == "Excel" and not entry.name.lower().endswith(EXCEL_EXTENSIONS):
+                scan_counts["skipped"] += 1
+                self._log_action(entry.name, "skip", "ประเภทไฟล์ไม่ถูกต้อง", src=entry.path) # สถานะแปลแล้ว
+                continue
+
+            # กรองตามอายุ เปรียบเทียบ timestamp โดยตรงกับวันที่ตัดยอดที่คำนวณไว้
+            if cutoff_timestamp is not None and entry.mtime > cutoff_timestamp:
+                scan_counts["skipped"] += 1
+                modified_time = datetime.datetime.fromtimestamp(entry.mtime)
+                self._log_action(entry.name, "skip", f"ยังไม่เก่าพอ|แก้ไขเมื่อ:{modified_time.strftime('%Y-%m-%d %H:%M:%S')}", src=entry.path) # สถานะแปลแล้ว
+                continue
+
+            scan_counts["eligible"] += 1
+            scan_counts["eligible_bytes"] += entry.size # ใช้ขนาดจากการสแกน
+            yield entry
+        scan_counts["complete"] = True
+
+    def _pipeline_entries(self, entries):
+        """
+        รัน Generator ของการสแกน/กรองใน Thread แยก (Producer) และส่งไฟล์ที่เข้าเกณฑ์ผ่านคิวที่จำกัดขนาด
+        ลูปประมวลผล (Consumer) จึงเริ่มโอนย้ายได้ทันที ส่วน scan_counts ถูกอัปเดตโดย Thread สแกนระหว่างทำงาน
+        ข้อผิดพลาดของการสแกน (OperationCriticalError) จะถูกส่งต่อไปยังผู้เรียกเมื่อถึงลำดับในคิว
+        """
+        pipe = queue.Queue(maxsize=PIPELINE_QUEUE_MAX_FILES)
+        stop = threading.Event()
+        end_of_scan = object()
+
+        def put(item):
+            # รอที่ว่างในคิว แต่เลิกรอเมื่อผู้ใช้ยกเลิกหรือลูปประมวลผลหยุดแล้ว
+            while not stop.is_set():
+                try:
+                    pipe.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                for entry in entries:
+                    if not put(entry):
+                        return
+                put(end_of_scan)
+            except BaseException as e:
+                put(e)
+
+        scanner = threading.Thread(target=producer, name="scanner", daemon=True)
+        self._scan_pipeline = (stop, scanner)
+        scanner.start()
+        try:
+            while True:
+                item = pipe.get()
+                if item is end_of_scan:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # หยุดเฉพาะ Thread สแกนของ Generator นี้ (Generator อาจถูกปิดโดย Garbage Collector หลังรอบอื่นเริ่มแล้ว)
+            stop.set()
+            scanner.join()
+
+    def _close_scan_pipeline(self):
+        """หยุด Thread สแกนของโหมด Pipeline (หากยังทำงานอยู่) และรอให้จบ ก่อนเริ่มการทำงานรอบถัดไป"""
+        scan_pipeline = self._scan_pipeline
+        if scan_pipeline is None:
+            return
+        self._scan_pipeline = None
+        stop, scanner = scan_pipeline
+        stop.set()
+        scanner.join()
+
+    def _update_progress(self, current_idx, total_eligible_files, operation, elapsed_file, total_elapsed_time,
+                             current_file_size, processed_count, skipped_total_count, total_initial_files_in_src, total_size_to_process_bytes):
+        """คำนวณความคืบหน้า ความเร็ว และเวลาที่เหลือ แล้วรายงานผ่าน on_progress"""
+        if total_eligible_files is None:
+            # โหมดโฟลเดอร์ย่อย: ยังไม่ทราบจำนวนทั้งหมด ไม่คำนวณเปอร์เซ็นต์และเวลาที่เหลือ
+            progress = None
+        elif total_eligible_files == 0:
+            progress = 100
+        else:
+            # ความคืบหน้าพื้นฐานตามจำนวนที่ประมวลผลแล้ว ไม่ใช่ current_idx
+            progress = int((processed_count / total_eligible_files) * 100) 
+            # หากทราบขนาดรวม ใช้จำนวนไบต์ (รวมไฟล์ใหญ่ที่กำลังคัดลอก) เพื่อให้แถบเคลื่อนระหว่างไฟล์ใหญ่
+            if total_size_to_process_bytes > 0:
+                progress = max(progress, min(100, int(((self.total_bytes_processed + self._inflight_bytes) / total_size_to_process_bytes) * 100)))
+
+        # คำนวณความเร็ว (ไฟล์ต่อนาที) และเวลาที่เหลือ
+        files_per_minute = (processed_count / total_elapsed_time * 60) if total_elapsed_time > 0 else 0
+        
+        remaining_files = (total_eligible_files - processed_count) if total_eligible_files is not None else 0
+        
+        est_time_left_seconds = 0
+        if files_per_minute > 0:
+            est_time_left_seconds = (remaining_files / files_per_minute) * 60 # แปลงนาทีเป็นวินาที
+
+        hours, rem = divmod(est_time_left_seconds, 3600)
+        minutes, seconds = divmod(rem, 60)
+
+        # แปลงไบต์เป็นรูปแบบที่อ่านง่ายขึ้น (MB, GB)
+        def format_bytes(bytes_val):
+            if bytes_val < 1024:
+                return f"{bytes_val} B"
+            elif bytes_val < (1024 ** 2):
+                return f"{bytes_val / 1024:.2f} KB"
+            elif bytes_val < (1024 ** 3):
+                return f"{bytes_val / (1024 ** 2):.2f} MB"
+            else:
+                return f"{bytes_val / (1024 ** 3):.2f} GB"
+
+        processed_size_formatted = format_bytes(self.total_bytes_processed + self._inflight_bytes)
+        total_size_formatted = format_bytes(total_size_to_process_bytes)
+
+        # สร้างข้อความแสดงความคืบหน้า
+        if total_eligible_files is None:
+            operation_portion = f"📦 {operation.upper()} {processed_count:,} ไฟล์ ({processed_size_formatted}) | สแกนพบที่เข้าเกณฑ์: {total_size_formatted}"
+            eta_portion = f"⏳ ความเร็ว: {files_per_minute:,.2f} ไฟล์/นาที"
+        else:
+            operation_portion = f"📦 {operation.upper()} {processed_count:,}/{total_eligible_files:,} ไฟล์ ({processed_size_formatted}/{total_size_formatted})"
+            # ปรับปรุงข้อความ ETA ให้แสดง files_per_minute ชัดเจน
+            eta_portion = f"⏳ ประมาณการเวลาที่เหลือ: {int(hours)} ชม. {int(minutes)} น. {int(seconds)} ว. | ความเร็ว: {files_per_minute:,.2f} ไฟล์/นาที"
+        
+        # แสดงไฟล์ที่ถูกข้ามจากไฟล์เริ่มต้นทั้งหมด (ไฟล์ทั้งหมดในแหล่งที่มา ก่อนตัวกรองคุณสมบัติ)
+        skipped_portion = f"ข้ามไป: {skipped_total_count:,}/{total_initial_files_in_src:,} ไฟล์"
+
+        # แสดงความเร็วที่ถูกจำกัดในช่วงเวลานี้ (หากมี)
+        rate_limit = self._rate_limiter.current_limit() if self._rate_limiter is not None else None
+        if rate_limit is not None:
+            eta_portion += f" | 🚦 จำกัด {rate_limit / (1024 ** 2):,.1f} MB/s"
+
+        # รวมข้อความ
+        combined_msg = f"{skipped_portion} | {operation_portion} | {eta_portion}"
+
+        stats = {
+            "operation": operation,
+            "processed": processed_count,
+            "total": total_eligible_files,
+            "skipped": skipped_total_count,
+            "seen": total_initial_files_in_src,
+            "bytes_done": self.total_bytes_processed + self._inflight_bytes,
+            "bytes_total": total_size_to_process_bytes,
+            "files_per_minute": files_per_minute,
+            "eta_seconds": est_time_left_seconds if total_eligible_files is not None else None,
+            "rate_limit_mbps": rate_limit / (1024 ** 2) if rate_limit is not None else None,
+        }
+        self._report_progress(progress, combined_msg, mode="indeterminate" if progress is None else "determinate", stats=stats)
+
+    def _report_progress(self, value, text, mode="determinate", stats=None):
+        """ส่งความคืบหน้าไปยัง on_progress (หากมี)"""
+        if self._on_progress is not None:
+            if self.job_name is not None:
+                text = f"[{self.job_name}] {text}" if text else text
+                stats = {**stats, "job": self.job_name} if stats is not None else None
+            self._on_progress(value, text, mode, stats)
+
+    # --- Scheduling Functions (ฟังก์ชันการตั้งเวลา) ---
+    def ensure_last_run_file(self):
+        """ตรวจสอบและสร้าง last_run.json (หรือรายการของงานนี้ในไฟล์) ทันทีหากไม่มีอยู่ (เริ่มต้นด้วยวันที่ปัจจุบัน)"""
+        if self.job_name is None:
+            missing = not os.path.exists(LAST_RUN_FILE)
+        else:
+            missing = not self._get_last_run_date()
+        if missing:
+            # ใช้ LAST_RUN_FILE ตามที่กำหนดใน constants
+            self.log(f"ℹ️ ไม่พบวันที่รันล่าสุดใน {LAST_RUN_FILE} เริ่มต้นด้วยวันที่ปัจจุบัน", to_app_log=True, to_gui_log=True)
+            self._set_last_run_date(datetime.datetime.now().strftime("%Y-%m-%d"))
+
+    def _read_last_run_file(self):
+        """อ่าน last_run.json ทั้งไฟล์: {"last_run": วันที่ของการตั้งค่าระดับบนสุด, "jobs": {ชื่องาน: วันที่}}"""
+        if os.path.exists(LAST_RUN_FILE):
+            try:
+                with open(LAST_RUN_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    return data if isinstance(data, dict) else {}
+            except json.JSONDecodeError as e:
+                self.log(f"❌ ข้อผิดพลาดในการอ่านไฟล์วันที่รันล่าสุด {LAST_RUN_FILE}: {e}", to_app_log=True, to_gui_log=True, show_popup=True) 
+                return {}
+            except IOError as e:
+                self.log(f"❌ ข้อผิดพลาดในการอ่านไฟล์วันที่รันล่าสุด {LAST_RUN_FILE}: {e}", to_app_log=True, to_gui_log=True, show_popup=True) 
+                return {}
+        return {}
+
+    def _get_last_run_date(self):
+        """ดึงวันที่รัน Task ล่าสุด (ของงานนี้) จากไฟล์ JSON"""
+        data = self._read_last_run_file()
+        if self.job_name is None:
+            return data.get("last_run", "")
+        jobs = data.get("jobs")
+        return jobs.get(self.job_name, "") if isinstance(jobs, dict) else ""
+
+    def _set_last_run_date(self, date_str):
+        """บันทึกวันที่รัน Task ปัจจุบัน (ของงานนี้) ลงในไฟล์ JSON โดยคงวันที่ของงานอื่นไว้"""
+        try:
+            with _LAST_RUN_LOCK:
+                data = self._read_last_run_file()
+                if self.job_name is None:
+                    data["last_run"] = date_str
+                else:
+                    jobs = data.get("jobs")
+                    data["jobs"] = {**(jobs if isinstance(jobs, dict) else {}), self.job_name: date_str}
+                with open(LAST_RUN_FILE, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=4, ensure_ascii=False)
+            self.wake_scheduler() # กำหนดการถัดไปคำนวณจากวันที่รันล่าสุด
+        except IOError as e:
+            self.log(f"❌ ข้อผิดพลาดในการบันทึกไฟล์วันที่รันล่าสุด {LAST_RUN_FILE}: {e}", to_app_log=True, to_gui_log=True, show_popup=True) 
+
+    def _get_valid_datetime(self, year, month, day, time_obj):
+        """
+        Helper เพื่อสร้างอ็อบเจกต์ datetime จัดการวันเกินจำนวนวันของเดือน
+        จะถูกเรียกใช้ภายใน _should_schedule_run เพื่อจัดการกับวันที่ที่ไม่ถูกต้อง
+        เช่น วันที่ 31 ในเดือนกุมภาพันธ์ จะถูกปรับเป็นวันที่ 28 หรือ 29
+        """
+        from dateutil.relativedelta import relativedelta
+        # คำนวณวันสุดท้ายของเดือนนั้นๆ
+        last_day_of_month = (datetime.date(year, month, 1) + relativedelta(months=1) - datetime.timedelta(days=1)).day
+        # ใช้วันที่ที่เล็กกว่าระหว่าง auto_day และวันสุดท้ายของเดือน
+        valid_day = min(day, last_day_of_month)
+        return datetime.datetime(year, month, valid_day, time_obj.hour, time_obj.minute, 0, 0)
+
+    def should_schedule_run(self):
+        """
+        คำนวณว่าถึงเวลาที่ควรจะรัน Task อัตโนมัติแล้วหรือยัง
+        และคำนวณเวลาที่ควรจะรันครั้งถัดไป (อ่านไฟล์ตั้งค่า/last_run.json ใหม่ทุกครั้ง ผลถูกเก็บไว้ให้ next_run_info)
+        """
+        return self._describe_schedule(self._refresh_schedule())
+
+    def _refresh_schedule(self):
+        """คำนวณกำหนดการใหม่และเก็บผลไว้ให้ next_run_info คืนค่าผลของ _calculate_schedule"""
+        generation = self.schedule_signal.generation
+        stamp = self._schedule_files_stamp()
+        schedule = self._calculate_schedule()
+        with self._schedule_lock:
+            self._schedule_cache = (generation, stamp, schedule)
+        return schedule
+
+    def next_run_info(self):
+        """
+        คืนค่า (ถึงเวลาแล้วหรือไม่, เวลารันครั้งถัดไป, ข้อความ) จากผลที่คำนวณไว้ล่าสุด (สำหรับป้ายใน GUI)
+        คำนวณใหม่เฉพาะเมื่อยังไม่เคยคำนวณ Scheduler ถูกปลุก หรือไฟล์ตั้งค่า/last_run.json ถูกแก้ไข
+        """
+        with self._schedule_lock:
+            cache = self._schedule_cache
+        if cache is None or cache[0] != self.schedule_signal.generation or cache[1] != self._schedule_files_stamp():
+            return self.should_schedule_run()
+        return self._describe_schedule(cache[2])
+
+    def wake_scheduler(self):
+        """ปลุก Scheduler ให้คำนวณกำหนดการใหม่ทันที (การตั้งค่าเปลี่ยน หรือเริ่ม/จบการทำงาน)"""
+        self.schedule_signal.wake()
+
+    def _schedule_files_stamp(self):
+        """(mtime, ขนาด) ของไฟล์ตั้งค่าและ last_run.json ใช้ตรวจว่าไฟล์ถูกแก้ไขหลังการคำนวณกำหนดการหรือไม่"""
+        stamp = []
+        for path in (self.config_file, LAST_RUN_FILE):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _calculate_schedule(self):
+        """
+        คำนวณกำหนดการจากการตั้งค่าและวันที่รันล่าสุด
+        คืนค่า (run_now, เวลารันครั้งถัดไป, วันที่รันล่าสุด, แสดงเวลาที่เหลือหรือไม่, ข้อความข้อผิดพลาดหรือ None)
+        """
+        from dateutil.relativedelta import relativedelta
+        from settings import SettingsError
+        now = datetime.datetime.now()
+
+        try:
+            settings = self.get_settings()
+        except SettingsError as e:
+            # แจ้ง Popup ครั้งเดียวจนกว่าไฟล์ตั้งค่าจะถูกแก้ไข (Scheduler และป้ายใน GUI ตรวจสอบซ้ำเป็นระยะ)
+            config_stamp = self._schedule_files_stamp()[0]
+            show_popup = config_stamp != self._settings_error_stamp
+            self._settings_error_stamp = config_stamp
+            self.log(f"❌ ข้อผิดพลาด: การตั้งค่าไม่ถูกต้อง: {e} โปรดตรวจสอบการตั้งค่า", to_app_log=True, to_gui_log=True, show_popup=show_popup) 
+            # ตรวจสอบใหม่หลัง SCHEDULER_ERROR_RETRY_SEC (Scheduler ของงานรอจนถึงเวลานี้) แทนการวนตรวจทุกวินาที
+            retry_at = now + datetime.timedelta(seconds=SCHEDULER_ERROR_RETRY_SEC)
+            return False, retry_at, "", False, "❌ ข้อผิดพลาด: การตั้งค่ากำหนดการไม่ถูกต้อง"
+        self._settings_error_stamp = None
+        auto_day = settings.auto_day
+        auto_interval = settings.auto_interval
+        configured_auto_time_obj = settings.auto_time
+
+        last_run_str = self._get_last_run_date()
+        
+        last_run_dt_from_file = None 
+        if last_run_str:
+            try:
+                last_run_dt_from_file = datetime.datetime.strptime(last_run_str, "%Y-%m-%d").replace(
+                    hour=configured_auto_time_obj.hour, minute=configured_auto_time_obj.minute, second=0, microsecond=0
+                )
+            except ValueError:
+                self.log(f"❌ ข้อผิดพลาด: รูปแบบวันที่รันล่าสุดใน {LAST_RUN_FILE} ไม่ถูกต้อง: {last_run_str} กำลังละเว้นวันที่รันล่าสุดสำหรับการคำนวณ", to_app_log=True, to_gui_log=True, show_popup=True) 
+        
+        effective_last_run_dt = last_run_dt_from_file if last_run_dt_from_file else datetime.datetime(1900, 1, 1, 0, 0)
+
+        # --- การจัดการพิเศษสำหรับ auto_interval = 0 (รันทันทีสำหรับการทดสอบ/รันครั้งเดียวรายวัน) ---
+        if auto_interval == 0:
+            configured_time_today = now.replace(hour=configured_auto_time_obj.hour, minute=configured_auto_time_obj.minute, second=0, microsecond=0)
+            
+            if (effective_last_run_dt.date() < now.date() or effective_last_run_dt.year == 1900) and now >= configured_time_today:
+                return True, configured_time_today + datetime.timedelta(days=1), last_run_str, False, None
+            elif now < configured_time_today:
+                return False, configured_time_today, last_run_str, False, None
+            else: 
+                return False, configured_time_today + datetime.timedelta(days=1), last_run_str, False, None
+        
+        # --- การจัดกำหนดการรายเดือน (auto_interval > 0) ---
+        
+        current_candidate_dt = self._get_valid_datetime(now.year, now.month, auto_day, configured_auto_time_obj)
+        
+        while current_candidate_dt <= effective_last_run_dt:
+            current_candidate_dt += relativedelta(months=auto_interval)
+            current_candidate_dt = self._get_valid_datetime(
+                current_candidate_dt.year,
+                current_candidate_dt.month,
+                auto_day,
+                configured_auto_time_obj
+            )
+        
+        run_now = (now >= current_candidate_dt)
+        
+        if run_now:
+            next_scheduled_run_display = current_candidate_dt + relativedelta(months=auto_interval)
+            next_scheduled_run_display = self._get_valid_datetime(
+                next_scheduled_run_display.year,
+                next_scheduled_run_display.month,
+                auto_day,
+                configured_auto_time_obj
+            )
+        else:
+            next_scheduled_run_display = current_candidate_dt
+
+        return run_now, next_scheduled_run_display, last_run_str, True, None
+
+    def _describe_schedule(self, schedule):
+        """
+        สร้างผลลัพธ์ (run_now, เวลารันครั้งถัดไป, ข้อความ) จากกำหนดการที่คำนวณไว้ ณ เวลาปัจจุบัน
+        (เวลาที่เหลือคำนวณใหม่ทุกครั้ง ผลที่เก็บไว้จึงไม่ต้องอ่านไฟล์ใหม่)
+        """
+        from dateutil.relativedelta import relativedelta
+        run_now, next_scheduled_run_display, last_run_str, show_remaining, error_msg = schedule
+        if error_msg:
+            return run_now, next_scheduled_run_display, error_msg
+        now = datetime.datetime.now()
+        # ผลที่เก็บไว้ก่อนถึงเวลากำหนดการ: เมื่อเลยเวลาแล้วถือว่าถึงเวลา (Scheduler จะคำนวณใหม่เมื่อถูกปลุก)
+        run_now = run_now or now >= next_scheduled_run_display
+
+        remaining_time_str = ""
+        if show_remaining:
+            delta = relativedelta(next_scheduled_run_display, now)
+            months_remaining = delta.years * 12 + delta.months
+            days_remaining = delta.days
+            hours_remaining = delta.hours
+            minutes_remaining = delta.minutes
+
+            remaining_time_parts = []
+            if months_remaining > 0:
+                remaining_time_parts.append(f"{months_remaining} เดือน")
+            if days_remaining > 0:
+                remaining_time_parts.append(f"{days_remaining} วัน")
+            if hours_remaining > 0:
+                remaining_time_parts.append(f"{hours_remaining} ชั่วโมง")
+            if minutes_remaining > 0:
+                remaining_time_parts.append(f"{minutes_remaining} นาที")
+            
+            if remaining_time_parts:
+                remaining_time_str = "ในอีก " + ", ".join(remaining_time_parts)
+
+        last_run_info = f"รันล่าสุด: {last_run_str if last_run_str else 'ไม่เคย'}"
+        full_next_run_msg = f"{last_run_info} | กำหนดการถัดไป: {next_scheduled_run_display.strftime('%Y-%m-%d %H:%M')}{' | ' + remaining_time_str if remaining_time_str else ''}"
+        
+        return run_now, next_scheduled_run_display, full_next_run_msg
+
+    def _scheduled_job(self, on_due):
+        """
+        ตรวจสอบว่าถึงเวลาที่จะรัน Task อัตโนมัติแล้วหรือยัง หากถึงเวลาจะเรียก on_due(operation)
+        คืนค่าจำนวนวินาทีที่ Scheduler ควรรอก่อนตรวจสอบครั้งถัดไป (หากไม่ถูกปลุกก่อน)
+        """
+        self.log("Scheduler: กำลังตรวจสอบการทำงานตามกำหนดเวลา...", to_app_log=True, to_gui_log=True, show_popup=False) 
+        
+        # เพิ่มการตรวจสอบแฟล็ก is_task_running ก่อนพิจารณาการรัน
+        if self.is_task_running:
+            self.log("Scheduler: Task กำลังทำงานอยู่ กำลังข้ามการตรวจสอบเพื่อป้องกันการทำงานซ้ำซ้อน", to_app_log=True, to_gui_log=True, show_popup=False)
+            return SCHEDULER_MAX_SLEEP_SEC # ถูกปลุกเมื่องานจบ
+
+        schedule = self._refresh_schedule()
+        if schedule[4]:
+            # การตั้งค่าไม่ถูกต้อง: ตรวจสอบใหม่เป็นระยะ (หรือทันทีเมื่อบันทึกการตั้งค่าจาก GUI) แทนการวนตรวจทุกวินาที
+            return SCHEDULER_ERROR_RETRY_SEC
+        run_now, next_scheduled_run_display, next_run_info_msg = self._describe_schedule(schedule)
+        
+        if run_now:
+            auto_operation = self.get_settings().auto_operation
+            
+            self.log(f"✅ ถึงเวลากำหนดการแล้ว - กำลังเริ่มการโอนย้ายข้อมูล ({auto_operation.upper()})", to_app_log=True, to_gui_log=True, show_popup=False) 
+            on_due(auto_operation) 
+            return SCHEDULER_MAX_SLEEP_SEC # ถูกปลุกเมื่องานเริ่ม (บันทึกวันที่รันล่าสุด) และเมื่องานจบ
+        self.log(f"Scheduler: ยังไม่ถึงเวลากำหนดการทำงาน ครั้งถัดไป: {next_run_info_msg}", to_app_log=True, to_gui_log=True, show_popup=False) 
+        return seconds_until(next_scheduled_run_display)
+
+    def start_scheduler(self, on_due):
+        """
+        เริ่มต้น Thread ที่รอจนถึงเวลากำหนดการถัดไป แล้วเรียก on_due(operation) จาก Thread นี้
+        Thread จะถูกปลุกก่อนเวลาเมื่อบันทึกการตั้งค่า หรือเมื่องานเริ่ม/จบ (wake_scheduler)
+        """
+        def run_schedule_loop():
+            # ตรวจสอบครั้งแรกทันที (ข้อความและการเริ่มงานถูกส่งผ่าน Callback จึงไม่ต้องรอให้ GUI พร้อม)
+            while True:
+                generation = self.schedule_signal.generation
+                try:
+                    wait_sec = self._scheduled_job(on_due)
+                except Exception as e:
+                    self.log(f"❌ ข้อผิดพลาด: Scheduler Thread Error: {e}", to_app_log=True, to_gui_log=True, show_popup=True) 
+                    wait_sec = SCHEDULER_ERROR_RETRY_SEC
+                self.schedule_signal.wait(generation, wait_sec)
+
+        # เริ่ม Thread แบบ daemon เพื่อให้มันหยุดทำงานเมื่อโปรแกรมหลักปิด
+        threading.Thread(target=run_schedule_loop, daemon=True).start()
+        self.log("Scheduler: Thread scheduler พื้นหลังเริ่มทำงานแล้ว", to_app_log=True, to_gui_log=True, show_popup=False)
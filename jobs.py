@@ -0,0 +1,226 @@
+"""
+รันหลายงานโอนย้าย (jobs) พร้อมกัน โดยจำกัดจำนวนงานที่ใช้ดิสก์เดียวกันในเวลาเดียวกัน
+
+ตัวอย่างใน move_config.json:
+    "max_jobs_per_volume": 1,
+    "jobs": [
+        {"name": "PE-Line1", "source": "D:/PE/Line1", "dest": "F:/Archive/Line1", "auto_operation": "move", "auto_day": 1},
+        {"name": "PE-Line2", "source": "E:/PE/Line2", "dest": "G:/Archive/Line2", "file_type": "Excel", "auto_interval": 0}
+    ]
+แต่ละงานใช้การตั้งค่าระดับบนสุดเป็นค่าเริ่มต้น แล้วทับด้วยค่าของตนเอง (ต้นทาง/ปลายทาง ตัวกรอง การทำงาน กำหนดการ ฯลฯ)
+วันที่รันล่าสุดถูกเก็บแยกตามชื่องานใน last_run.json เมื่อมีรายการ jobs กำหนดการอัตโนมัติจะรันเฉพาะงานในรายการ
+
+งานหนึ่งงานใช้ดิสก์ต้นทางและดิสก์ปลายทาง และจะเริ่มได้เมื่อทุกดิสก์ที่ใช้มีงานกำลังทำงานน้อยกว่า max_jobs_per_volume
+งานที่ใช้ดิสก์คนละชุดจึงทำงานขนานกัน ส่วนงานที่ใช้ดิสก์ร่วมกันจะรอคิว แทนการอ่าน/เขียนสลับกันบนดิสก์เดียว
+"""
+import os
+import threading
+
+from engine import SCHEDULER_ERROR_RETRY_SEC, SCHEDULER_MAX_SLEEP_SEC, seconds_until
+from settings import SettingsError, merge_job, parse_settings
+
+# อักขระที่ใช้ในชื่อไฟล์ไม่ได้ (ชื่องานถูกใช้เป็นส่วนหนึ่งของชื่อไฟล์ Journal/ดัชนีของงาน)
+_INVALID_NAME_CHARS = frozenset('<>:"/\\|?*')
+
+
+def load_jobs(config):
+    """
+    ตรวจสอบรายการ jobs ในการตั้งค่าและคืนค่ารายการงาน (รายการว่างหากไม่ได้กำหนด)
+    ชื่องานซ้ำ/ว่าง หรือการตั้งค่าของงานใดไม่ถูกต้อง (ตรวจสอบด้วย settings.parse_settings) จะทำให้เกิด ValueError
+    """
+    jobs = config.get("jobs") or []
+    if not isinstance(jobs, list):
+        raise ValueError("jobs ต้องเป็นรายการ (list) ของงาน")
+    if jobs:
+        parse_settings(config) # ค่าระดับบนสุด (เช่น max_jobs_per_volume) ใช้ร่วมกับทุกงาน
+    names = set()
+    for job in jobs:
+        if not isinstance(job, dict):
+            raise ValueError(f"งาน {job!r} ต้องเป็น object ที่มี name, source และ dest")
+        name = job.get("name")
+        if not isinstance(name, str) or not name.strip() or name != name.strip():
+            raise ValueError(f"งาน {job!r} ต้องมี name ที่ไม่ว่างและไม่ขึ้นต้น/ลงท้ายด้วยช่องว่าง")
+        if any(ch in _INVALID_NAME_CHARS or ord(ch) < 32 for ch in name):
+            raise ValueError(f"ชื่องาน '{name}' ต้องไม่มีอักขระ <>:\"/\\|?*")
+        if name in names:
+            raise ValueError(f"ชื่องาน '{name}' ซ้ำกัน")
+        try:
+            parse_settings(merge_job(config, name))
+        except SettingsError as e:
+            raise ValueError(f"การตั้งค่าของงาน '{name}' ไม่ถูกต้อง: {e}")
+        names.add(name)
+    return jobs
+
+
+def volume_id(path):
+    """รหัสดิสก์ของ path (st_dev) ใช้โฟลเดอร์แม่ที่มีอยู่จริงเมื่อ path ยังไม่ถูกสร้าง"""
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return os.path.splitdrive(path)[0] or path
+            path = parent
+
+
+class JobRunner:
+    """
+    รันงานในรายการ jobs แต่ละงานใน Thread ของตนเอง (หนึ่ง TransferEngine ต่องาน) ปลอดภัยเมื่อเรียกจากหลาย Thread
+    engine คือ Engine ระดับบนสุด ใช้อ่านไฟล์ตั้งค่า บันทึก Log และสร้าง Engine ของแต่ละงาน (Callback เดียวกัน)
+    งานเดียวกันจะไม่ถูกเริ่มซ้อนขณะที่ยังรอคิวหรือกำลังทำงาน
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self._cond = threading.Condition()
+        self._engines = {} # ชื่องาน -> TransferEngine ของงาน
+        self._active = {} # ชื่องาน -> Thread ของงานที่รอคิวหรือกำลังทำงาน
+        self._cancel_requested = set() # งานที่ถูกยกเลิกระหว่างรอคิว
+        self._volume_jobs = {} # รหัสดิสก์ -> จำนวนงานที่กำลังใช้ดิสก์นั้น
+        self.results = {} # ชื่องาน -> ผลการทำงานล่าสุด (True = สำเร็จ)
+
+    @property
+    def is_running(self):
+        """มีงานที่รอคิวหรือกำลังทำงานอยู่หรือไม่"""
+        with self._cond:
+            return bool(self._active)
+
+    def job_names(self):
+        """ชื่องานทั้งหมดในไฟล์ตั้งค่า (ValueError หากรายการ jobs ไม่ถูกต้อง)"""
+        return [job["name"] for job in load_jobs(self.engine.load_settings())]
+
+    def engine_for(self, name):
+        """Engine ของงาน name (สร้างครั้งแรกที่ใช้ และใช้ซ้ำเพื่อคงสถานะการทำงานของงานนั้น)"""
+        with self._cond:
+            if name not in self._engines:
+                self._engines[name] = self.engine.for_job(name)
+            return self._engines[name]
+
+    def start_job(self, name, operation=None):
+        """
+        เริ่มงาน name ใน Thread แยก (รอคิวดิสก์ก่อนหากจำเป็น) operation เป็น None หมายถึงใช้ auto_operation ของงาน
+        คืนค่า False หากงานนี้รอคิวหรือกำลังทำงานอยู่แล้ว หรืออ่านการตั้งค่าของงานไม่ได้
+        """
+        job_engine = self.engine_for(name)
+        try:
+            settings = job_engine.get_settings()
+            limit = self.engine.get_settings().max_jobs_per_volume
+        except SettingsError as e:
+            job_engine.log(f"❌ การตั้งค่าไม่ถูกต้อง ไม่เริ่มงาน: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+            return False
+        operation = operation or settings.auto_operation
+        volumes = {volume_id(settings.source)}
+        if operation != "delete":
+            volumes.add(volume_id(settings.dest))
+        with self._cond:
+            if name in self._active:
+                self.engine.log(f"⚠️ งาน '{name}' กำลังทำงานหรือรอคิวอยู่แล้ว ไม่รับคำขอใหม่", to_app_log=True, to_gui_log=True, show_popup=False)
+                return False
+            thread = threading.Thread(target=self._run_job, args=(name, job_engine, operation, settings, volumes, limit), daemon=True)
+            self._active[name] = thread
+        thread.start()
+        return True
+
+    def _run_job(self, name, job_engine, operation, settings, volumes, limit):
+        success = False
+        try:
+            with self._cond:
+                if any(self._volume_jobs.get(volume, 0) >= limit for volume in volumes):
+                    job_engine.log(f"⏳ รอคิวดิสก์: มีงานอื่นใช้ดิสก์ต้นทาง/ปลายทางเดียวกันครบ {limit} งานแล้ว", to_app_log=True, to_gui_log=True, show_popup=False)
+                while name not in self._cancel_requested and any(self._volume_jobs.get(volume, 0) >= limit for volume in volumes):
+                    self._cond.wait()
+                if name in self._cancel_requested:
+                    job_engine.log("⛔ งานถูกยกเลิกระหว่างรอคิว", to_app_log=True, to_gui_log=True, show_popup=False)
+                    return
+                for volume in volumes:
+                    self._volume_jobs[volume] = self._volume_jobs.get(volume, 0) + 1
+            try:
+                success = job_engine.run(operation, settings) # ใช้ Snapshot เดียวกับที่ใช้เลือกดิสก์
+            finally:
+                with self._cond:
+                    for volume in volumes:
+                        self._volume_jobs[volume] -= 1
+                        if not self._volume_jobs[volume]:
+                            del self._volume_jobs[volume]
+                    self._cond.notify_all()
+        except Exception as e:
+            job_engine.log(f"❌ ข้อผิดพลาดที่ไม่คาดคิดของงาน: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+        finally:
+            job_engine.flush_logs()
+            with self._cond:
+                self.results[name] = success
+                self._active.pop(name, None)
+                self._cancel_requested.discard(name)
+                self._cond.notify_all()
+            self.engine.wake_scheduler() # งานนี้ตรวจกำหนดการได้อีกครั้ง
+
+    def run_jobs(self, names=None, operation=None):
+        """เริ่มงานตามรายชื่อ (ทุกงานหาก names เป็น None) ให้ทำงานพร้อมกันตามขีดจำกัดดิสก์ คืนค่ารายชื่องานที่เริ่มได้"""
+        all_names = self.job_names()
+        unknown = [name for name in names or () if name not in all_names]
+        if unknown:
+            raise ValueError(f"ไม่พบงาน {', '.join(unknown)} ในไฟล์ตั้งค่า")
+        return [name for name in (names or all_names) if self.start_job(name, operation)]
+
+    def wait(self, timeout=None):
+        """รอจนกว่าทุกงานจะสิ้นสุด คืนค่า False หากหมดเวลาก่อน"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._active, timeout)
+
+    def cancel(self):
+        """ยกเลิกทุกงาน: งานที่กำลังทำงานหยุดที่ไฟล์/ก้อนข้อมูลถัดไป งานที่รอคิวจะไม่ถูกเริ่ม"""
+        with self._cond:
+            names = list(self._active)
+            self._cancel_requested.update(names)
+            self._cond.notify_all()
+        for name in names:
+            job_engine = self.engine_for(name)
+            if job_engine.is_task_running:
+                job_engine.cancel()
+
+    def next_runs(self):
+        """คืนค่ารายการ (ชื่องาน, ถึงเวลาแล้วหรือไม่, เวลารันครั้งถัดไป, ข้อความ) ของทุกงาน (จากกำหนดการที่คำนวณเก็บไว้)"""
+        return [(name, *self.engine_for(name).next_run_info()) for name in self.job_names()]
+
+    def check_schedule(self):
+        """
+        เริ่มงานที่ถึงเวลากำหนดการแล้ว (ข้ามงานที่รอคิวหรือกำลังทำงานอยู่)
+        คืนค่าจำนวนวินาทีจนถึงกำหนดการถัดไปที่เร็วที่สุด (งานที่เริ่มหรือจบจะปลุก Scheduler เอง)
+        """
+        wait_sec = SCHEDULER_MAX_SLEEP_SEC
+        for name in self.job_names():
+            with self._cond:
+                if name in self._active:
+                    continue
+            job_engine = self.engine_for(name)
+            run_now, next_run, next_run_info_msg = job_engine.should_schedule_run()
+            if run_now:
+                job_engine.log("✅ ถึงเวลากำหนดการของงานแล้ว - กำลังเริ่มการโอนย้ายข้อมูล", to_app_log=True, to_gui_log=True, show_popup=False)
+                self.start_job(name)
+            else:
+                job_engine.log(f"Scheduler: ยังไม่ถึงเวลากำหนดการทำงาน ครั้งถัดไป: {next_run_info_msg}", to_app_log=True, to_gui_log=False, show_popup=False)
+                wait_sec = min(wait_sec, seconds_until(next_run))
+        return wait_sec
+
+    def start_scheduler(self):
+        """
+        เริ่ม Thread ที่รอจนถึงกำหนดการถัดไปที่เร็วที่สุดของทุกงาน (เริ่มวันที่รันล่าสุดของงานใหม่เป็นวันนี้)
+        Thread จะถูกปลุกก่อนเวลาเมื่อบันทึกการตั้งค่า หรือเมื่องานใดเริ่ม/จบ
+        """
+        for name in self.job_names():
+            self.engine_for(name).ensure_last_run_file()
+        signal = self.engine.schedule_signal
+
+        def run_schedule_loop():
+            while True:
+                generation = signal.generation
+                try:
+                    wait_sec = self.check_schedule()
+                except Exception as e:
+                    self.engine.log(f"❌ ข้อผิดพลาด: Job Scheduler Thread Error: {e}", to_app_log=True, to_gui_log=True, show_popup=True)
+                    wait_sec = SCHEDULER_ERROR_RETRY_SEC
+                signal.wait(generation, wait_sec)
+
+        threading.Thread(target=run_schedule_loop, daemon=True).start()
+        self.engine.log("Scheduler: Thread scheduler ของงานทั้งหมดเริ่มทำงานแล้ว", to_app_log=True, to_gui_log=True, show_popup=False)
@@ -0,0 +1,140 @@
+"""
+จำกัดความเร็วการโอนย้ายไฟล์ (MB/s) ด้วย Token Bucket พร้อมโปรไฟล์ตามช่วงเวลาของวัน
+
+ตัวอย่างใน move_config.json:
+    "rate_limit_mbps": 20,
+    "rate_limit_windows": [
+        {"start": "08:00", "end": "17:00", "mbps": 5, "weekdays": [0, 1, 2, 3, 4]},
+        {"start": "22:00", "end": "06:00", "mbps": 0}
+    ]
+rate_limit_mbps คือค่าเริ่มต้นเมื่อไม่อยู่ในช่วงเวลาใด ช่วงเวลาแรกที่ตรงกับเวลาปัจจุบันจะถูกใช้
+mbps เป็น 0 หมายถึงไม่จำกัด ช่วงเวลาที่ end น้อยกว่า start คือช่วงข้ามเที่ยงคืน
+weekdays (ไม่บังคับ) คือวันที่ใช้ช่วงเวลานั้น 0 = จันทร์ ... 6 = อาทิตย์ (ตามวันที่เริ่มช่วงเวลา)
+"""
+import datetime
+import threading
+import time
+
+MB = 1024 * 1024
+# ปริมาณข้อมูลที่ส่งต่อเนื่องได้โดยไม่ต้องรอ (เป็นวินาทีของอัตราปัจจุบัน) และขนาดก้อนคัดลอกสูงสุดเมื่อจำกัดความเร็ว
+RATE_LIMIT_BURST_SEC = 1.0
+RATE_LIMIT_CHUNK_SEC = 0.25
+# ตรวจสอบการยกเลิกระหว่างรอ Token อย่างน้อยทุกช่วงเวลานี้ (วินาที)
+RATE_LIMIT_MAX_SLEEP_SEC = 0.25
+
+
+def _parse_hhmm(value):
+    """แปลง 'HH:MM' เป็นจำนวนนาทีตั้งแต่เที่ยงคืน"""
+    try:
+        parsed = datetime.datetime.strptime(str(value), "%H:%M")
+    except ValueError:
+        raise ValueError(f"เวลา '{value}' ต้องอยู่ในรูปแบบ HH:MM")
+    return parsed.hour * 60 + parsed.minute
+
+
+def _parse_mbps(value):
+    """แปลงค่า MB/s เป็นไบต์ต่อวินาที (None = ไม่จำกัด)"""
+    try:
+        mbps = float(value or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"ความเร็ว '{value}' ต้องเป็นตัวเลข (MB/s)")
+    if mbps < 0:
+        raise ValueError(f"ความเร็ว '{value}' ต้องไม่ติดลบ")
+    return mbps * MB if mbps > 0 else None
+
+
+class RateLimiter:
+    """
+    Token Bucket ที่ใช้ร่วมกันโดยทุก Worker Thread ของรอบการทำงาน (จำกัดความเร็วรวม)
+    ผู้คัดลอกเรียก acquire(nbytes) หลังเขียนแต่ละก้อน หาก Token ไม่พอจะรอจนกว่าจะถึงอัตราที่กำหนด
+    ค่าที่ไม่ถูกต้องในการตั้งค่าจะทำให้เกิด ValueError ตั้งแต่สร้างอ็อบเจกต์
+    """
+    def __init__(self, default_mbps=0, windows=(), now=datetime.datetime.now):
+        self._default_rate = _parse_mbps(default_mbps)
+        self._windows = []
+        for window in windows or ():
+            if not isinstance(window, dict):
+                raise ValueError(f"ช่วงเวลา {window!r} ต้องเป็น object ที่มี start, end และ mbps")
+            weekdays = window.get("weekdays")
+            if weekdays is not None and not all(isinstance(day, int) and 0 <= day <= 6 for day in weekdays):
+                raise ValueError(f"weekdays {weekdays!r} ต้องเป็นรายการตัวเลข 0-6")
+            self._windows.append((_parse_hhmm(window.get("start")), _parse_hhmm(window.get("end")),
+                                  _parse_mbps(window.get("mbps")), frozenset(weekdays) if weekdays is not None else None))
+        self._now = now
+        self._lock = threading.Lock()
+        self._rate = None
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._rate_checked_at = None # ตรวจสอบโปรไฟล์ตามช่วงเวลาไม่เกินทุก 1 วินาที
+
+    @property
+    def enabled(self):
+        """มีการจำกัดความเร็วในช่วงเวลาใดช่วงเวลาหนึ่งหรือไม่"""
+        return self._default_rate is not None or any(rate is not None for _, _, rate, _ in self._windows)
+
+    def describe(self):
+        """ข้อความสรุปการตั้งค่าสำหรับ Log"""
+        def fmt(rate):
+            return "ไม่จำกัด" if rate is None else f"{rate / MB:g} MB/s"
+        parts = [f"ค่าเริ่มต้น {fmt(self._default_rate)}"]
+        for start, end, rate, weekdays in self._windows:
+            days = f" (วัน {','.join(str(day) for day in sorted(weekdays))})" if weekdays is not None else ""
+            parts.append(f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}{days} {fmt(rate)}")
+        return ", ".join(parts)
+
+    def _rate_at(self, now):
+        minute = now.hour * 60 + now.minute
+        for start, end, rate, weekdays in self._windows:
+            if start <= end:
+                inside = start <= minute < end
+                start_day = now.weekday()
+            else:
+                # ช่วงข้ามเที่ยงคืน: หลังเที่ยงคืนนับเป็นช่วงของวันก่อนหน้า
+                inside = minute >= start or minute < end
+                start_day = now.weekday() if minute >= start else (now.weekday() - 1) % 7
+            if inside and (weekdays is None or start_day in weekdays):
+                return rate
+        return self._default_rate
+
+    def current_limit(self):
+        """อัตราที่ใช้อยู่ในขณะนี้ (ไบต์ต่อวินาที) หรือ None หากไม่จำกัด"""
+        with self._lock:
+            return self._update_rate_locked(time.monotonic())
+
+    def _update_rate_locked(self, mono_now):
+        if self._rate_checked_at is None or mono_now - self._rate_checked_at >= 1.0:
+            self._rate_checked_at = mono_now
+            rate = self._rate_at(self._now())
+            if rate != self._rate:
+                # เปลี่ยนช่วงเวลา: เริ่ม Bucket ใหม่ตามอัตราใหม่
+                self._rate = rate
+                self._tokens = 0.0 if rate is None else min(self._tokens, rate * RATE_LIMIT_BURST_SEC)
+                self._last_refill = mono_now
+        return self._rate
+
+    def chunk_size(self, buffer_size):
+        """ขนาดก้อนคัดลอกที่เหมาะกับอัตราปัจจุบัน (ก้อนเล็กลงเมื่อจำกัดความเร็วต่ำ เพื่อให้การส่งข้อมูลสม่ำเสมอ)"""
+        rate = self.current_limit()
+        if rate is None:
+            return buffer_size
+        return max(64 * 1024, min(buffer_size, int(rate * RATE_LIMIT_CHUNK_SEC)))
+
+    def acquire(self, nbytes, should_cancel=None):
+        """
+        ใช้ Token จำนวน nbytes และรอหากเกินอัตราที่กำหนด (Token ติดลบได้ ก้อนที่ใหญ่กว่า Bucket จึงไม่ค้าง)
+        คืนค่าทันทีเมื่อ should_cancel() เป็นจริง ผู้เรียกจะตรวจพบการยกเลิกเอง
+        """
+        with self._lock:
+            mono_now = time.monotonic()
+            rate = self._update_rate_locked(mono_now)
+            if rate is None:
+                return
+            self._tokens = min(rate * RATE_LIMIT_BURST_SEC, self._tokens + (mono_now - self._last_refill) * rate)
+            self._last_refill = mono_now
+            self._tokens -= nbytes
+            wait_until = mono_now + (-self._tokens / rate if self._tokens < 0 else 0.0)
+        while True:
+            remaining = wait_until - time.monotonic()
+            if remaining <= 0 or (should_cancel and should_cancel()):
+                return
+            time.sleep(min(remaining, RATE_LIMIT_MAX_SLEEP_SEC))
@@ -0,0 +1,181 @@
+"""
+ตัวชี้วัดของรอบการทำงาน: เวลาที่ใช้ในแต่ละขั้นตอน ตัวนับไฟล์/ไบต์ และ Histogram ของเวลาคัดลอกต่อไฟล์
+
+เมื่อจบแต่ละรอบ ตัวชี้วัดถูกเขียนเป็น JSON (run_metrics.json ข้างไฟล์ตั้งค่า) และเป็นไฟล์ .prom
+สำหรับ textfile collector ของ node_exporter เมื่อกำหนด metrics_textfile_dir ในไฟล์ตั้งค่า
+เวลาของขั้นตอนเป็นผลรวมจากทุก Worker Thread (ในโหมดขนานจึงมากกว่าเวลาจริงของรอบได้)
+"""
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = "run_metrics.json"
+PROMETHEUS_FILE = "auto_data_transfer.prom"
+# ขั้นตอนที่จับเวลา: listing (อ่านรายการไฟล์/ค้นหาในดัชนี), stat, copy, rename (ย้ายในไดรฟ์เดียวกัน),
+# verify (อ่านปลายทางเพื่อตรวจสอบ Hash), delete (ลบต้นฉบับ) และ logging (เวลาที่ตัวเขียน Log ใช้เขียนไฟล์)
+PHASES = ("listing", "stat", "copy", "rename", "verify", "delete", "logging")
+# ขอบบนของช่วง Histogram เวลาคัดลอกต่อไฟล์ (วินาที)
+COPY_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+_PROMETHEUS_PREFIX = "auto_data_transfer"
+
+
+def metrics_path(config_file):
+    """ตำแหน่งไฟล์ JSON ของตัวชี้วัดรอบล่าสุด (อยู่ในโฟลเดอร์เดียวกับไฟล์ตั้งค่า)"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), METRICS_FILE)
+
+
+def _write_atomic(path, text):
+    """เขียนไฟล์ชั่วคราวแล้วแทนที่ ผู้อ่าน (เช่น node_exporter) จึงไม่เห็นไฟล์ที่เขียนไม่ครบ"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value):
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class RunMetrics:
+    """
+    ตัวชี้วัดของรอบการทำงานหนึ่งรอบ ปลอดภัยเมื่อเรียกจากหลาย Worker Thread
+    phase() จับเวลาขั้นตอน, count() เพิ่มตัวนับ และ record_copy() บันทึกเวลาคัดลอกของไฟล์ลง Histogram
+    """
+    def __init__(self, operation, job_name=None, clock=time.perf_counter):
+        self.operation = operation
+        self.job_name = job_name
+        self.status = None # success, cancelled หรือ failed (กำหนดเมื่อจบรอบ)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self._phase_calls = dict.fromkeys(PHASES, 0)
+        self._counters = {}
+        self._copy_buckets = [0] * len(COPY_SECONDS_BUCKETS) # จำนวนต่อช่วง (ยังไม่สะสม)
+        self._copy_sum = 0.0
+        self._copy_count = 0
+        self.started_at = datetime.datetime.now()
+        self._started = clock()
+        self.finished_at = None
+        self.duration_sec = None
+
+    @contextmanager
+    def phase(self, name):
+        """จับเวลาบล็อกโค้ดเป็นส่วนหนึ่งของขั้นตอน name (นับเฉพาะเมื่อบล็อกทำงานจบโดยไม่เกิดข้อผิดพลาด)"""
+        started = self._clock()
+        yield
+        self.add_time(name, self._clock() - started)
+
+    def add_time(self, name, seconds, calls=1):
+        """เพิ่มเวลาที่วัดได้เองให้ขั้นตอน name"""
+        with self._lock:
+            self._phase_seconds[name] = self._phase_seconds.get(name, 0.0) + seconds
+            self._phase_calls[name] = self._phase_calls.get(name, 0) + calls
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set_counter(self, name, value):
+        with self._lock:
+            self._counters[name] = value
+
+    def record_copy(self, seconds, nbytes):
+        """บันทึกการคัดลอกไฟล์หนึ่งไฟล์: เวลาขั้นตอน copy, Histogram และตัวนับไฟล์/ไบต์ที่คัดลอก"""
+        bucket = len(COPY_SECONDS_BUCKETS)
+        for i, upper in enumerate(COPY_SECONDS_BUCKETS):
+            if seconds <= upper:
+                bucket = i
+                break
+        with self._lock:
+            self._phase_seconds["copy"] += seconds
+            self._phase_calls["copy"] += 1
+            if bucket < len(COPY_SECONDS_BUCKETS):
+                self._copy_buckets[bucket] += 1
+            self._copy_sum += seconds
+            self._copy_count += 1
+            self._counters["files_copied"] = self._counters.get("files_copied", 0) + 1
+            self._counters["bytes_copied"] = self._counters.get("bytes_copied", 0) + nbytes
+
+    def finish(self, status):
+        """บันทึกผลและเวลาสิ้นสุดของรอบ"""
+        self.status = status
+        self.finished_at = datetime.datetime.now()
+        self.duration_sec = self._clock() - self._started
+
+    def _cumulative_buckets(self):
+        cumulative = []
+        total = 0
+        for upper, n in zip(COPY_SECONDS_BUCKETS, self._copy_buckets):
+            total += n
+            cumulative.append((upper, total))
+        cumulative.append((float("inf"), self._copy_count))
+        return cumulative
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job": self.job_name,
+                "operation": self.operation,
+                "status": self.status,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+                "duration_sec": round(self.duration_sec, 6) if self.duration_sec is not None else None,
+                "phases": {name: {"seconds": round(self._phase_seconds[name], 6), "calls": self._phase_calls[name]}
+                           for name in self._phase_seconds},
+                "counters": dict(sorted(self._counters.items())),
+                "copy_seconds": {
+                    "buckets": [["+Inf" if upper == float("inf") else upper, n] for upper, n in self._cumulative_buckets()],
+                    "sum": round(self._copy_sum, 6),
+                    "count": self._copy_count,
+                },
+            }
+
+    def to_prometheus(self):
+        """ข้อความรูปแบบ Prometheus text exposition (ค่าของรอบล่าสุด จึงเป็น gauge ยกเว้น Histogram)"""
+        base = f'transfer_job="{_label_value(self.job_name or "")}",operation="{_label_value(self.operation)}"'
+        p = _PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = base + "".join(f',{key}="{_label_value(val)}"' for key, val in labels)
+                lines.append(f"{p}_{name}{suffix}{{{label_text}}} {_format_number(value)}")
+
+        with self._lock:
+            metric("last_run_success", "gauge", "1 if the last run finished successfully, 0 if it failed or was cancelled.",
+                   [("", (("status", self.status or ""),), int(self.status == "success"))])
+            metric("last_run_end_timestamp_seconds", "gauge", "Unix time the last run finished.",
+                   [("", (), (self.finished_at or datetime.datetime.now()).timestamp())])
+            metric("last_run_duration_seconds", "gauge", "Wall-clock duration of the last run.",
+                   [("", (), self.duration_sec or 0.0)])
+            metric("last_run_phase_seconds", "gauge", "Time spent per phase in the last run, summed over worker threads.",
+                   [("", (("phase", name),), seconds) for name, seconds in self._phase_seconds.items()])
+            metric("last_run_phase_calls", "gauge", "Number of timed operations per phase in the last run.",
+                   [("", (("phase", name),), calls) for name, calls in self._phase_calls.items()])
+            metric("last_run_files", "gauge", "File counters of the last run.",
+                   [("", (("kind", name[len("files_"):]),), value) for name, value in sorted(self._counters.items()) if name.startswith("files_")])
+            metric("last_run_bytes", "gauge", "Byte counters of the last run.",
+                   [("", (("kind", name[len("bytes_"):]),), value) for name, value in sorted(self._counters.items()) if name.startswith("bytes_")])
+            metric("last_run_copy_seconds", "histogram", "Per-file copy time in the last run.",
+                   [("_bucket", (("le", _format_number(upper)),), n) for upper, n in self._cumulative_buckets()]
+                   + [("_sum", (), self._copy_sum), ("_count", (), self._copy_count)])
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.to_prometheus())
@@ -0,0 +1,124 @@
+"""
+โปรไฟล์การทำงานทีละรอบ (เปิดด้วย "profile_runs": true ในไฟล์ตั้งค่า หรือ cli.py --profile)
+
+แต่ละรอบเขียนไฟล์ไว้ในโฟลเดอร์ profiles ข้างไฟล์ Log:
+    run_<วันเวลา>_<การทำงาน>[_<งาน>].prof      ผล cProfile (เปิดด้วย pstats หรือ snakeviz)
+    run_<วันเวลา>_<การทำงาน>[_<งาน>]_top.txt   ฟังก์ชันที่ใช้เวลามากที่สุด profile_top_n อันดับ
+เมื่อติดตั้ง pyinstrument และ profiler เป็น auto จะใช้การสุ่มตัวอย่าง (Sampling) แทน ซึ่งมี Overhead คงที่ไม่ขึ้นกับจำนวนการเรียกฟังก์ชัน
+จึงเปิดทิ้งไว้ถาวรได้ (บันทึกเป็น .pyisession แทน .prof) เก็บไว้เฉพาะ profile_keep รอบล่าสุด
+ทั้งสองแบบวัดเฉพาะ Thread ที่รันการทำงาน เมื่อ transfer_workers > 1 งานของ Worker จะปรากฏเป็นเวลารอผลลัพธ์
+"""
+import cProfile
+import datetime
+import io
+import os
+import pstats
+
+PROFILE_DIR = "profiles"
+# ช่วงเวลาสุ่มตัวอย่างของ pyinstrument (วินาที)
+SAMPLING_INTERVAL_SEC = 0.005
+_PROFILE_PREFIX = "run_"
+_PROFILE_SUFFIXES = ("_top.txt", ".prof", ".pyisession")
+
+
+def profile_dir(log_file):
+    """โฟลเดอร์ของไฟล์โปรไฟล์ (อยู่ข้างไฟล์ Log)"""
+    return os.path.join(os.path.dirname(os.path.abspath(log_file)), PROFILE_DIR)
+
+
+def _sampling_profiler():
+    """คืนค่าคลาส Profiler ของ pyinstrument หรือ None หากไม่ได้ติดตั้ง"""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler
+
+
+def _run_stem(name):
+    for suffix in _PROFILE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+def prune_profiles(directory, keep):
+    """ลบไฟล์โปรไฟล์ของรอบเก่าให้เหลือ keep รอบล่าสุด คืนค่าจำนวนไฟล์ที่ลบ"""
+    runs = {}
+    for name in os.listdir(directory):
+        stem = _run_stem(name) if name.startswith(_PROFILE_PREFIX) else None
+        if stem is not None:
+            runs.setdefault(stem, []).append(name)
+    removed = 0
+    # ชื่อขึ้นต้นด้วยวันเวลา จึงเรียงตามชื่อได้ลำดับเวลา
+    for stem in sorted(runs)[:-keep] if keep > 0 else sorted(runs):
+        for name in runs[stem]:
+            try:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+class RunProfiler:
+    """
+    โปรไฟล์หนึ่งรอบการทำงาน: start() ก่อนเริ่ม และ stop() เมื่อจบ (ใน Thread เดียวกัน)
+    stop() เขียนไฟล์ผลลัพธ์ ลบรอบเก่าตาม keep และคืนค่ารายการไฟล์ที่เขียน ข้อผิดพลาดของดิสก์ (OSError) ถูกส่งต่อให้ผู้เรียก
+    """
+    def __init__(self, directory, label, kind="auto", keep=20, top_n=30):
+        self.directory = directory
+        self.label = label
+        self.keep = keep
+        self.top_n = top_n
+        sampler = _sampling_profiler() if kind in ("auto", "pyinstrument") else None
+        self.kind = "pyinstrument" if sampler is not None else "cprofile"
+        self.fallback = kind == "pyinstrument" and sampler is None # ต้องการ pyinstrument แต่ไม่ได้ติดตั้ง
+        self._profiler = sampler(interval=SAMPLING_INTERVAL_SEC) if sampler is not None else cProfile.Profile()
+        self._started_at = None
+
+    def start(self):
+        self._started_at = datetime.datetime.now()
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, f"{_PROFILE_PREFIX}{self._started_at.strftime('%Y%m%d_%H%M%S')}_{self.label}")
+        # สองรอบที่เริ่มในวินาทีเดียวกัน (เช่น รันซ้ำทันที) ไม่เขียนทับกัน
+        base, n = stem, 1
+        while any(os.path.exists(base + suffix) for suffix in _PROFILE_SUFFIXES):
+            n += 1
+            base = f"{stem}_{n}"
+        stem = base
+
+        elapsed = (datetime.datetime.now() - self._started_at).total_seconds()
+        header = f"{self.label} เริ่ม {self._started_at.isoformat(timespec='seconds')} ใช้เวลา {elapsed:.1f} วินาที ({self.kind})\n\n"
+        if self.kind == "pyinstrument":
+            data_path = stem + ".pyisession"
+            self._profiler.last_session.save(data_path)
+            summary = self._profiler.output_text(unicode=True, color=False)
+        else:
+            data_path = stem + ".prof"
+            self._profiler.dump_stats(data_path)
+            summary = self._cprofile_summary()
+        summary_path = stem + "_top.txt"
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(header + summary)
+        prune_profiles(self.directory, self.keep)
+        return [data_path, summary_path]
+
+    def _cprofile_summary(self):
+        """top_n ฟังก์ชันเรียงตามเวลาสะสม (cumulative) และเวลาภายในฟังก์ชันเอง (tottime)"""
+        out = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=out).strip_dirs()
+        for sort_key in ("cumulative", "tottime"):
+            out.write(f"=== เรียงตาม {sort_key} ===\n")
+            stats.sort_stats(sort_key).print_stats(self.top_n)
+        return out.getvalue()
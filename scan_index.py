@@ -0,0 +1,187 @@
+"""
+ดัชนีการสแกนแบบถาวร (SQLite) สำหรับสแกนโฟลเดอร์ต้นทางแบบเพิ่มเฉพาะส่วนที่เปลี่ยน
+
+เก็บเส้นทาง ขนาด เวลาแก้ไข และการกระทำล่าสุดของทุกไฟล์ที่พบ พร้อมเวลาแก้ไขของแต่ละโฟลเดอร์
+โฟลเดอร์ที่เวลาแก้ไข (mtime) ไม่เปลี่ยนตั้งแต่การสแกนครั้งก่อน มีรายชื่อไฟล์/โฟลเดอร์ย่อยเหมือนเดิม
+จึงไม่ต้องอ่านรายการไฟล์ใหม่ (แต่ยังต้องตรวจโฟลเดอร์ย่อยทีละโฟลเดอร์ เพราะการเปลี่ยนแปลงภายในโฟลเดอร์ย่อยไม่ทำให้ mtime ของโฟลเดอร์แม่เปลี่ยน)
+
+การแก้ไขเนื้อหาไฟล์ไม่ทำให้ mtime ของโฟลเดอร์เปลี่ยน ข้อมูลในดัชนีจึงอาจเก่ากว่าไฟล์จริง
+แต่การแก้ไขทำให้ไฟล์ "ใหม่ขึ้น" เท่านั้น ผู้เรียกจึงต้อง stat เฉพาะไฟล์ที่ดัชนีระบุว่าเข้าเกณฑ์ (verify) ก่อนประมวลผล
+"""
+import os
+import sqlite3
+import time
+
+from engine import FileEntry
+
+SCAN_INDEX_FILE = "scan_index.sqlite3"
+# โฟลเดอร์ที่ถูกแก้ไขภายในช่วงเวลานี้ก่อนการสแกน จะไม่ถูกเชื่อถือในการสแกนครั้งถัดไป
+# (ระบบไฟล์บางชนิดเก็บ mtime ละเอียดเพียง 1-2 วินาที ไฟล์ที่เพิ่มในวินาทีเดียวกันหลังการสแกนจะไม่ทำให้ mtime เปลี่ยน)
+RACY_MTIME_NS = 2 * 1_000_000_000
+_UNTRUSTED_MTIME = -1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    present INTEGER NOT NULL DEFAULT 1,
+    last_action TEXT,
+    last_action_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS idx_files_present_mtime ON files(present, mtime);
+"""
+
+
+def scan_index_path(config_file):
+    """ตำแหน่งไฟล์ดัชนี (อยู่ในโฟลเดอร์เดียวกับไฟล์ตั้งค่า)"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), SCAN_INDEX_FILE)
+
+
+def _subtree_bounds(root):
+    """คืนค่า (prefix, upper) สำหรับค้นหาเส้นทางทั้งหมดภายใต้ root ด้วยการเปรียบเทียบช่วงของสตริง (ใช้ดัชนีได้)"""
+    prefix = root if root.endswith(os.sep) else root + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+
+class ScanIndex:
+    """
+    ดัชนีการสแกนหนึ่งไฟล์ SQLite ใช้จาก Thread เดียวเท่านั้น (Thread ที่สร้างอ็อบเจกต์)
+    ข้อผิดพลาดของดิสก์ต้นทาง (OSError) และของฐานข้อมูล (sqlite3.Error) ถูกส่งต่อให้ผู้เรียกจัดการ
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def refresh(self, root, recursive=False):
+        """
+        ปรับดัชนีให้ตรงกับโฟลเดอร์ต้นทาง โดยอ่านรายการไฟล์ใหม่เฉพาะโฟลเดอร์ที่ mtime เปลี่ยน
+        คืนค่า (จำนวนโฟลเดอร์ที่อ่านใหม่, จำนวนโฟลเดอร์ที่ข้ามเพราะไม่เปลี่ยนแปลง)
+        """
+        root = os.path.abspath(root)
+        now_ns = time.time_ns()
+        scanned = unchanged = 0
+        cur = self._conn.cursor()
+        with self._conn: # ทั้งหมดใน Transaction เดียว
+            pending_dirs = [root]
+            while pending_dirs:
+                dir_path = pending_dirs.pop()
+                try:
+                    st = os.stat(dir_path)
+                except FileNotFoundError:
+                    if dir_path == root:
+                        raise
+                    self._forget_tree(cur, dir_path) # โฟลเดอร์ย่อยถูกลบไปแล้ว
+                    continue
+
+                row = cur.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+                if row is not None and row[0] == st.st_mtime_ns:
+                    unchanged += 1
+                    if recursive:
+                        pending_dirs.extend(r[0] for r in cur.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,)))
+                    continue
+
+                scanned += 1
+                files = []
+                sub_dirs = []
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            entry_stat = entry.stat()
+                            files.append((entry.path, dir_path, entry_stat.st_size, entry_stat.st_mtime))
+                        elif entry.is_dir(follow_symlinks=False):
+                            sub_dirs.append(entry.path)
+
+                # แทนที่รายการไฟล์ของโฟลเดอร์นี้ (เก็บแถวของไฟล์ที่หายไปแล้วแต่มีประวัติการกระทำไว้)
+                cur.execute("UPDATE files SET present = 0 WHERE dir = ?", (dir_path,))
+                cur.executemany(
+                    "INSERT INTO files (path, dir, size, mtime, present) VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, present = 1",
+                    files)
+                cur.execute("DELETE FROM files WHERE dir = ? AND present = 0 AND last_action IS NULL", (dir_path,))
+
+                # โฟลเดอร์ย่อย: ลืมโฟลเดอร์ที่หายไป และบันทึกโฟลเดอร์ใหม่เป็น "ยังไม่เคยสแกน" (แม้ในโหมดไม่รวมโฟลเดอร์ย่อย)
+                known_sub_dirs = {r[0] for r in cur.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,))}
+                for gone_dir in known_sub_dirs.difference(sub_dirs):
+                    self._forget_tree(cur, gone_dir)
+                cur.executemany("INSERT OR IGNORE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                                [(sub_dir, dir_path, _UNTRUSTED_MTIME) for sub_dir in sub_dirs])
+
+                trusted_mtime = st.st_mtime_ns if now_ns - st.st_mtime_ns > RACY_MTIME_NS else _UNTRUSTED_MTIME
+                cur.execute("INSERT INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?) "
+                            "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+                            (dir_path, os.path.dirname(dir_path), trusted_mtime))
+                if recursive:
+                    pending_dirs.extend(sub_dirs)
+        return scanned, unchanged
+
+    def _forget_tree(self, cur, dir_path):
+        """ลบโฟลเดอร์และโฟลเดอร์ย่อยทั้งหมดออกจากดัชนี (แถวไฟล์ที่มีประวัติการกระทำจะถูกเก็บไว้แต่ทำเครื่องหมายว่าไม่อยู่แล้ว)"""
+        prefix, upper = _subtree_bounds(dir_path)
+        where = "(dir = ? OR (dir >= ? AND dir < ?))"
+        cur.execute(f"DELETE FROM files WHERE {where} AND last_action IS NULL", (dir_path, prefix, upper))
+        cur.execute(f"UPDATE files SET present = 0 WHERE {where}", (dir_path, prefix, upper))
+        cur.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (dir_path, prefix, upper))
+
+    def _scope(self, root, recursive):
+        """เงื่อนไข SQL สำหรับไฟล์ใน root (และโฟลเดอร์ย่อยเมื่อ recursive=True)"""
+        if not recursive:
+            return "dir = ?", (root,)
+        prefix, upper = _subtree_bounds(root)
+        return "(dir = ? OR (dir >= ? AND dir < ?))", (root, prefix, upper)
+
+    def count(self, root, recursive=False):
+        """จำนวนไฟล์ที่อยู่ในต้นทางตามดัชนี"""
+        root = os.path.abspath(root)
+        scope, params = self._scope(root, recursive)
+        return self._conn.execute(f"SELECT COUNT(*) FROM files WHERE present = 1 AND {scope}", params).fetchone()[0]
+
+    def query(self, root, recursive=False, cutoff_timestamp=None):
+        """
+        คืนรายการ FileEntry ของไฟล์ที่แก้ไขไม่เกิน cutoff_timestamp (ทั้งหมดหากเป็น None) เรียงจากเก่าที่สุด
+        FileEntry.name เป็นเส้นทางสัมพัทธ์จาก root เหมือนกับการสแกนโฟลเดอร์ย่อย
+        """
+        root = os.path.abspath(root)
+        prefix, _ = _subtree_bounds(root)
+        scope, params = self._scope(root, recursive)
+        sql = f"SELECT path, size, mtime FROM files WHERE present = 1 AND {scope}"
+        if cutoff_timestamp is not None:
+            sql += " AND mtime <= ?"
+            params += (cutoff_timestamp,)
+        sql += " ORDER BY mtime"
+        return [FileEntry(path[len(prefix):], path, size, mtime) for path, size, mtime in self._conn.execute(sql, params)]
+
+    def update_file(self, path, size, mtime):
+        """ปรับขนาด/เวลาแก้ไขของไฟล์ที่พบว่าเปลี่ยนไปจากดัชนี"""
+        self._conn.execute("UPDATE files SET size = ?, mtime = ? WHERE path = ?", (size, mtime, path))
+
+    def mark_missing(self, path):
+        """ทำเครื่องหมายไฟล์ที่ไม่พบแล้ว"""
+        self._conn.execute("UPDATE files SET present = 0 WHERE path = ?", (path,))
+
+    def record_actions(self, actions):
+        """
+        บันทึกการกระทำล่าสุดของไฟล์ actions เป็นรายการ (path, action, still_present)
+        ไฟล์ที่ถูกย้าย/ลบออกจากต้นทางยังคงอยู่ในดัชนีเป็นประวัติ
+        """
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._conn:
+            self._conn.executemany("UPDATE files SET last_action = ?, last_action_at = ?, present = ? WHERE path = ?",
+                                   [(action, now, 1 if still_present else 0, path) for path, action, still_present in actions])
+
+    def commit(self):
+        self._conn.commit()
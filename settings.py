@@ -0,0 +1,223 @@
+"""
+การตั้งค่าแบบมีชนิดข้อมูลและตรวจสอบความถูกต้องแล้ว พร้อมแคชของไฟล์ตั้งค่า (move_config.json)
+
+ไฟล์ตั้งค่าเก็บค่าตัวเลขเป็นข้อความได้ (เช่น "months_old": "3" จาก GUI) parse_settings แปลงทุกค่าเพียงครั้งเดียว
+และรายงานค่าที่ไม่ถูกต้องทั้งหมดพร้อมกันด้วย SettingsError ก่อนเริ่มการทำงาน แทนการล้มเหลวกลางทาง
+ConfigStore อ่านไฟล์ใหม่เฉพาะเมื่อเวลาแก้ไข (mtime) หรือขนาดของไฟล์เปลี่ยน ผลลัพธ์ (Settings) เป็น namedtuple
+ที่แก้ไขไม่ได้ จึงใช้ร่วมกันระหว่าง Engine, GUI และหลาย Thread ได้อย่างปลอดภัยตลอดทั้งรอบการทำงาน
+"""
+import datetime
+import json
+import os
+import threading
+from collections import namedtuple
+
+from engine import ARCHIVE_FORMATS, DEDUP_MODES, HASH_ALGORITHMS, PROFILERS
+
+OPERATIONS = ("move", "copy", "delete", "archive")
+_NOT_LOADED = object()
+
+
+class SettingsError(ValueError):
+    """การตั้งค่าไม่ถูกต้อง หรืออ่านไฟล์ตั้งค่าไม่ได้ (ข้อความรวมทุกค่าที่ไม่ถูกต้อง)"""
+    pass
+
+
+# --- Value parsers (ตัวแปลงค่า: คืนค่าที่แปลงแล้ว หรือ ValueError พร้อมเหตุผล) ---
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("true", "1", "yes", "on"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("false", "0", "no", "off", ""):
+        return False
+    raise ValueError("ต้องเป็น true หรือ false")
+
+
+def _number(convert, minimum=None, maximum=None, exclusive_minimum=False):
+    def parse(value):
+        if isinstance(value, bool):
+            raise ValueError("ต้องเป็นตัวเลข")
+        try:
+            number = convert(str(value).strip()) if isinstance(value, str) else convert(value)
+        except (TypeError, ValueError):
+            raise ValueError("ต้องเป็นจำนวนเต็ม" if convert is int else "ต้องเป็นตัวเลข")
+        if convert is int and isinstance(value, float) and value != number:
+            raise ValueError("ต้องเป็นจำนวนเต็ม")
+        if minimum is not None and (number <= minimum if exclusive_minimum else number < minimum):
+            raise ValueError(f"ต้อง{'มากกว่า' if exclusive_minimum else 'ไม่น้อยกว่า'} {minimum}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"ต้องไม่มากกว่า {maximum}")
+        return number
+    return parse
+
+
+def _choice(choices):
+    def parse(value):
+        text = str(value).strip().lower()
+        if text not in choices:
+            raise ValueError(f"ต้องเป็นหนึ่งใน {', '.join(choices)}")
+        return text
+    return parse
+
+
+def _parse_str(value):
+    if not isinstance(value, str):
+        raise ValueError("ต้องเป็นข้อความ")
+    return value
+
+
+def _parse_time(value):
+    """'H:MM' หรือ 'HH:MM' -> datetime.time"""
+    try:
+        hour, minute = map(int, str(value).strip().split(":"))
+        return datetime.time(hour, minute)
+    except (TypeError, ValueError):
+        raise ValueError("ต้องอยู่ในรูปแบบ HH:MM")
+
+
+def _parse_windows(value):
+    if not isinstance(value, list):
+        raise ValueError("ต้องเป็นรายการ (list) ของช่วงเวลา")
+    return tuple(value)
+
+
+# ชื่อค่า, ค่าเริ่มต้น, ตัวแปลงค่า (ค่าที่ไม่ได้อยู่ในรายการนี้ เช่น gui_log_max_lines หรือ jobs จะถูกละเว้น)
+_FIELDS = (
+    ("source", "", _parse_str),
+    ("dest", "", _parse_str),
+    ("file_type", "All", _parse_str),
+    ("min_free_space_gb", 5.0, _number(float, minimum=0)),
+    ("filter_old", False, _parse_bool),
+    ("months_old", 3, _number(int, minimum=0)),
+    ("recursive", False, _parse_bool),
+    ("prune_empty_dirs", False, _parse_bool),
+    ("transfer_workers", 1, _number(int, minimum=1)),
+    ("chunked_copy_threshold_mb", 64.0, _number(float, minimum=0)),
+    ("copy_buffer_mb", 8.0, _number(float, minimum=0, exclusive_minimum=True)),
+    ("use_scan_index", False, _parse_bool),
+    ("use_journal", True, _parse_bool),
+    ("verify_hash", False, _parse_bool),
+    ("hash_files", False, _parse_bool),
+    ("hash_algorithm", "blake2b", _choice(HASH_ALGORITHMS)),
+    ("dedup_mode", "off", _choice(DEDUP_MODES)),
+    ("pipeline_scan", False, _parse_bool),
+    ("strict_oldest_first", False, _parse_bool),
+    ("rate_limit_mbps", 0.0, _number(float, minimum=0)),
+    ("rate_limit_windows", (), _parse_windows),
+    ("fit_to_free_space", False, _parse_bool),
+    ("free_space_check_mb", 1024.0, _number(float, minimum=0, exclusive_minimum=True)),
+    ("archive_format", "zip", _choice(ARCHIVE_FORMATS)),
+    ("auto_day", 1, _number(int, minimum=1, maximum=31)),
+    ("auto_time", datetime.time(0, 1), _parse_time),
+    ("auto_interval", 1, _number(int, minimum=0)),
+    ("auto_operation", "move", _choice(OPERATIONS)),
+    ("max_jobs_per_volume", 1, _number(int, minimum=1)),
+    ("export_metrics", True, _parse_bool),
+    ("metrics_textfile_dir", "", _parse_str),
+    ("profile_runs", False, _parse_bool),
+    ("profiler", "auto", _choice(PROFILERS)),
+    ("profile_keep", 20, _number(int, minimum=1)),
+    ("profile_top_n", 30, _number(int, minimum=1)),
+)
+
+Settings = namedtuple("Settings", [name for name, _, _ in _FIELDS])
+
+
+def parse_settings(raw):
+    """แปลงและตรวจสอบ dict ของการตั้งค่าเป็น Settings (SettingsError ระบุทุกค่าที่ไม่ถูกต้อง)"""
+    values = {}
+    errors = []
+    for name, default, parse in _FIELDS:
+        value = raw.get(name)
+        if value is None:
+            values[name] = default
+            continue
+        try:
+            values[name] = parse(value)
+        except ValueError as e:
+            errors.append(f"{name} = {value!r} {e}")
+    if not errors and (values["rate_limit_mbps"] or values["rate_limit_windows"]):
+        from rate_limiter import RateLimiter
+        try:
+            RateLimiter(values["rate_limit_mbps"], values["rate_limit_windows"])
+        except ValueError as e:
+            errors.append(f"rate_limit_windows: {e}")
+    if errors:
+        raise SettingsError("; ".join(errors))
+    return Settings(**values)
+
+
+def merge_job(raw, job_name):
+    """การตั้งค่าระดับบนสุด (ไม่รวมรายการ jobs) ที่ถูกทับด้วยการตั้งค่าของงาน job_name (SettingsError หากไม่พบงาน)"""
+    for job in raw.get("jobs") or ():
+        if isinstance(job, dict) and job.get("name") == job_name:
+            merged = {key: value for key, value in raw.items() if key != "jobs"}
+            merged.update(job)
+            return merged
+    raise SettingsError(f"ไม่พบงาน '{job_name}' ในไฟล์ตั้งค่า")
+
+
+class ConfigStore:
+    """
+    แคชของไฟล์ตั้งค่าหนึ่งไฟล์ ปลอดภัยเมื่อเรียกจากหลาย Thread (Engine ของทุกงานใช้อ็อบเจกต์เดียวกัน)
+    อ่านและแปลงไฟล์ใหม่เฉพาะเมื่อ mtime หรือขนาดเปลี่ยน ข้อผิดพลาดในการอ่าน/แปลงไฟล์ถูกส่งต่อเป็น SettingsError
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = _NOT_LOADED # (mtime_ns, ขนาด) ของไฟล์ที่อ่านไว้ล่าสุด (None = ไม่มีไฟล์)
+        self._raw = {}
+        self._settings = {} # ชื่องาน (None = ระดับบนสุด) -> Settings ของไฟล์เวอร์ชันเดียวกับ _raw
+        self.loads = 0 # จำนวนครั้งที่อ่านไฟล์จริง
+
+    def _current_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise SettingsError(f"ข้อผิดพลาดในการอ่านไฟล์ตั้งค่า {self.path}: {e}")
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh_locked(self):
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return
+        raw = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            except ValueError as e:
+                raise SettingsError(f"ไฟล์ตั้งค่า {self.path} ไม่ใช่ JSON ที่ถูกต้อง: {e}")
+            except (IOError, OSError) as e:
+                raise SettingsError(f"ข้อผิดพลาดในการอ่านไฟล์ตั้งค่า {self.path}: {e}")
+            if not isinstance(raw, dict):
+                raise SettingsError(f"ไฟล์ตั้งค่า {self.path} ต้องเป็น JSON object")
+        self.loads += 1
+        self._stamp = stamp
+        self._raw = raw
+        self._settings = {}
+
+    def raw(self):
+        """dict ของไฟล์ตั้งค่าทั้งไฟล์ (รวมรายการ jobs) ไม่มีไฟล์ = dict ว่าง ห้ามแก้ไข dict ที่ได้รับ"""
+        with self._lock:
+            self._refresh_locked()
+            return self._raw
+
+    def settings(self, job_name=None):
+        """Settings ของการตั้งค่าระดับบนสุด หรือของงาน job_name (แปลงครั้งเดียวต่อเวอร์ชันของไฟล์)"""
+        with self._lock:
+            self._refresh_locked()
+            if job_name not in self._settings:
+                raw = self._raw if job_name is None else merge_job(self._raw, job_name)
+                self._settings[job_name] = parse_settings(raw)
+            return self._settings[job_name]
+
+    def invalidate(self):
+        """บังคับให้อ่านไฟล์ใหม่ในครั้งถัดไป (หลังเขียนไฟล์เอง เผื่อระบบไฟล์ที่ mtime ละเอียดเพียง 1-2 วินาที)"""
+        with self._lock:
+            self._stamp = _NOT_LOADED
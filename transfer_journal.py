@@ -0,0 +1,111 @@
+"""
+Journal แบบ write-ahead สำหรับการย้าย/คัดลอกไฟล์ เพื่อกู้คืนงานที่ค้างเมื่อโปรแกรมปิดตัวหรือดิสก์หลุดกลางทาง
+
+แต่ละบรรทัดเป็น JSON หนึ่งรายการ: สถานะของไฟล์หนึ่งไฟล์ในรอบการทำงานหนึ่ง
+    planned  -> จองชื่อปลายทางแล้ว กำลังจะคัดลอก
+    copied   -> คัดลอกครบแล้ว
+    verified -> ตรวจสอบขนาดปลายทางแล้ว (การย้าย: กำลังจะลบต้นฉบับ, archive: dst คือ Archive ที่ตรวจสอบแล้วและกำลังจะเปลี่ยนชื่อ)
+    removed / done / cancelled / failed -> สิ้นสุด (ไม่ต้องกู้คืน)
+    resolved -> รอบถัดไปกู้คืนรายการนี้แล้ว (การกู้คืนที่ถูกขัดจังหวะจะไม่ทำซ้ำ)
+การ fsync ทำเป็นชุด (ทุก JOURNAL_SYNC_BATCH รายการ หรือทุก JOURNAL_SYNC_INTERVAL_SEC วินาที)
+ยกเว้นสถานะ planned ที่ผู้เรียก sync() ทันทีก่อนเริ่มเขียนไฟล์ปลายทาง
+การกู้คืนจึงตรวจสอบสถานะจริงของไฟล์บนดิสก์เสมอ โดยใช้ Journal เพื่อรู้ว่าต้องตรวจคู่ไฟล์ใดบ้าง
+"""
+import json
+import os
+import threading
+import time
+
+JOURNAL_FILE = "transfer_journal.jsonl"
+JOURNAL_SYNC_BATCH = 64
+JOURNAL_SYNC_INTERVAL_SEC = 1.0
+# สถานะที่ถือว่าไฟล์นั้นเสร็จสิ้นแล้ว ไม่ต้องกู้คืน
+TERMINAL_STATES = frozenset(("removed", "done", "cancelled", "failed", "resolved"))
+
+
+def journal_path(config_file):
+    """ตำแหน่งไฟล์ Journal (อยู่ในโฟลเดอร์เดียวกับไฟล์ตั้งค่า)"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), JOURNAL_FILE)
+
+
+def read_unfinished(path):
+    """
+    อ่าน Journal ของรอบก่อนหน้าและคืนค่ารายการสุดท้ายของแต่ละไฟล์ที่ยังไม่ถึงสถานะสิ้นสุด
+    บรรทัดที่เขียนไม่ครบ (โปรแกรมปิดตัวระหว่างเขียน) จะถูกข้าม
+    """
+    latest = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "src" in record:
+                    latest[record["src"]] = record
+    except FileNotFoundError:
+        return []
+    return [record for record in latest.values() if record.get("state") not in TERMINAL_STATES]
+
+
+def mark_resolved(path, src):
+    """ต่อท้าย Journal ของรอบก่อนหน้าว่าไฟล์ src ถูกกู้คืนแล้ว"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"state": "resolved", "src": src}, ensure_ascii=False) + "\n")
+
+
+class TransferJournal:
+    """
+    เขียน Journal ของรอบการทำงานปัจจุบัน (ปลอดภัยเมื่อเรียกจากหลาย Worker Thread)
+    ติดตามไฟล์ที่ยังไม่ถึงสถานะสิ้นสุด เมื่อปิดแล้วไม่มีไฟล์ค้าง ไฟล์ Journal จะถูกลบ
+    """
+    def __init__(self, path, run_id, operation, sync_batch=JOURNAL_SYNC_BATCH, sync_interval=JOURNAL_SYNC_INTERVAL_SEC):
+        self.path = path
+        self.run_id = run_id
+        self.operation = operation
+        self._sync_batch = sync_batch
+        self._sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8") # เริ่ม Journal ใหม่ (รอบก่อนหน้าถูกกู้คืนแล้ว)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._open_entries = set() # ต้นทางที่ยังไม่ถึงสถานะสิ้นสุด
+
+    def record(self, state, src, dst=None, size=None, mtime=None):
+        """บันทึกสถานะของไฟล์ และ fsync เมื่อครบชุดหรือครบเวลา"""
+        line = json.dumps({"run": self.run_id, "op": self.operation, "state": state,
+                           "src": src, "dst": dst, "size": size, "mtime": mtime}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            if state in TERMINAL_STATES:
+                self._open_entries.discard(src)
+            else:
+                self._open_entries.add(src)
+            self._unsynced += 1
+            if self._unsynced >= self._sync_batch or time.monotonic() - self._last_sync >= self._sync_interval:
+                self._sync_locked()
+
+    def sync(self):
+        """บังคับให้รายการที่ค้างอยู่ถูกเขียนลงดิสก์ (เช่น ก่อนเริ่มคัดลอกไฟล์ใหญ่)"""
+        with self._lock:
+            if self._unsynced:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """
+        ปิด Journal: หากทุกไฟล์ถึงสถานะสิ้นสุดแล้วจะลบไฟล์ Journal ทิ้ง
+        มิฉะนั้นเก็บไว้ (fsync แล้ว) ให้รอบถัดไปกู้คืน คืนค่าจำนวนไฟล์ที่ยังค้างอยู่
+        """
+        with self._lock:
+            self._sync_locked()
+            self._file.close()
+            unfinished = len(self._open_entries)
+        if unfinished == 0:
+            os.remove(self.path)
+        return unfinished